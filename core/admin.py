@@ -1,19 +1,66 @@
-from django.contrib import admin
+import tempfile
+
+from django.contrib import admin, messages
+from django.http import FileResponse
+
+from . import caching, search
+from .forms import MarksAdminForm
+from .result_cards import ResultCardWriter
 from .models import Course, Student, Teacher, Attendance, Marks
 
+# Most result cards the admin action renders within a request; larger
+# selections are left to `manage.py generate_result_cards`
+MAX_ADMIN_CARDS = 200
+
+class FullTextSearchMixin:
+    """
+    Answers the changelist search box from the full-text index instead of
+    LIKE '%term%' scans over search_fields (falls back to those when full
+    text search isn't available).
+    """
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        ids = search.id_subquery(self.search_kind, search_term)
+        if ids is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=ids), False
+
 @admin.register(Course)
-class CourseAdmin(admin.ModelAdmin):
+class CourseAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    search_kind = 'course'
     list_display = ('name', 'code')
     search_fields = ('name', 'code')
 
 @admin.register(Student)
-class StudentAdmin(admin.ModelAdmin):
+class StudentAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    search_kind = 'student'
     list_display = ('full_name', 'roll_number', 'course', 'email')
     list_filter = ('course',)
     search_fields = ('full_name', 'roll_number', 'email')
+    actions = ['download_result_cards']
+
+    @admin.action(description='Download PDF result cards (ZIP)')
+    def download_result_cards(self, request, queryset):
+        students = list(queryset.order_by('roll_number').values_list('pk', 'roll_number')[:MAX_ADMIN_CARDS + 1])
+        if len(students) > MAX_ADMIN_CARDS:
+            self.message_user(
+                request,
+                f'Select at most {MAX_ADMIN_CARDS} students, or run manage.py generate_result_cards '
+                f'(--course CODE) for larger batches.',
+                messages.WARNING,
+            )
+            return None
+        # Built in a temporary file that is deleted once the response is
+        # sent, in this process: no worker pool inside a web request
+        output = tempfile.TemporaryFile()
+        ResultCardWriter(output, workers=0).run(students)
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename='result_cards.zip')
 
 @admin.register(Teacher)
-class TeacherAdmin(admin.ModelAdmin):
+class TeacherAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    search_kind = 'teacher'
     list_display = ('name', 'email')
     search_fields = ('name', 'email')
 
@@ -23,8 +70,19 @@ class AttendanceAdmin(admin.ModelAdmin):
     list_filter = ('course', 'date', 'status')
     search_fields = ('student__full_name', 'course__name')
 
+    # Attendance has no post_delete receiver (see core/signals.py), so
+    # deletes made here bump the cached fragments' version themselves
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        caching.bump('attendance')
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        caching.bump('attendance')
+
 @admin.register(Marks)
 class MarksAdmin(admin.ModelAdmin):
+    form = MarksAdminForm
     list_display = ('student', 'course', 'marks_obtained', 'total_marks')
     list_filter = ('course',)
     search_fields = ('student__full_name', 'course__name')
@@ -0,0 +1,180 @@
+"""
+Course grade analytics computed with NumPy.
+
+A course's marks are loaded with one values_list() query into float
+arrays, and every statistic (mean, median, spread, percentiles, a
+histogram of percentages and the pass rate) is computed on whole arrays
+instead of per row. all_course_stats() does the same for every course
+from a single query, grouping with bincount/lexsort rather than looping
+over rows.
+
+A mark passes when marks_obtained >= 40% of total_marks, the rule
+used on the result cards.
+
+The course listings only need a few figures per course, which
+with_course_stats() adds to the course query itself in SQL, and the
+student page a student's attendance totals (attendance_summary()).
+"""
+import numpy as np
+from django.db import connection
+from django.db.models import (
+    Avg, Case, Count, ExpressionWrapper, FloatField, OuterRef, Q, Subquery, Value, When,
+)
+from django.db.models.functions import Cast, Coalesce, NullIf
+
+from .models import Course, Student, Teacher, Marks, Attendance
+
+PASS_FRACTION = 0.4
+PERCENTILES = (10, 25, 50, 75, 90)
+# Ten buckets of ten percentage points; 100% falls in the last one
+HISTOGRAM_EDGES = np.linspace(0, 100, 11)
+# 100 for an attendance entry marked present, 0 otherwise
+PRESENT_PERCENT = Case(When(status='Present', then=Value(100.0)), default=Value(0.0), output_field=FloatField())
+
+
+def load_marks(course_id=None):
+    """
+    Returns (course_ids, percentages, passed) arrays for all marks, or
+    for one course, from a single query.
+    """
+    rows = Marks.objects.order_by()
+    if course_id is not None:
+        rows = rows.filter(course_id=course_id)
+    # Cast in SQL and read the cursor directly: the rows go straight into
+    # an array, skipping the per-row Decimal converters of the ORM
+    rows = rows.values_list(
+        'course_id', Cast('marks_obtained', FloatField()), Cast('total_marks', FloatField()),
+    )
+    sql, params = rows.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        data = np.array(cursor.fetchall(), dtype=float)
+    if not len(data):
+        return np.empty(0, dtype=int), np.empty(0), np.empty(0, dtype=bool)
+
+    course_ids, obtained, total = data[:, 0].astype(int), data[:, 1], data[:, 2]
+    percentages = np.divide(obtained * 100, total, out=np.zeros_like(obtained), where=total > 0)
+    passed = obtained >= total * PASS_FRACTION
+    return course_ids, percentages, passed
+
+def _histogram_labels():
+    edges = HISTOGRAM_EDGES.astype(int)
+    return [f'{low}-{high}%' for low, high in zip(edges[:-1], edges[1:])]
+
+def _bucket(percentages):
+    # Index of the histogram bucket for every percentage (clipped to 0-100)
+    return np.digitize(np.clip(percentages, 0, 100), HISTOGRAM_EDGES[1:-1])
+
+def _round(value):
+    return round(float(value), 2)
+
+def summarize(percentages, passed, histogram=None):
+    """
+    Statistics for one course's percentages as plain Python values
+    (JSON-serialisable). `histogram` may be passed in when it was already
+    counted for all courses at once.
+    """
+    count = len(percentages)
+    if histogram is None:
+        histogram = np.bincount(_bucket(percentages), minlength=len(HISTOGRAM_EDGES) - 1)
+    stats = {
+        'count': count,
+        'histogram': [
+            {'range': label, 'count': int(n), 'share': _round(n * 100 / count) if count else 0.0}
+            for label, n in zip(_histogram_labels(), histogram)
+        ],
+    }
+    if not count:
+        stats.update(mean=None, median=None, std=None, min=None, max=None,
+                     percentiles={}, passed=0, pass_rate=None)
+        return stats
+
+    values = np.percentile(percentages, PERCENTILES)
+    passed_count = int(np.count_nonzero(passed))
+    stats.update(
+        mean=_round(percentages.mean()),
+        median=_round(np.median(percentages)),
+        std=_round(percentages.std()),
+        min=_round(percentages.min()),
+        max=_round(percentages.max()),
+        percentiles={f'p{p}': _round(value) for p, value in zip(PERCENTILES, values)},
+        passed=passed_count,
+        pass_rate=_round(passed_count * 100 / count),
+    )
+    return stats
+
+def course_stats(course):
+    """
+    Statistics for one course.
+    """
+    course_ids, percentages, passed = load_marks(course.pk)
+    stats = summarize(percentages, passed)
+    stats.update(course_id=course.pk, name=course.name, code=course.code)
+    return stats
+
+def all_course_stats():
+    """
+    Statistics for every course (including ones without marks), ordered
+    by course code, from one query over Marks.
+    """
+    courses = list(Course.objects.order_by('code').values_list('id', 'name', 'code'))
+    course_ids, percentages, passed = load_marks()
+
+    # Sort by course, then percentage, so each course is one contiguous,
+    # already sorted slice of the arrays
+    order = np.lexsort((percentages, course_ids))
+    course_ids, percentages, passed = course_ids[order], percentages[order], passed[order]
+    present, starts = np.unique(course_ids, return_index=True)
+    slices = dict(zip(present.tolist(), np.split(np.arange(len(course_ids)), starts[1:])))
+
+    # Histograms for all courses in one bincount over (course, bucket)
+    bucket_count = len(HISTOGRAM_EDGES) - 1
+    group = np.searchsorted(present, course_ids)
+    histograms = np.bincount(
+        group * bucket_count + _bucket(percentages), minlength=len(present) * bucket_count,
+    ).reshape(len(present), bucket_count) if len(present) else np.zeros((0, bucket_count), dtype=int)
+    histogram_rows = dict(zip(present.tolist(), histograms))
+
+    results = []
+    for course_id, name, code in courses:
+        rows = slices.get(course_id, np.empty(0, dtype=int))
+        stats = summarize(percentages[rows], passed[rows], histogram_rows.get(course_id))
+        stats.update(course_id=course_id, name=name, code=code)
+        results.append(stats)
+    return results
+
+def _per_course(queryset, aggregate):
+    """
+    A subquery computing `aggregate` over the rows of `queryset` that
+    belong to the outer course.
+    """
+    rows = queryset.filter(course=OuterRef('pk')).order_by().values('course')
+    return Subquery(rows.annotate(value=aggregate).values('value'))
+
+def with_course_stats(courses):
+    """
+    Annotates a Course queryset with student_count, teacher_count,
+    average_mark (the mean percentage of its marks) and attendance_rate
+    (the percentage of roll-call entries marked present). Each figure is
+    a subquery of the course query, so listing any number of courses
+    takes one query. The averages are None for courses without rows.
+    """
+    percentage = ExpressionWrapper(
+        Cast('marks_obtained', FloatField()) * 100 / NullIf(Cast('total_marks', FloatField()), 0),
+        output_field=FloatField(),
+    )
+    return courses.annotate(
+        student_count=Coalesce(_per_course(Student.objects.all(), Count('pk')), 0),
+        teacher_count=Coalesce(_per_course(Teacher.assigned_courses.through.objects.all(), Count('pk')), 0),
+        average_mark=_per_course(Marks.objects.all(), Avg(percentage)),
+        attendance_rate=_per_course(Attendance.objects.all(), Avg(PRESENT_PERCENT)),
+    )
+
+def attendance_summary(student_id):
+    """
+    {'days', 'present', 'rate'} over all of a student's roll-call
+    entries, from one query; rate is None without entries.
+    """
+    return Attendance.objects.filter(student_id=student_id).aggregate(
+        days=Count('pk'), present=Count('pk', filter=Q(status='Present')), rate=Avg(PRESENT_PERCENT),
+    )
@@ -0,0 +1,18 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+UserModel = get_user_model()
+
+
+class RoleAwareModelBackend(ModelBackend):
+    """
+    ModelBackend that loads the user's teacher and student profiles in the
+    same query as the user, so hasattr(user, 'teacher') and friends never
+    hit the database again.
+    """
+    def get_user(self, user_id):
+        try:
+            user = UserModel._default_manager.select_related('teacher', 'student').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
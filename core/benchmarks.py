@@ -0,0 +1,69 @@
+"""
+Helpers shared by the bench_* management commands.
+
+Benchmarks never touch the real database: they run against a throwaway
+test database created from the migrations and destroyed afterwards.
+"""
+import math
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def temporary_database(verbosity=0, name=None):
+    """
+    Creates a fresh test database for the duration of the block. SQLite
+    test databases live in memory unless a file name is given.
+    """
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict['TEST']
+    old_test_name = test_settings['NAME']
+    if name:
+        test_settings['NAME'] = name
+    try:
+        connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+        try:
+            yield connection
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+    finally:
+        test_settings['NAME'] = old_test_name
+
+def time_calls(func, args_list):
+    """
+    Calls func(*args) for every entry of args_list and returns the
+    median and 95th percentile latency in milliseconds.
+    """
+    timings = []
+    for args in args_list:
+        start = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'median_ms': statistics.median(timings),
+        'p95_ms': timings[math.ceil(len(timings) * 0.95) - 1],
+    }
+
+def insert_rows(table, columns, rows, batch_size=10000):
+    """
+    Inserts plain tuples with executemany, bypassing model instantiation.
+    Used to seed benchmark tables with millions of rows quickly.
+    """
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        connection.ops.quote_name(table),
+        ', '.join(connection.ops.quote_name(column) for column in columns),
+        ', '.join(['%s'] * len(columns)),
+    )
+    batch = []
+    with connection.cursor() as cursor:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cursor.executemany(sql, batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
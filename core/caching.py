@@ -0,0 +1,75 @@
+"""
+Cached page fragments, invalidated by per-model version numbers.
+
+Each of Course, Student, Teacher, Marks and Attendance has a version
+number, kept in the FragmentVersion table. The signal handlers in
+core/signals.py bump it whenever a row of that model is saved or deleted
+(and code that writes in bulk bumps it itself). A cached fragment's key
+includes the current versions of every model it shows, so a change makes
+the next request miss and render the new content instead of serving the
+old one. Old fragments are never read again and expire on their own.
+
+The versions live in the database rather than in the cache so that every
+process sees the same numbers, whatever the cache backend: a bump is an
+atomic UPDATE, and it commits together with the change it stands for.
+They are also read with the same routing as the page's data, so a page
+rendered from the read replica is keyed by the replica's versions.
+
+Templates cache only the parts every user sees; per-user parts such as
+the admin Edit/Delete buttons stay outside the {% cache %} block:
+
+    {% load cache %}
+    {% cache 86400 'course_detail' course.pk versions %}
+        ... course, students, teachers ...
+    {% endcache %}
+    {% if user.is_superuser %} ... buttons ... {% endif %}
+
+where the view passes versions=caching.versions('course', 'student', ...).
+The versions are read before the page's data, so a fragment can never be
+stored under a version newer than the data it was rendered from.
+Fragments are kept for a day; expiry only frees the space taken by old
+versions, it is not what keeps pages current.
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.db.models import F
+
+from .models import FragmentVersion
+
+MODELS = ('course', 'student', 'teacher', 'marks', 'attendance')
+
+
+def _initial():
+    # A row created after the table was emptied starts from the clock
+    # rather than 1, so it never goes back to a version it had before
+    return time.time_ns() // 1000
+
+def versions(*names):
+    """
+    A string of the current versions of the given models, for use as a
+    {% cache %} vary_on argument, e.g. "course=17;student=42".
+    """
+    found = dict(FragmentVersion.objects.filter(name__in=names).values_list('name', 'version'))
+    # A model never bumped has no row yet
+    return ';'.join(f'{name}={found.get(name, 0)}' for name in names)
+
+async def aversions(*names):
+    return await sync_to_async(versions)(*names)
+
+def bump(*names):
+    """
+    Invalidates every fragment showing the given models. Inside a
+    transaction the new versions become visible when it commits, together
+    with the rows that changed.
+    """
+    updated = FragmentVersion.objects.filter(name__in=names).update(version=F('version') + 1)
+    if updated < len(set(names)):
+        FragmentVersion.objects.bulk_create(
+            [FragmentVersion(name=name, version=_initial()) for name in names], ignore_conflicts=True,
+        )
+
+def bump_model(model):
+    name = model._meta.model_name
+    if name in MODELS:
+        bump(name)
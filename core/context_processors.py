@@ -1,13 +1,21 @@
+from .roles import TEACHER, STUDENT, resolve_request_roles
+
+
 def role_checks(request):
     """
     Context processor to add is_teacher and is_student flags to all templates.
-    This avoids the OneToOneField DoesNotExist exception in templates.
+    Reuses the roles RoleMiddleware already resolved for this request, so
+    rendering never looks the profiles up again.
     """
     if not request.user.is_authenticated:
         return {}
-    
+
+    roles = getattr(request, 'roles', None)
+    if roles is None:
+        roles = resolve_request_roles(request)
+
     return {
-        'is_teacher': hasattr(request.user, 'teacher'),
-        'is_student': hasattr(request.user, 'student'),
+        'is_teacher': TEACHER in roles,
+        'is_student': STUDENT in roles,
         'is_superuser': request.user.is_superuser,
     }
@@ -0,0 +1,152 @@
+"""
+Cached counters for the admin dashboard.
+
+The totals and the per-course enrollment/teacher counts are computed once
+and then kept up to date by the signal handlers in core/signals.py, which
+add or subtract one instead of recounting. Each count is its own cache
+key, changed with an atomic incr() once the transaction that made the
+change commits, so concurrent writers don't overwrite each other and a
+rolled back change is never counted. If the cache is cleared the next
+read recounts; if the numbers ever drift (bulk operations skip signals)
+run `manage.py rebuild_dashboard_counts`. Recounts always read the
+primary database, never a lagging replica.
+"""
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Student, Teacher, Course
+from .routers import primary
+
+TOTAL_KEYS = {
+    'student': 'dashboard:total_students',
+    'teacher': 'dashboard:total_teachers',
+    'course': 'dashboard:total_courses',
+}
+MODELS = {
+    'student': Student,
+    'teacher': Teacher,
+    'course': Course,
+}
+# {course_id: (name, code)} of every course
+COURSES_KEY = 'dashboard:courses'
+# Per-course counts, one key for each course and field
+COUNT_KEY = 'dashboard:course:{}:{}'
+COUNT_FIELDS = ('students', 'teachers')
+
+
+def get_dashboard_counts():
+    """
+    Returns the admin dashboard context, counting only what is missing
+    from the cache.
+    """
+    totals = cache.get_many(TOTAL_KEYS.values())
+    for name, key in TOTAL_KEYS.items():
+        if key not in totals:
+            with primary():
+                totals[key] = MODELS[name].objects.count()
+            cache.set(key, totals[key], None)
+
+    enrollment = cached_enrollment()
+    if enrollment is None:
+        enrollment = rebuild_enrollment()
+    return _dashboard_context(totals, enrollment)
+
+async def aget_dashboard_counts():
+    """
+    get_dashboard_counts() for async views. Django runs every database
+    query of a request in the same thread, so the lookups would not
+    overlap if they were awaited separately; one call does them all.
+    """
+    return await sync_to_async(get_dashboard_counts)()
+
+def _dashboard_context(totals, enrollment):
+    return {
+        'total_students': totals[TOTAL_KEYS['student']],
+        'total_teachers': totals[TOTAL_KEYS['teacher']],
+        'total_courses': totals[TOTAL_KEYS['course']],
+        'course_counts': sorted(enrollment, key=lambda row: row['code']),
+    }
+
+def _count_key(course_id, field):
+    return COUNT_KEY.format(course_id, field)
+
+def cached_enrollment():
+    """
+    [{'name': ..., 'code': ..., 'students': n, 'teachers': n}] from the
+    cache, or None if any part of it is missing.
+    """
+    courses = cache.get(COURSES_KEY)
+    if courses is None:
+        return None
+    keys = [_count_key(course_id, field) for course_id in courses for field in COUNT_FIELDS]
+    counts = cache.get_many(keys)
+    if len(counts) < len(keys):
+        return None
+    return [
+        dict({field: max(counts[_count_key(course_id, field)], 0) for field in COUNT_FIELDS},
+             name=name, code=code)
+        for course_id, (name, code) in courses.items()
+    ]
+
+@primary()
+def rebuild_enrollment():
+    courses = {course['id']: (course['name'], course['code'])
+               for course in Course.objects.values('id', 'name', 'code')}
+    counts = {_count_key(course_id, field): 0 for course_id in courses for field in COUNT_FIELDS}
+    student_counts = (
+        Student.objects.filter(course__isnull=False)
+        .values_list('course_id').annotate(total=Count('id')).order_by()
+    )
+    for course_id, total in student_counts:
+        counts[_count_key(course_id, 'students')] = total
+    Assignment = Teacher.assigned_courses.through
+    teacher_counts = Assignment.objects.values_list('course_id').annotate(total=Count('id')).order_by()
+    for course_id, total in teacher_counts:
+        counts[_count_key(course_id, 'teachers')] = total
+
+    # The counts first, so a reader that finds the course list finds them too
+    cache.set_many(counts, None)
+    cache.set(COURSES_KEY, courses, None)
+    return [
+        dict({field: counts[_count_key(course_id, field)] for field in COUNT_FIELDS}, name=name, code=code)
+        for course_id, (name, code) in courses.items()
+    ]
+
+@primary()
+def rebuild_counts():
+    """
+    Recounts everything from the database and overwrites the cache.
+    """
+    cache.set_many({key: MODELS[name].objects.count() for name, key in TOTAL_KEYS.items()}, None)
+    return rebuild_enrollment()
+
+# ---------------------------------------------------
+# INCREMENTAL UPDATES (called from signal handlers)
+# ---------------------------------------------------
+
+def _incr(key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # Not cached yet; the next read will count it
+        pass
+
+def adjust_total(name, delta):
+    transaction.on_commit(lambda: _incr(TOTAL_KEYS[name], delta))
+
+def adjust_enrollment(course_id, field, delta):
+    if course_id is None:
+        return
+    transaction.on_commit(lambda: _incr(_count_key(course_id, field), delta))
+
+def remove_course(course_id):
+    def remove():
+        cache.delete_many([COURSES_KEY] + [_count_key(course_id, field) for field in COUNT_FIELDS])
+    transaction.on_commit(remove)
+
+def invalidate_enrollment():
+    # A new or renamed course, or a move between unknown courses: the
+    # next read recounts every course
+    transaction.on_commit(lambda: cache.delete(COURSES_KEY))
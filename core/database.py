@@ -0,0 +1,46 @@
+"""
+Per-connection SQLite setup for running the site with several writers.
+
+Every new connection runs the PRAGMAs in settings.SQLITE_PRAGMAS, in
+order. The production set (SMS_SQLITE_TUNING=1) switches the file to
+WAL journaling, so readers no longer block a writer's commit and the
+writer no longer blocks readers. It also keeps larger page and mmap
+caches and finishes with PRAGMA optimize.
+
+With settings.SQLITE_IMMEDIATE_TRANSACTIONS on, atomic blocks start with
+BEGIN IMMEDIATE instead of a deferred BEGIN. A deferred transaction that
+reads before it writes has to upgrade its lock halfway through. If
+another connection wrote in the meantime, SQLite fails it at once with
+"database is locked", without waiting for the busy timeout. Taking the
+write lock up front makes writers queue on the busy timeout instead.
+(Django 5.1 offers OPTIONS['transaction_mode'] for this; 4.2 does not.)
+
+The busy timeout itself, and persistent connections, are plain
+DATABASES settings: OPTIONS['timeout'] and CONN_MAX_AGE.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+def apply_pragmas(connection, pragmas):
+    # On the sqlite3 connection itself, so that the setup is not counted
+    # as queries of whichever request happened to open the connection
+    for name, value in pragmas.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+def begin_immediate(connection):
+    """
+    Makes the connection's atomic blocks take the write lock when they start.
+    """
+    def start_transaction():
+        connection.cursor().execute('BEGIN IMMEDIATE')
+    connection._start_transaction_under_autocommit = start_transaction
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    apply_pragmas(connection, settings.SQLITE_PRAGMAS)
+    if settings.SQLITE_IMMEDIATE_TRANSACTIONS:
+        begin_immediate(connection)
@@ -0,0 +1,83 @@
+"""
+Streaming exports of students, marks and attendance.
+
+Rows are read with values_list().iterator(), so only one chunk of plain
+tuples is in memory at a time no matter how large the table is, and are
+written out line by line as CSV or JSON Lines.
+"""
+import csv
+import json
+
+from .models import Student, Marks, Attendance
+
+CHUNK_SIZE = 2000
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def student_rows(course=None):
+    queryset = Student.objects.order_by('pk')
+    if course:
+        queryset = queryset.filter(course__code=course)
+    return queryset.values_list('roll_number', 'full_name', 'email', 'course__code', 'dob')
+
+def marks_rows(course=None):
+    queryset = Marks.objects.order_by('pk')
+    if course:
+        queryset = queryset.filter(course__code=course)
+    return queryset.values_list(
+        'student__roll_number', 'student__full_name', 'course__code', 'marks_obtained', 'total_marks',
+    )
+
+def attendance_rows(course=None, date_from=None, date_to=None):
+    queryset = Attendance.objects.order_by('date', 'pk')
+    if course:
+        queryset = queryset.filter(course__code=course)
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(date__lte=date_to)
+    return queryset.values_list('student__roll_number', 'course__code', 'date', 'status')
+
+# kind -> (column names, row queryset builder)
+EXPORTS = {
+    'students': (['roll_number', 'full_name', 'email', 'course_code', 'dob'], student_rows),
+    'marks': (['roll_number', 'full_name', 'course_code', 'marks_obtained', 'total_marks'], marks_rows),
+    'attendance': (['roll_number', 'course_code', 'date', 'status'], attendance_rows),
+}
+# Exports whose rows have a date for the from/to filters
+DATED_EXPORTS = {'attendance'}
+
+
+class Echo:
+    """
+    File-like object that hands back whatever is written to it, so
+    csv.writer can produce one line at a time.
+    """
+    def write(self, value):
+        return value
+
+def csv_lines(header, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+def jsonl_lines(header, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(header, row)), default=str) + '\n'
+
+def export_lines(kind, fmt, **filters):
+    """
+    Returns an iterator of text lines for the given export kind and format.
+    `filters` may contain course (a course code), and date_from and
+    date_to for the DATED_EXPORTS.
+    """
+    header, build_rows = EXPORTS[kind]
+    rows = build_rows(**filters).iterator(chunk_size=CHUNK_SIZE)
+    if fmt == 'jsonl':
+        return jsonl_lines(header, rows)
+    return csv_lines(header, rows)
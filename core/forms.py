@@ -1,6 +1,18 @@
 from django import forms
 from .models import Student, Teacher, Course, Marks
 
+def check_marks(obtained, total):
+    """
+    Raises ValidationError unless `obtained` out of `total` is a possible
+    mark.
+    """
+    if total <= 0:
+        raise forms.ValidationError('Total marks must be greater than zero.')
+    if obtained < 0:
+        raise forms.ValidationError('Marks obtained cannot be negative.')
+    if obtained > total:
+        raise forms.ValidationError('Marks obtained cannot exceed total marks.')
+
 class MarksForm(forms.ModelForm):
     class Meta:
         model = Marks
@@ -10,6 +22,53 @@ class MarksForm(forms.ModelForm):
             'total_marks': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
         }
 
+    def clean(self):
+        cleaned_data = super().clean()
+        obtained = cleaned_data.get('marks_obtained')
+        total = cleaned_data.get('total_marks')
+        if obtained is not None and total is not None:
+            check_marks(obtained, total)
+        return cleaned_data
+
+# Marks Admin Form (the same checks, with the student and course fields)
+class MarksAdminForm(MarksForm):
+    class Meta(MarksForm.Meta):
+        fields = ['student', 'course', 'marks_obtained', 'total_marks']
+        widgets = {}
+
+# Bulk Marks Entry (one row per student in the grading grid)
+class MarksEntryForm(forms.Form):
+    """
+    A single row of the bulk grade-entry grid.
+    Leave both fields blank to skip the student.
+    """
+    student_id = forms.IntegerField(widget=forms.HiddenInput())
+    marks_obtained = forms.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, required=False,
+        widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm', 'step': '0.01'}),
+    )
+    total_marks = forms.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, required=False,
+        widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm', 'step': '0.01'}),
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        obtained = cleaned_data.get('marks_obtained')
+        total = cleaned_data.get('total_marks')
+
+        if obtained is None and total is None:
+            return cleaned_data
+        if obtained is None or total is None:
+            raise forms.ValidationError('Enter both marks obtained and total marks, or leave both blank.')
+        check_marks(obtained, total)
+        return cleaned_data
+
+    def has_marks(self):
+        return self.cleaned_data.get('marks_obtained') is not None
+
+MarksEntryFormSet = forms.formset_factory(MarksEntryForm, extra=0)
+
 # Student Form
 class StudentForm(forms.ModelForm):
     """
@@ -43,3 +102,60 @@ class CourseForm(forms.ModelForm):
     class Meta:
         model = Course
         fields = ['name', 'code', 'description']
+
+# ---------------------------------------------------
+# ROSTER IMPORT FORMS
+# ---------------------------------------------------
+# These reuse the rules of the forms above for one imported row each.
+# Courses are given by code and resolved through an in-memory code -> id
+# map, and uniqueness is checked once per batch by the importer instead of
+# one query per row.
+
+class ImportRowMixin:
+    """
+    Shared behaviour for validating one imported row.
+    """
+    def __init__(self, *args, course_ids=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.course_ids = course_ids or {}
+
+    def resolve_course_code(self, code):
+        if code not in self.course_ids:
+            raise forms.ValidationError(f'Unknown course code "{code}".')
+        return self.course_ids[code]
+
+    def validate_unique(self):
+        pass
+
+class StudentImportForm(ImportRowMixin, StudentForm):
+    course_code = forms.CharField(required=False)
+
+    class Meta(StudentForm.Meta):
+        fields = ['full_name', 'roll_number', 'email', 'dob']
+
+    def clean_course_code(self):
+        code = self.cleaned_data['course_code']
+        return self.resolve_course_code(code) if code else None
+
+class TeacherImportForm(ImportRowMixin, TeacherForm):
+    course_codes = forms.CharField(required=False, help_text='Course codes separated by ";"')
+
+    class Meta(TeacherForm.Meta):
+        fields = ['name', 'email']
+
+    def clean_course_codes(self):
+        codes = [code.strip() for code in self.cleaned_data['course_codes'].split(';') if code.strip()]
+        return [self.resolve_course_code(code) for code in codes]
+
+class CourseImportForm(ImportRowMixin, CourseForm):
+    pass
+
+# Upload form for the admin import page
+class RosterUploadForm(forms.Form):
+    KIND_CHOICES = [
+        ('students', 'Students'),
+        ('teachers', 'Teachers'),
+        ('courses', 'Courses'),
+    ]
+    kind = forms.ChoiceField(choices=KIND_CHOICES)
+    file = forms.FileField(help_text='CSV or XLSX file with a header row.')
@@ -0,0 +1,294 @@
+"""
+Bulk roster import for Students, Teachers and Courses.
+
+Rows are streamed from a CSV file (or an XLSX file when openpyxl is
+installed), validated with the same rules as the add forms and inserted
+with bulk_create, one transaction per batch. Only one batch of rows is
+held in memory at a time.
+
+Files are read through once before anything is saved, so a file that
+turns out to be unreadable halfway through is rejected as a whole
+instead of leaving its first batches imported. Rows that someone else
+inserted between validation and saving are rejected one by one; the
+rest of their batch is still saved.
+"""
+import csv
+import datetime
+import io
+import time
+import zipfile
+from xml.etree import ElementTree
+
+from django.db import IntegrityError, transaction
+
+from . import caching, counters, search
+from .forms import StudentImportForm, TeacherImportForm, CourseImportForm
+from .models import Student, Teacher, Course
+
+BATCH_SIZE = 500
+
+# Only this many row errors are kept in memory; the rest are counted.
+MAX_STORED_ERRORS = 1000
+
+
+class ImportFileError(Exception):
+    """
+    Raised when the uploaded file cannot be read at all.
+    """
+
+
+# ---------------------------------------------------
+# FILE READERS
+# ---------------------------------------------------
+
+def read_rows(fileobj, filename):
+    """
+    Yields (line_number, row) pairs from a CSV or XLSX file, which must
+    be seekable. Header names are lower-cased and values are stripped
+    strings.
+    """
+    if filename.lower().endswith('.xlsx'):
+        return _read_xlsx(fileobj)
+    return _read_csv(fileobj)
+
+def _read_csv(fileobj):
+    # Parse the whole file once first, so a bad line near the end is
+    # reported before the rows above it are saved
+    start = fileobj.tell()
+    for line, row in _parse_csv(fileobj, csv.reader):
+        pass
+    fileobj.seek(start)
+    for line, row in _parse_csv(fileobj, csv.DictReader):
+        yield line, {
+            key.strip().lower(): (value or '').strip()
+            for key, value in row.items() if key
+        }
+
+def _parse_csv(fileobj, reader_class):
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        yield from enumerate(reader_class(text), start=2)
+    except UnicodeDecodeError:
+        raise ImportFileError('The file is not valid UTF-8 CSV.')
+    except csv.Error as exc:
+        raise ImportFileError(f'The file is not valid CSV: {exc}.')
+    finally:
+        # Don't let the wrapper close the caller's file
+        text.detach()
+
+def _read_xlsx(fileobj):
+    try:
+        from openpyxl import load_workbook
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise ImportFileError('Reading .xlsx files requires openpyxl (pip install openpyxl).')
+
+    # Read the whole sheet once first, like _read_csv
+    start = fileobj.tell()
+    for line, row in _parse_xlsx(fileobj, load_workbook, InvalidFileException):
+        pass
+    fileobj.seek(start)
+    yield from _parse_xlsx(fileobj, load_workbook, InvalidFileException)
+
+def _parse_xlsx(fileobj, load_workbook, invalid_file):
+    # A corrupt workbook can fail when opened or only when a sheet is read
+    broken = (zipfile.BadZipFile, invalid_file, KeyError, ValueError, ElementTree.ParseError)
+    try:
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+    except broken as exc:
+        raise ImportFileError(f'The file is not a valid .xlsx workbook: {exc}.')
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell or '').strip().lower() for cell in next(rows, ())]
+        for line, values in enumerate(rows, start=2):
+            yield line, dict(zip(header, (_xlsx_value(value) for value in values)))
+    except broken as exc:
+        raise ImportFileError(f'The file is not a valid .xlsx workbook: {exc}.')
+    finally:
+        workbook.close()
+
+def _xlsx_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        return value.date().isoformat()
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return str(value).strip()
+
+
+# ---------------------------------------------------
+# IMPORTERS
+# ---------------------------------------------------
+
+class RosterImporter:
+    """
+    Base importer. Subclasses set the model, the row form and the field
+    used to detect duplicates.
+    """
+    model = None
+    form_class = None
+    unique_field = None
+
+    def __init__(self, batch_size=BATCH_SIZE, on_error=None):
+        self.batch_size = batch_size
+        self.on_error = on_error
+        self.processed = 0
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+        self.started = None
+        # Course code -> id map, so rows never look courses up one by one
+        self.course_ids = dict(Course.objects.values_list('code', 'id'))
+
+    @property
+    def rows_per_second(self):
+        elapsed = time.monotonic() - self.started if self.started else 0
+        return self.processed / elapsed if elapsed else 0.0
+
+    def run(self, rows, progress=None):
+        """
+        Imports every row from the `rows` iterator.
+        `progress` is called with the importer after each batch.
+        """
+        self.started = time.monotonic()
+        seen = set()
+        batch = []
+        for line, row in rows:
+            batch.append((line, row))
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch, seen)
+                batch = []
+                if progress:
+                    progress(self)
+        if batch:
+            self.import_batch(batch, seen)
+            if progress:
+                progress(self)
+        # bulk_create skips the signals that keep the dashboard counters current
+        counters.rebuild_counts()
+        return self
+
+    def import_batch(self, batch, seen):
+        keys = [row.get(self.unique_field, '') for line, row in batch]
+        taken = set(
+            self.model.objects.filter(**{f'{self.unique_field}__in': keys})
+            .values_list(self.unique_field, flat=True)
+        )
+
+        valid = []
+        lines = []
+        for line, row in batch:
+            self.processed += 1
+            form = self.form_class(self.prepare(row), course_ids=self.course_ids)
+            if not form.is_valid():
+                self.add_error(line, '; '.join(
+                    f'{field}: {" ".join(messages)}' if field != '__all__' else ' '.join(messages)
+                    for field, messages in form.errors.items()
+                ))
+                continue
+
+            key = form.cleaned_data[self.unique_field]
+            if key in taken or key in seen:
+                self.add_error(line, f'{self.unique_field}: "{key}" already exists.')
+                continue
+            seen.add(key)
+            valid.append((form.instance, form.cleaned_data))
+            lines.append(line)
+
+        self.created += self.save_batch(lines, valid)
+
+    def save_batch(self, lines, valid):
+        """
+        Saves the valid rows of a batch in one transaction and returns how
+        many were saved. If a row was inserted by someone else since it was
+        validated, the batch is rolled back and saved row by row, and only
+        the conflicting rows are reported.
+        """
+        try:
+            with transaction.atomic():
+                self.save(valid)
+            return len(valid)
+        except IntegrityError:
+            pass
+        saved = 0
+        for line, (instance, data) in zip(lines, valid):
+            # The rolled back insert may have numbered the instance
+            instance.pk = None
+            try:
+                with transaction.atomic():
+                    self.save([(instance, data)])
+            except IntegrityError as exc:
+                self.add_error(line, f'{self.unique_field}: "{data[self.unique_field]}" could not be saved ({exc}).')
+            else:
+                saved += 1
+        return saved
+
+    def prepare(self, row):
+        return row
+
+    def save(self, valid):
+        instances = self.model.objects.bulk_create([instance for instance, data in valid])
+        # bulk_create skips the signals that keep the search index and
+        # cached pages current
+        search.index_objects(instances)
+        caching.bump_model(self.model)
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_STORED_ERRORS:
+            self.errors.append((line, message))
+        if self.on_error:
+            self.on_error(line, message)
+
+class StudentImporter(RosterImporter):
+    model = Student
+    form_class = StudentImportForm
+    unique_field = 'roll_number'
+
+    def prepare(self, row):
+        # Accept either "course_code" or "course" as the column name
+        if 'course_code' not in row:
+            row = dict(row, course_code=row.get('course', ''))
+        return row
+
+    def save(self, valid):
+        for instance, data in valid:
+            instance.course_id = data['course_code']
+        super().save(valid)
+
+class TeacherImporter(RosterImporter):
+    model = Teacher
+    form_class = TeacherImportForm
+    # Teacher emails are not unique in the schema, but re-importing the
+    # same file should not create everyone twice.
+    unique_field = 'email'
+
+    def prepare(self, row):
+        if 'course_codes' not in row:
+            row = dict(row, course_codes=row.get('courses', ''))
+        return row
+
+    def save(self, valid):
+        super().save(valid)
+        Assignment = Teacher.assigned_courses.through
+        Assignment.objects.bulk_create([
+            Assignment(teacher_id=instance.pk, course_id=course_id)
+            for instance, data in valid
+            for course_id in set(data['course_codes'])
+        ])
+
+class CourseImporter(RosterImporter):
+    model = Course
+    form_class = CourseImportForm
+    unique_field = 'code'
+
+    def save(self, valid):
+        super().save(valid)
+        self.course_ids.update((instance.code, instance.pk) for instance, data in valid)
+
+IMPORTERS = {
+    'students': StudentImporter,
+    'teachers': TeacherImporter,
+    'courses': CourseImporter,
+}
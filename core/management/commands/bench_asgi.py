@@ -0,0 +1,216 @@
+import asyncio
+import io
+import json
+import math
+import random
+import statistics
+import sys
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db import close_old_connections, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.benchmarks import temporary_database
+from core.models import Student, Teacher, Course
+from core.seeding import DatasetSeeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test the read-only pages through the WSGI and the ASGI handler in this process, '
+        'with several numbers of concurrent clients, on a throwaway seeded database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=10000)
+        parser.add_argument('--courses', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=300, help='Requests per run.')
+        parser.add_argument('--concurrency', default='1,10,50', help='Comma separated numbers of clients.')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='WSGI worker threads, as a sync server would run.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', '-o', help='Write the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency must be comma separated numbers.')
+        results = []
+        with temporary_database():
+            cache.clear()
+            self.stdout.write(f'Seeding {options["students"]} students...')
+            DatasetSeeder(options['students'], options['courses'], seed=options['seed']).run()
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver']):
+                workload = self.workload(random.Random(options['seed']), options['requests'])
+                wsgi, asgi = get_wsgi_application(), get_asgi_application()
+                # Warm the caches and templates so both paths start equal
+                self.run_wsgi(wsgi, workload[:20], 1, 1)
+
+                self.stdout.write(f'{"path":<6}{"clients":>8}{"req/s":>10}{"p50":>11}{"p95":>11}{"errors":>8}')
+                for clients in levels:
+                    for name, run in [('wsgi', lambda: self.run_wsgi(wsgi, workload, clients, options['workers'])),
+                                      ('asgi', lambda: asyncio.run(self.run_asgi(asgi, workload, clients)))]:
+                        result = dict(self.summarize(*run()), path=name, clients=clients)
+                        results.append(result)
+                        self.stdout.write(
+                            f'{name:<6}{clients:>8}{result["requests_per_second"]:>10.1f}'
+                            f'{result["median_ms"]:>9.1f}ms{result["p95_ms"]:>9.1f}ms{result["errors"]:>8}'
+                        )
+            cache.clear()
+
+        if options['output']:
+            with open(options['output'], 'w') as out:
+                json.dump({'students': options['students'], 'workers': options['workers'], 'runs': results},
+                          out, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
+
+    def workload(self, rng, count):
+        """
+        (path, session cookie) pairs: mostly an admin browsing, plus
+        students checking their results.
+        """
+        def session(user):
+            client = Client()
+            client.force_login(user)
+            return f'sessionid={client.cookies["sessionid"].value}'
+
+        student_ids = list(Student.objects.filter(marks__isnull=False).values_list('pk', flat=True).distinct()[:500])
+        teacher_ids = list(Teacher.objects.values_list('pk', flat=True)[:100])
+        course_ids = list(Course.objects.values_list('pk', flat=True))
+
+        admin = session(User.objects.create_superuser('bench-admin', 'admin@example.com', 'bench'))
+        students = []
+        for index, student in enumerate(Student.objects.filter(pk__in=student_ids[:20])):
+            student.user = User.objects.create_user(f'bench-student-{index}', password='bench')
+            student.save()
+            students.append(session(student.user))
+
+        pages = [
+            lambda: (reverse('dashboard'), admin),
+            lambda: (reverse('students'), admin),
+            lambda: (reverse('teachers'), admin),
+            lambda: (reverse('courses'), admin),
+            lambda: (reverse('student_detail', args=[rng.choice(student_ids)]), admin),
+            lambda: (reverse('teacher_detail', args=[rng.choice(teacher_ids)]), admin),
+            lambda: (reverse('course_detail', args=[rng.choice(course_ids)]), admin),
+            lambda: (reverse('student_result_card', args=[rng.choice(student_ids)]), admin),
+            lambda: (reverse('student_marks'), rng.choice(students)),
+            lambda: (reverse('dashboard'), rng.choice(students)),
+        ]
+        return [rng.choice(pages)() for _ in range(count)]
+
+    # ---------------------------------------------------
+    # WSGI: a fixed pool of worker threads
+    # ---------------------------------------------------
+
+    def run_wsgi(self, app, workload, clients, workers):
+        todo = iter(workload)
+        lock = threading.Lock()
+        # Requests wait for a free worker, as behind a sync server
+        pool = threading.Semaphore(workers)
+        timings, statuses = [], []
+
+        def client():
+            while True:
+                with lock:
+                    job = next(todo, None)
+                if job is None:
+                    break
+                start = time.perf_counter()
+                with pool:
+                    status = self.wsgi_get(app, *job)
+                    close_old_connections()
+                with lock:
+                    timings.append(time.perf_counter() - start)
+                    statuses.append(status)
+            connections.close_all()
+
+        start = time.perf_counter()
+        threads = [threading.Thread(target=client) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start, timings, statuses
+
+    def wsgi_get(self, app, path, cookie):
+        environ = {
+            'REQUEST_METHOD': 'GET', 'SCRIPT_NAME': '', 'PATH_INFO': path, 'QUERY_STRING': '',
+            'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'testserver', 'HTTP_COOKIE': cookie,
+            'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(),
+            'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        status = []
+        body = app(environ, lambda line, headers, exc_info=None: status.append(line))
+        try:
+            for chunk in body:
+                pass
+        finally:
+            body.close()
+        return int(status[0].split()[0])
+
+    # ---------------------------------------------------
+    # ASGI: one event loop, no worker limit
+    # ---------------------------------------------------
+
+    async def run_asgi(self, app, workload, clients):
+        todo = iter(workload)
+        timings, statuses = [], []
+
+        async def client():
+            for path, cookie in todo:
+                start = time.perf_counter()
+                statuses.append(await self.asgi_get(app, path, cookie))
+                timings.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(clients)))
+        return time.perf_counter() - start, timings, statuses
+
+    async def asgi_get(self, app, path, cookie):
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+        request = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        finished = asyncio.Event()
+        status = []
+
+        async def receive():
+            if request:
+                return request.pop()
+            # The client stays connected until the response is sent
+            await finished.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+            elif message['type'] == 'http.response.body' and not message.get('more_body'):
+                finished.set()
+
+        await app(scope, receive, send)
+        return status[0]
+
+    def summarize(self, seconds, timings, statuses):
+        timings = sorted(timing * 1000 for timing in timings)
+        return {
+            'requests': len(timings),
+            'seconds': round(seconds, 3),
+            'requests_per_second': round(len(timings) / seconds, 1),
+            'median_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[math.ceil(len(timings) * 0.95) - 1], 2),
+            'errors': sum(status >= 400 for status in statuses),
+        }
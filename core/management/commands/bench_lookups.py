@@ -0,0 +1,137 @@
+import datetime
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from core.benchmarks import temporary_database, time_calls, insert_rows
+from core.models import Student, Course, Marks, Attendance
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the hot Marks/Attendance lookups on a throwaway database, '
+        'with only the foreign key indexes and then with the composite indexes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--marks', type=int, default=1_000_000, help='Number of Marks rows.')
+        parser.add_argument('--attendance', type=int, default=1_000_000, help='Number of Attendance rows.')
+        parser.add_argument('--courses', type=int, default=10)
+        parser.add_argument('--lookups', type=int, default=500, help='Lookups timed per query.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with temporary_database():
+            self.stdout.write('Seeding...')
+            plan = self.seed(options)
+            cases = self.build_cases(plan, rng, options['lookups'])
+
+            self.drop_composite_indexes()
+            before = self.run_cases(cases)
+            self.restore_composite_indexes()
+            after = self.run_cases(cases)
+
+        self.stdout.write(
+            f'\n{"lookup":<32}{"before p50":>12}{"after p50":>12}{"before p95":>12}{"after p95":>12}'
+        )
+        for name in cases:
+            self.stdout.write(
+                f'{name:<32}{before[name]["median_ms"]:>10.3f}ms{after[name]["median_ms"]:>10.3f}ms'
+                f'{before[name]["p95_ms"]:>10.3f}ms{after[name]["p95_ms"]:>10.3f}ms'
+            )
+
+    def seed(self, options):
+        courses = options['courses']
+        students = max(options['marks'] // courses, 1)
+        days = max(options['attendance'] // students, 1)
+        start = datetime.date(2026, 1, 1)
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+
+        insert_rows(Course._meta.db_table, ['id', 'name', 'code', 'description', 'updated_at'],
+                    ((c, f'Course {c}', f'C{c:04d}', '', now) for c in range(1, courses + 1)))
+        insert_rows(Student._meta.db_table,
+                    ['id', 'full_name', 'roll_number', 'email', 'course_id', 'photo_hash', 'updated_at'],
+                    ((s, f'Student {s}', f'R{s:08d}', f's{s}@example.com', s % courses + 1, '', now)
+                     for s in range(1, students + 1)))
+        insert_rows(Marks._meta.db_table,
+                    ['student_id', 'course_id', 'marks_obtained', 'total_marks', 'updated_at'],
+                    ((s, c, str(s * c % 100), '100', now)
+                     for s in range(1, students + 1) for c in range(1, courses + 1)))
+        insert_rows(Attendance._meta.db_table, ['student_id', 'course_id', 'date', 'status', 'updated_at'],
+                    ((s, s % courses + 1, (start + datetime.timedelta(days=d)).isoformat(),
+                      'Present' if (s + d) % 7 else 'Absent', now)
+                     for d in range(days) for s in range(1, students + 1)))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        return {'courses': courses, 'students': students, 'days': days, 'start': start}
+
+    def build_cases(self, plan, rng, lookups):
+        courses, students, days, start = plan['courses'], plan['students'], plan['days'], plan['start']
+
+        def student_id():
+            return rng.randint(1, students)
+
+        def day():
+            return start + datetime.timedelta(days=rng.randrange(days))
+
+        def roster(course_id):
+            # The student ids course_marks_list prefetches marks for
+            return list(Student.objects.filter(course_id=course_id).values_list('id', flat=True)[:400])
+
+        rosters = {c: roster(c) for c in range(1, courses + 1)}
+        return {
+            'marks by (student, course)': (
+                lambda s, c: Marks.objects.filter(student_id=s, course_id=c).first(),
+                [(student_id(), rng.randint(1, courses)) for _ in range(lookups)],
+            ),
+            'marks by student': (
+                lambda s: list(Marks.objects.filter(student_id=s)),
+                [(student_id(),) for _ in range(lookups)],
+            ),
+            'course roster marks': (
+                lambda c: list(Marks.objects.filter(course_id=c, student_id__in=rosters[c])),
+                [(rng.randint(1, courses),) for _ in range(max(lookups // 10, 1))],
+            ),
+            'attendance by (course, date)': (
+                lambda c, d: list(Attendance.objects.filter(course_id=c, date=d)),
+                [(rng.randint(1, courses), day()) for _ in range(max(lookups // 10, 1))],
+            ),
+            'attendance by (student, date)': (
+                lambda s, d: list(Attendance.objects.filter(student_id=s, date__gte=d)),
+                [(student_id(), day()) for _ in range(lookups)],
+            ),
+        }
+
+    def run_cases(self, cases):
+        return {name: time_calls(func, args_list) for name, (func, args_list) in cases.items()}
+
+    def existing_names(self, model):
+        with connection.cursor() as cursor:
+            return set(connection.introspection.get_constraints(cursor, model._meta.db_table))
+
+    def drop_composite_indexes(self):
+        # On SQLite removing a unique constraint rebuilds the table (and its
+        # Meta.indexes), so constraints go first and indexes are dropped after.
+        for model in (Marks, Attendance):
+            with connection.schema_editor() as editor:
+                for constraint in model._meta.constraints:
+                    editor.remove_constraint(model, constraint)
+            with connection.schema_editor() as editor:
+                for index in model._meta.indexes:
+                    if index.name in self.existing_names(model):
+                        editor.remove_index(model, index)
+
+    def restore_composite_indexes(self):
+        for model in (Marks, Attendance):
+            with connection.schema_editor() as editor:
+                for constraint in model._meta.constraints:
+                    editor.add_constraint(model, constraint)
+            with connection.schema_editor() as editor:
+                for index in model._meta.indexes:
+                    if index.name not in self.existing_names(model):
+                        editor.add_index(model, index)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
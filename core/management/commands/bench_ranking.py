@@ -0,0 +1,79 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from core import ranking
+from core.benchmarks import temporary_database, time_calls, insert_rows
+from core.models import Student, Course, Marks, StudentResultSummary
+from core.summaries import rebuild_summaries
+
+# The latency every ranking query should stay under
+BUDGET_MS = 100
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the window-function rankings (leaderboards, result card ranks) on a throwaway database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--marks', type=int, default=200_000, help='Number of Marks rows.')
+        parser.add_argument('--courses', type=int, default=10)
+        parser.add_argument('--lookups', type=int, default=20, help='Calls timed per query.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        courses = options['courses']
+        students = max(options['marks'] // courses, 1)
+        lookups = options['lookups']
+
+        with temporary_database():
+            self.stdout.write(f'Seeding {students * courses} marks for {students} students...')
+            self.seed(rng, students, courses)
+
+            def course():
+                return Course(pk=rng.randint(1, courses))
+
+            def student():
+                return Student(pk=rng.randint(1, students))
+
+            def summary():
+                return StudentResultSummary.objects.get(pk=rng.randint(1, students))
+
+            def roster(course):
+                return ranking.attach_course_ranks(
+                    ranking.with_score(Marks.objects.filter(course=course, student__course=course))
+                )
+
+            cases = {
+                'course leaderboard (top 50)': (ranking.course_leaderboard, [(course(),) for _ in range(lookups)]),
+                'overall leaderboard (top 50)': (ranking.overall_leaderboard, [() for _ in range(lookups)]),
+                'student course ranks': (ranking.student_course_ranks, [(student(),) for _ in range(lookups)]),
+                'student overall rank': (ranking.student_overall_rank, [(summary(),) for _ in range(lookups)]),
+                'course roster with ranks': (roster, [(course(),) for _ in range(lookups)]),
+            }
+            results = {name: time_calls(func, args_list) for name, (func, args_list) in cases.items()}
+
+        self.stdout.write(f'\n{"query":<32}{"p50":>12}{"p95":>12}')
+        for name, timing in results.items():
+            line = f'{name:<32}{timing["median_ms"]:>10.2f}ms{timing["p95_ms"]:>10.2f}ms'
+            style = self.style.SUCCESS if timing['p95_ms'] < BUDGET_MS else self.style.ERROR
+            self.stdout.write(style(line))
+
+    def seed(self, rng, students, courses):
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        insert_rows(Course._meta.db_table, ['id', 'name', 'code', 'description', 'updated_at'],
+                    ((c, f'Course {c}', f'C{c:04d}', '', now) for c in range(1, courses + 1)))
+        insert_rows(Student._meta.db_table,
+                    ['id', 'full_name', 'roll_number', 'email', 'course_id', 'photo_hash', 'updated_at'],
+                    ((s, f'Student {s}', f'R{s:08d}', f's{s}@example.com', s % courses + 1, '', now)
+                     for s in range(1, students + 1)))
+        # Integer scores out of 100 so plenty of students tie
+        insert_rows(Marks._meta.db_table,
+                    ['student_id', 'course_id', 'marks_obtained', 'total_marks', 'updated_at'],
+                    ((s, c, str(rng.randint(0, 100)), '100', now)
+                     for s in range(1, students + 1) for c in range(1, courses + 1)))
+        rebuild_summaries()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
@@ -0,0 +1,207 @@
+import datetime
+import json
+import math
+import platform
+import statistics
+import subprocess
+import time
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import urls
+from core.benchmarks import temporary_database
+from core.models import Student, Teacher
+from core.seeding import DatasetSeeder
+
+# <pk> is the student, teacher or course named in the route name,
+# except for these routes
+PK_OBJECTS = {
+    'students_in_group': 'course',
+    'teachers_in_group': 'course',
+    'student_result_card': 'student',
+}
+# Other URL parameters, by name
+PARAMETERS = {
+    'course_id': 'course',
+    'student_id': 'student',
+    'kind': 'marks',
+}
+QUERY_STRINGS = {
+    'search': {'q': 'Sharma'},
+}
+# Who requests each route; everything else is fetched as the admin
+ROUTE_USERS = {
+    'student_marks': 'student',
+}
+# A route this much slower than in the compared run is flagged
+REGRESSION_RATIO = 1.2
+
+
+class Command(BaseCommand):
+    help = (
+        'Time every page in core/urls.py with the test client at several data sizes, '
+        'each on a throwaway database, and write the results as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000', help='Comma separated student counts.')
+        parser.add_argument('--courses', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=5, help='Timed requests per route (after one warm-up).')
+        parser.add_argument('--routes', help='Comma separated route names (default: all).')
+        parser.add_argument('--output', '-o', help='Write the JSON results to this file.')
+        parser.add_argument('--compare', metavar='PATH', help='Earlier JSON results to compare against.')
+
+    def handle(self, *args, **options):
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError('--sizes must be comma separated numbers.')
+        wanted = set(options['routes'].split(',')) if options['routes'] else None
+        routes = [pattern for pattern in urls.urlpatterns if wanted is None or pattern.name in wanted]
+        previous = self.load(options['compare']) if options['compare'] else None
+
+        results = {
+            'generated': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'commit': self.commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': options['repeat'],
+            'sizes': [],
+        }
+        for students in sizes:
+            results['sizes'].append(self.run_size(students, options['courses'], routes, options['repeat']))
+
+        if options['output']:
+            with open(options['output'], 'w') as out:
+                json.dump(results, out, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
+        if previous:
+            self.compare(previous, results)
+
+    def run_size(self, students, courses, routes, repeat):
+        with temporary_database():
+            cache.clear()
+            self.stdout.write(f'\nSeeding {students} students in {courses} courses...')
+            start = time.monotonic()
+            DatasetSeeder(students, courses).run()
+            seed_seconds = time.monotonic() - start
+            clients, objects = self.prepare()
+
+            timings = {}
+            skipped = []
+            # No DEBUG query log, and the test client's host allowed
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver']):
+                for pattern in routes:
+                    url = self.url_for(pattern, objects)
+                    if url is None:
+                        skipped.append(pattern.name)
+                        continue
+                    client = clients[ROUTE_USERS.get(pattern.name, 'admin')]
+                    timings[pattern.name] = self.time_route(client, url, QUERY_STRINGS.get(pattern.name), repeat)
+            cache.clear()
+
+        self.stdout.write(f'{"route":<26}{"status":>7}{"queries":>9}{"p50":>11}{"p95":>11}{"KB":>9}')
+        for name, timing in timings.items():
+            self.stdout.write(
+                f'{name:<26}{timing["status"]:>7}{timing["queries"]:>9}{timing["median_ms"]:>9.1f}ms'
+                f'{timing["p95_ms"]:>9.1f}ms{timing["bytes"] / 1024:>9.1f}'
+            )
+        if skipped:
+            self.stderr.write(f'Skipped (no arguments known): {", ".join(skipped)}')
+        return {'students': students, 'courses': courses, 'seed_seconds': round(seed_seconds, 2),
+                'routes': timings}
+
+    def prepare(self):
+        """
+        Logins for an admin, a teacher and a student from the seeded data.
+        """
+        student = Student.objects.filter(marks__isnull=False).order_by('pk').first()
+        teacher = Teacher.objects.filter(assigned_courses=student.course_id).order_by('pk').first()
+        teacher.user = User.objects.create_user('bench-teacher', password='bench')
+        teacher.save()
+        student.user = User.objects.create_user('bench-student', password='bench')
+        student.save()
+
+        clients = {'admin': Client(), 'teacher': Client(), 'student': Client()}
+        clients['admin'].force_login(User.objects.create_superuser('bench-admin', 'admin@example.com', 'bench'))
+        clients['teacher'].force_login(teacher.user)
+        clients['student'].force_login(student.user)
+        objects = {'student': student.pk, 'teacher': teacher.pk, 'course': student.course_id, 'marks': 'marks'}
+        return clients, objects
+
+    def url_for(self, pattern, objects):
+        kwargs = {}
+        for parameter in pattern.pattern.converters:
+            if parameter == 'pk':
+                kind = PK_OBJECTS.get(pattern.name) or next(
+                    (word for word in pattern.name.split('_') if word in ('student', 'teacher', 'course')), None)
+            else:
+                kind = PARAMETERS.get(parameter)
+            if kind not in objects:
+                return None
+            kwargs[parameter] = objects[kind]
+        return reverse(pattern.name, kwargs=kwargs)
+
+    def time_route(self, client, url, query, repeat):
+        def fetch():
+            response = client.get(url, query)
+            # Streaming responses do their work while being read
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+            return response.status_code, len(body)
+
+        fetch()
+        timings = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                status, size = fetch()
+                timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        return {
+            'status': status,
+            'queries': len(queries) // repeat,
+            'bytes': size,
+            'median_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[math.ceil(len(timings) * 0.95) - 1], 2),
+        }
+
+    def commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def load(self, path):
+        try:
+            with open(path) as fileobj:
+                return json.load(fileobj)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+
+    def compare(self, previous, current):
+        before = {size['students']: size['routes'] for size in previous['sizes']}
+        self.stdout.write(f'\nCompared with {previous.get("commit") or "earlier run"} ({previous["generated"]}):')
+        for size in current['sizes']:
+            old_routes = before.get(size['students'])
+            if not old_routes:
+                continue
+            for name, timing in size['routes'].items():
+                old = old_routes.get(name)
+                if not old:
+                    continue
+                ratio = timing['median_ms'] / old['median_ms'] if old['median_ms'] else 1
+                line = (
+                    f'{size["students"]:>8} {name:<26}{old["median_ms"]:>9.1f}ms ->{timing["median_ms"]:>9.1f}ms'
+                    f'  x{ratio:.2f}  queries {old["queries"]} -> {timing["queries"]}'
+                )
+                worse = ratio > REGRESSION_RATIO or timing['queries'] > old['queries']
+                self.stdout.write(self.style.ERROR(line) if worse else line)
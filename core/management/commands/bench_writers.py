@@ -0,0 +1,206 @@
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import got_request_exception
+from django.db import OperationalError, close_old_connections, connection
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.benchmarks import temporary_database
+from core.models import Student, Course
+from core.seeding import DatasetSeeder
+
+# Database settings compared, as SMS_SQLITE_TUNING=0 and =1 set them
+CONFIGS = {
+    'default': {'pragmas': {}, 'immediate': False, 'conn_max_age': 0, 'timeout': 5},
+    'tuned': {'pragmas': settings.SQLITE_TUNED_PRAGMAS, 'immediate': True, 'conn_max_age': 600, 'timeout': 20},
+}
+# Students whose marks one grid POST changes
+GRID_ROWS = 25
+
+
+class Command(BaseCommand):
+    help = (
+        'Post bulk marks grids from several concurrent teachers while others read marks pages, '
+        'against a throwaway SQLite file, with the default and the tuned database settings.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=2000)
+        parser.add_argument('--courses', type=int, default=20)
+        parser.add_argument('--writers', default='2,8', help='Comma separated numbers of writing clients.')
+        parser.add_argument('--readers', type=int, default=4, help='Clients reading marks pages meanwhile.')
+        parser.add_argument('--posts', type=int, default=20, help='Grids posted by each writer.')
+        parser.add_argument('--configs', default=','.join(CONFIGS), help='Comma separated: default, tuned.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', '-o', help='Write the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['writers'].split(',')]
+        except ValueError:
+            raise CommandError('--writers must be comma separated numbers.')
+        names = options['configs'].split(',')
+        unknown = set(names) - set(CONFIGS)
+        if unknown:
+            raise CommandError(f'Unknown configs: {", ".join(sorted(unknown))}')
+        if connection.vendor != 'sqlite':
+            raise CommandError('This benchmark is for SQLite.')
+
+        results = []
+        self.stdout.write(
+            f'{"config":<9}{"writers":>8}{"posts/s":>9}{"p50":>11}{"p95":>11}'
+            f'{"reads/s":>9}{"locked":>8}{"errors":>8}{"connects":>10}'
+        )
+        for name in names:
+            for writers in levels:
+                result = dict(self.run_config(CONFIGS[name], writers, options), config=name, writers=writers)
+                results.append(result)
+                self.stdout.write(
+                    f'{name:<9}{writers:>8}{result["posts_per_second"]:>9.1f}{result["median_ms"]:>9.1f}ms'
+                    f'{result["p95_ms"]:>9.1f}ms{result["reads_per_second"]:>9.1f}{result["locked"]:>8}'
+                    f'{result["errors"]:>8}{result["connections"]:>10}'
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as out:
+                json.dump({'students': options['students'], 'readers': options['readers'],
+                           'posts': options['posts'], 'runs': results}, out, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
+
+    def run_config(self, config, writers, options):
+        """
+        One run on a new database file, so WAL mode (which is stored in
+        the file) does not carry over from the previous run.
+        """
+        database = connection.settings_dict
+        saved = database['CONN_MAX_AGE'], database['OPTIONS'].get('timeout')
+        database['CONN_MAX_AGE'] = config['conn_max_age']
+        database['OPTIONS']['timeout'] = config['timeout']
+        try:
+            with tempfile.TemporaryDirectory() as directory, \
+                    override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver'],
+                                      SQLITE_PRAGMAS=config['pragmas'],
+                                      SQLITE_IMMEDIATE_TRANSACTIONS=config['immediate']), \
+                    temporary_database(name=os.path.join(directory, 'bench.sqlite3')):
+                cache.clear()
+                DatasetSeeder(options['students'], options['courses'], seed=options['seed']).run()
+                result = self.run_clients(writers, options['readers'], options['posts'],
+                                          random.Random(options['seed']))
+                cache.clear()
+            return result
+        finally:
+            database['CONN_MAX_AGE'], database['OPTIONS']['timeout'] = saved
+
+    def run_clients(self, writers, readers, posts, rng):
+        admin = User.objects.create_superuser('bench-admin', 'admin@example.com', 'bench')
+        rosters = {}
+        for student_id, course_id in Student.objects.filter(course__isnull=False).values_list('pk', 'course_id'):
+            rosters.setdefault(course_id, []).append(student_id)
+        course_ids = list(Course.objects.filter(pk__in=rosters).values_list('pk', flat=True))
+        grids = [[self.grid(rng, rng.choice(course_ids), rosters) for _ in range(posts)] for _ in range(writers)]
+        # Logged in up front, so the runs do not include session writes
+        clients = []
+        for _ in range(writers + readers):
+            # Failed requests come back as 500s, sorted out in request()
+            client = Client(raise_request_exception=False)
+            client.force_login(admin)
+            clients.append(client)
+
+        lock = threading.Lock()
+        timings, outcomes, reads = [], [], []
+        writing = threading.Event()
+        writing.set()
+        opened = []
+        self.failures = {}
+
+        def count_connection(sender, connection, **kwargs):
+            opened.append(1)
+
+        def record_failure(sender, **kwargs):
+            # The test client would re-raise the exception in whichever
+            # client is waiting on a response, so it is kept per thread
+            self.failures[threading.get_ident()] = sys.exc_info()[1]
+
+        def write(client, jobs):
+            for course_id, data in jobs:
+                start = time.perf_counter()
+                outcome = self.request(client.post, reverse('bulk_marks', args=[course_id]), data)
+                with lock:
+                    timings.append(time.perf_counter() - start)
+                    outcomes.append(outcome)
+
+        def read(client, seed):
+            pick = random.Random(seed)
+            while writing.is_set():
+                outcome = self.request(client.get, reverse('course_marks_list', args=[pick.choice(course_ids)]))
+                with lock:
+                    reads.append(outcome)
+
+        connection_created.connect(count_connection, weak=False)
+        got_request_exception.connect(record_failure, weak=False)
+        try:
+            start = time.perf_counter()
+            threads = [threading.Thread(target=write, args=[clients[index], jobs])
+                       for index, jobs in enumerate(grids)]
+            readers = [threading.Thread(target=read, args=[clients[writers + seed], seed])
+                       for seed in range(readers)]
+            for thread in threads + readers:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            seconds = time.perf_counter() - start
+            writing.clear()
+            for thread in readers:
+                thread.join()
+        finally:
+            connection_created.disconnect(count_connection)
+            got_request_exception.disconnect(record_failure)
+
+        timings = sorted(timing * 1000 for timing in timings)
+        return {
+            'posts': len(timings),
+            'seconds': round(seconds, 3),
+            'posts_per_second': round(len(timings) / seconds, 1),
+            'median_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[math.ceil(len(timings) * 0.95) - 1], 2),
+            'reads_per_second': round(len(reads) / seconds, 1),
+            'locked': sum(outcome == 'locked' for outcome in outcomes + reads),
+            'errors': sum(outcome == 'error' for outcome in outcomes + reads),
+            'connections': len(opened),
+        }
+
+    def grid(self, rng, course_id, rosters):
+        """
+        (course id, POST data) of a marks grid for part of a course.
+        """
+        student_ids = rng.sample(rosters[course_id], min(GRID_ROWS, len(rosters[course_id])))
+        data = {'form-TOTAL_FORMS': str(len(student_ids)), 'form-INITIAL_FORMS': str(len(student_ids))}
+        for index, student_id in enumerate(student_ids):
+            data[f'form-{index}-student_id'] = student_id
+            data[f'form-{index}-marks_obtained'] = rng.randint(0, 100)
+            data[f'form-{index}-total_marks'] = 100
+        return course_id, data
+
+    def request(self, method, *args):
+        # The test client leaves connections open between requests; close
+        # them as the request_finished handler of a server does, which is
+        # where CONN_MAX_AGE makes a difference
+        response = method(*args)
+        close_old_connections()
+        if response.status_code in (200, 302):
+            return 'ok'
+        exc = self.failures.pop(threading.get_ident(), None)
+        return 'locked' if isinstance(exc, OperationalError) and 'locked' in str(exc) else 'error'
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from core.exports import EXPORTS, FORMATS, export_lines
+
+
+class Command(BaseCommand):
+    help = 'Stream students, marks or attendance to CSV or JSON Lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--format', dest='fmt', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--course', help='Only export rows for this course code.')
+        parser.add_argument('--from', dest='date_from', help='Attendance from this date (YYYY-MM-DD).')
+        parser.add_argument('--to', dest='date_to', help='Attendance up to this date (YYYY-MM-DD).')
+        parser.add_argument('--output', '-o', help='Write to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        filters = {'course': options['course']}
+        for key in ('date_from', 'date_to'):
+            if options[key]:
+                try:
+                    filters[key] = parse_date(options[key])
+                except ValueError:
+                    filters[key] = None
+                if filters[key] is None:
+                    raise CommandError(f'Invalid date "{options[key]}", expected YYYY-MM-DD.')
+
+        lines = export_lines(options['kind'], options['fmt'], **filters)
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as out:
+                out.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
@@ -0,0 +1,75 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import caching
+from core.models import Student
+from core.photos import build_derivatives
+
+CHUNK_SIZE = 100
+
+
+def build_chunk(photos):
+    """
+    Runs in a worker process: [(pk, hash or None, error or None)].
+    """
+    results = []
+    for pk, name in photos:
+        try:
+            results.append((pk, build_derivatives(name), None))
+        except Exception as exc:
+            results.append((pk, None, f'{type(exc).__name__}: {exc}'))
+    return results
+
+
+class Command(BaseCommand):
+    help = 'Create the resized copies of student profile photos that do not have them yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Reprocess every photo, not just the ones without thumbnails '
+                                 '(only missing thumbnail files are written).')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes (0 processes photos in this process).')
+
+    def handle(self, *args, **options):
+        students = Student.objects.exclude(profile_photo='').exclude(profile_photo__isnull=True)
+        if not options['all']:
+            students = students.filter(photo_hash='')
+        photos = list(students.order_by('pk').values_list('pk', 'profile_photo'))
+        chunks = [photos[start:start + CHUNK_SIZE] for start in range(0, len(photos), CHUNK_SIZE)]
+
+        start = time.monotonic()
+        done = failed = 0
+        if options['workers']:
+            with ProcessPoolExecutor(options['workers'], initializer=django.setup) as pool:
+                for results in pool.map(build_chunk, chunks):
+                    done, failed = self.save(results, done, failed, len(photos))
+        else:
+            for chunk in chunks:
+                done, failed = self.save(build_chunk(chunk), done, failed, len(photos))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {done - failed} photos in {time.monotonic() - start:.1f}s ({failed} failed).'
+        ))
+
+    def save(self, results, done, failed, total):
+        updated = []
+        now = timezone.now()
+        for pk, photo_hash, error in results:
+            if error:
+                failed += 1
+                self.stderr.write(f'student {pk}: {error}')
+            else:
+                updated.append(Student(pk=pk, photo_hash=photo_hash, updated_at=now))
+        # bulk_update: only the hash changes, so the only signal work
+        # needed is invalidating cached pages that show photos
+        Student.objects.bulk_update(updated, ['photo_hash', 'updated_at'])
+        caching.bump('student')
+        done += len(results)
+        self.stdout.write(f'{done}/{total} photos')
+        return done, failed
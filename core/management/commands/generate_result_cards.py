@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Course
+from core.result_cards import CHUNK_SIZE, ResultCardError, ResultCardWriter, student_keys
+
+
+class Command(BaseCommand):
+    help = 'Render PDF result cards for every student (or one course) into a ZIP file, resuming an earlier run.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--course', help='Only students of this course code.')
+        parser.add_argument('--output', '-o', help='ZIP file to write (default: result_cards[_<course>].zip).')
+        parser.add_argument('--workers', type=int, help='Render processes (default: one per CPU, 0 renders in this process).')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Students loaded per query.')
+        parser.add_argument('--restart', action='store_true',
+                            help='Discard the cards of earlier runs instead of resuming.')
+
+    def handle(self, *args, **options):
+        course = options['course']
+        if course and not Course.objects.filter(code=course).exists():
+            raise CommandError(f'No course with code "{course}".')
+        output = options['output'] or (f'result_cards_{course}.zip' if course else 'result_cards.zip')
+
+        def on_error(roll_number, message):
+            self.stderr.write(f'{roll_number}: {message}')
+
+        def progress(writer):
+            self.stdout.write(
+                f'{writer.done}/{writer.total} cards ({writer.written} written, {writer.skipped} already done, '
+                f'{writer.error_count} failed, {writer.cards_per_second:.0f} cards/sec)'
+            )
+
+        writer = ResultCardWriter(output, workers=options['workers'], chunk_size=options['chunk_size'],
+                                  on_error=on_error)
+        if options['restart']:
+            writer.discard()
+        try:
+            writer.run(student_keys(course), progress=progress)
+        except (OSError, ResultCardError) as exc:
+            raise CommandError(str(exc))
+        except BaseException:
+            self.stderr.write(f'Stopped after {writer.written} new cards; run the command again to resume.')
+            raise
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {writer.written} result cards to {output} ({writer.skipped} already there, '
+            f'{writer.error_count} failed, {writer.cards_per_second:.0f} cards/sec).'
+        ))
+        if writer.error_count:
+            self.stderr.write('Run the command again to retry the failed cards.')
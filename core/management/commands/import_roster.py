@@ -0,0 +1,55 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importers import IMPORTERS, BATCH_SIZE, ImportFileError, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk import students, teachers or courses from a CSV or XLSX file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS))
+        parser.add_argument('path', help='CSV or XLSX file with a header row.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Rows validated and inserted per transaction.')
+        parser.add_argument('--errors', metavar='PATH',
+                            help='Write every rejected row to this CSV file.')
+
+    def handle(self, *args, **options):
+        error_file = open(options['errors'], 'w', newline='') if options['errors'] else None
+        error_writer = csv.writer(error_file) if error_file else None
+        if error_writer:
+            error_writer.writerow(['line', 'error'])
+
+        def on_error(line, message):
+            if error_writer:
+                error_writer.writerow([line, message])
+            elif options['verbosity'] > 1:
+                self.stderr.write(f'line {line}: {message}')
+
+        def progress(importer):
+            self.stdout.write(
+                f'{importer.processed} rows processed, {importer.created} created, '
+                f'{importer.error_count} rejected ({importer.rows_per_second:.0f} rows/sec)'
+            )
+
+        importer = IMPORTERS[options['kind']](batch_size=options['batch_size'], on_error=on_error)
+        try:
+            with open(options['path'], 'rb') as fileobj:
+                importer.run(read_rows(fileobj, options['path']), progress=progress)
+        except (OSError, ImportFileError) as exc:
+            raise CommandError(str(exc))
+        finally:
+            if error_file:
+                error_file.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {importer.created} {options["kind"]} '
+            f'({importer.error_count} rows rejected, {importer.rows_per_second:.0f} rows/sec).'
+        ))
+        if importer.error_count and not error_writer and options['verbosity'] <= 1:
+            for line, message in importer.errors[:20]:
+                self.stderr.write(f'line {line}: {message}')
+            if importer.error_count > 20:
+                self.stderr.write('... run with --errors PATH to see every rejected row.')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.counters import rebuild_counts, get_dashboard_counts
+
+
+class Command(BaseCommand):
+    help = 'Recount the cached admin dashboard counters from the database.'
+
+    def handle(self, *args, **options):
+        rebuild_counts()
+        counts = get_dashboard_counts()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt dashboard counters: {counts["total_students"]} students, '
+            f'{counts["total_teachers"]} teachers, {counts["total_courses"]} courses.'
+        ))
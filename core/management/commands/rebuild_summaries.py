@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.summaries import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute every student result summary (totals, pass/fail counts, class ranks) from the marks.'
+
+    def handle(self, *args, **options):
+        start = time.monotonic()
+        written = rebuild_summaries()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {written} result summaries in {time.monotonic() - start:.1f}s.'
+        ))
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.seeding import DatasetSeeder
+
+
+class Command(BaseCommand):
+    help = 'Add a large synthetic dataset (courses, teachers, students, marks, attendance) for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=10_000)
+        parser.add_argument('--courses', type=int, default=50)
+        parser.add_argument('--teachers', type=int, help='Default: one per 30 students.')
+        parser.add_argument('--marks-per-student', type=int, default=5)
+        parser.add_argument('--days', type=int, default=5, help='School days of attendance per student.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if options['students'] < 1 or options['courses'] < 1:
+            raise CommandError('--students and --courses must be at least 1.')
+        if options['teachers'] is not None and options['teachers'] < 1:
+            raise CommandError('--teachers must be at least 1.')
+
+        def progress(table, rows, seconds):
+            if rows is None:
+                self.stdout.write(f'  rebuilt {table} in {seconds:.1f}s')
+            else:
+                rate = rows / seconds if seconds else 0
+                self.stdout.write(f'  {table}: {rows} rows in {seconds:.1f}s ({rate:,.0f} rows/sec)')
+
+        start = time.monotonic()
+        seeder = DatasetSeeder(
+            options['students'], options['courses'], teachers=options['teachers'],
+            marks_per_student=options['marks_per_student'], days=options['days'], seed=options['seed'],
+        ).run(progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {sum(seeder.written.values()):,} rows in {time.monotonic() - start:.1f}s.'
+        ))
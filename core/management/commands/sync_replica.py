@@ -0,0 +1,46 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the primary SQLite database over the read replica file (SMS_DB_REPLICA), '
+        'once or every --interval seconds. Stands in for replication when running locally.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--to', metavar='PATH', help='Replica file (default: the replica database).')
+        parser.add_argument('--interval', type=float, help='Keep copying, this many seconds apart.')
+
+    def handle(self, *args, **options):
+        source = connections[DEFAULT_DB_ALIAS]
+        if source.vendor != 'sqlite':
+            raise CommandError('sync_replica copies SQLite files; use the database\'s own replication.')
+        path = options['to']
+        if not path:
+            if not settings.REPLICA_DATABASE:
+                raise CommandError('No replica configured: set SMS_DB_REPLICA or pass --to.')
+            path = connections[settings.REPLICA_DATABASE].settings_dict['NAME']
+
+        while True:
+            start = time.monotonic()
+            self.copy(source, path)
+            self.stdout.write(self.style.SUCCESS(
+                f'Copied {source.settings_dict["NAME"]} to {path} in {time.monotonic() - start:.2f}s.'
+            ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def copy(self, source, path):
+        source.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            # One consistent snapshot of the primary, written in one step
+            source.connection.backup(target)
+        finally:
+            target.close()
@@ -0,0 +1,237 @@
+"""
+Per-view request metrics: SQL query count, database time, template
+render time, response size and latency.
+
+MetricsMiddleware measures every request and adds it to the totals of
+the resolved view name (e.g. "course_marks_list"). The totals live in
+the memory of each server process, like most Prometheus client
+libraries keep them, and are shown on the admin metrics page and in
+Prometheus text format at metrics/prometheus/.
+
+Views can declare how many queries they are allowed with @query_budget.
+A request over budget is logged; with QUERY_BUDGET_STRICT on (as in the
+QueryBudgetTests) it raises QueryBudgetExceeded instead, which fails the
+test that made the request.
+"""
+import contextvars
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# The measurements of the request being handled by this thread or task
+current = contextvars.ContextVar('request_metrics', default=None)
+
+_lock = threading.Lock()
+_views = {}
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised in strict mode when a view runs more queries than its budget.
+    """
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Installed with connection.execute_wrapper() for the request
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - start
+            self.queries += 1
+
+
+class ViewStats:
+    def __init__(self, name):
+        self.name = name
+        self.requests = 0
+        self.queries = 0
+        self.max_queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.response_bytes = 0
+        self.seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.budget = None
+        self.over_budget = 0
+
+    def add(self, request_metrics, seconds, response_bytes, budget):
+        self.requests += 1
+        self.queries += request_metrics.queries
+        self.max_queries = max(self.max_queries, request_metrics.queries)
+        self.db_seconds += request_metrics.db_seconds
+        self.template_seconds += request_metrics.template_seconds
+        self.response_bytes += response_bytes
+        self.seconds += seconds
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.budget = budget
+        if budget is not None and request_metrics.queries > budget:
+            self.over_budget += 1
+
+    def average(self, total):
+        return total / self.requests if self.requests else 0
+
+    # Per-request averages for the metrics page
+    @property
+    def avg_queries(self):
+        return self.average(self.queries)
+
+    @property
+    def avg_db_ms(self):
+        return self.average(self.db_seconds) * 1000
+
+    @property
+    def avg_template_ms(self):
+        return self.average(self.template_seconds) * 1000
+
+    @property
+    def avg_ms(self):
+        return self.average(self.seconds) * 1000
+
+    @property
+    def avg_kb(self):
+        return self.average(self.response_bytes) / 1024
+
+
+# ---------------------------------------------------
+# RECORDING
+# ---------------------------------------------------
+
+def query_budget(limit):
+    """
+    Declares the most queries a GET of the view may run, counting the
+    session and user lookups. Usage: @query_budget(8) above the view.
+    """
+    def decorator(view_func):
+        # Set on the function itself; decorators applied on top copy it
+        # through functools.wraps
+        view_func.query_budget = limit
+        return view_func
+    return decorator
+
+def record(view_name, request_metrics, seconds, response_bytes, budget=None):
+    with _lock:
+        stats = _views.get(view_name)
+        if stats is None:
+            stats = _views[view_name] = ViewStats(view_name)
+        stats.add(request_metrics, seconds, response_bytes, budget)
+
+def check_budget(view_name, request_metrics, budget):
+    if budget is None or request_metrics.queries <= budget:
+        return
+    message = f'{view_name} ran {request_metrics.queries} queries, over its budget of {budget}'
+    if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+        raise QueryBudgetExceeded(message)
+    logger.warning(message)
+
+def snapshot():
+    """
+    Copies of the per-view totals, most queries per request first.
+    """
+    with _lock:
+        views = [_copy(stats) for stats in _views.values()]
+    return sorted(views, key=lambda stats: (-stats.avg_queries, stats.name))
+
+def _copy(stats):
+    copy = ViewStats(stats.name)
+    copy.__dict__.update(stats.__dict__, buckets=list(stats.buckets))
+    return copy
+
+def reset():
+    with _lock:
+        _views.clear()
+
+
+# ---------------------------------------------------
+# TEMPLATE TIMING
+# ---------------------------------------------------
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The Django template backend, timing every top-level render for the
+    current request's metrics. Included templates are part of their
+    parent's render, and so are queries run from the template.
+    """
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        request_metrics = current.get()
+        if request_metrics is None:
+            return self.template.render(context, request)
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            request_metrics.template_seconds += time.perf_counter() - start
+
+
+# ---------------------------------------------------
+# PROMETHEUS
+# ---------------------------------------------------
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def prometheus_text(views):
+    """
+    The per-view totals in the Prometheus text exposition format.
+    """
+    lines = []
+
+    def metric(name, kind, help_text, value_of):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for stats in views:
+            lines.append(f'{name}{{view="{_label(stats.name)}"}} {value_of(stats)}')
+
+    metric('sms_view_requests_total', 'counter', 'Requests handled.', lambda stats: stats.requests)
+    metric('sms_view_queries_total', 'counter', 'SQL queries run.', lambda stats: stats.queries)
+    metric('sms_view_queries_max', 'gauge', 'Most SQL queries run by one request.',
+           lambda stats: stats.max_queries)
+    metric('sms_view_db_seconds_total', 'counter', 'Time spent running SQL queries.',
+           lambda stats: repr(stats.db_seconds))
+    metric('sms_view_template_seconds_total', 'counter', 'Time spent rendering templates.',
+           lambda stats: repr(stats.template_seconds))
+    metric('sms_view_response_bytes_total', 'counter', 'Response body bytes sent.',
+           lambda stats: stats.response_bytes)
+    metric('sms_view_over_query_budget_total', 'counter', 'Requests that ran more queries than the view budget.',
+           lambda stats: stats.over_budget)
+
+    lines.append('# HELP sms_view_duration_seconds Request latency.')
+    lines.append('# TYPE sms_view_duration_seconds histogram')
+    for stats in views:
+        label = _label(stats.name)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), stats.buckets):
+            cumulative += count
+            lines.append(f'sms_view_duration_seconds_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+        lines.append(f'sms_view_duration_seconds_sum{{view="{label}"}} {stats.seconds!r}')
+        lines.append(f'sms_view_duration_seconds_count{{view="{label}"}} {stats.requests}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,159 @@
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import metrics, routers
+from .roles import resolve_request_roles
+
+
+class RoleMiddleware:
+    """
+    Resolves the logged-in user's roles once per request and exposes them
+    as request.roles. Must come after AuthenticationMiddleware.
+
+    This also loads request.user, so async views can read the user and
+    its roles without touching the database.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.roles = resolve_request_roles(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.roles = await sync_to_async(resolve_request_roles)(request)
+        return await self.get_response(request)
+
+
+class MetricsMiddleware:
+    """
+    Records the query count, database and template time, response size
+    and latency of every request under its resolved view name (see
+    core/metrics.py). Goes first so the session and user lookups are
+    counted too.
+
+    Under ASGI the ORM runs in a thread of its own for each request, and
+    connections belong to a thread, so the query counter is installed
+    from that thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current.set(request_metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                self.count_queries(stack, request_metrics)
+                response = self.get_response(request)
+        finally:
+            metrics.current.reset(token)
+        return self.record(request, response, request_metrics, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+
+        request_metrics = metrics.RequestMetrics()
+        token = metrics.current.set(request_metrics)
+        start = time.perf_counter()
+        stack = ExitStack()
+        try:
+            await sync_to_async(self.count_queries)(stack, request_metrics)
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+            metrics.current.reset(token)
+        return self.record(request, response, request_metrics, time.perf_counter() - start)
+
+    def count_queries(self, stack, request_metrics):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(request_metrics))
+
+    def record(self, request, response, request_metrics, seconds):
+        match = request.resolver_match
+        if match is None:
+            # Not a known URL; there is no view to file it under
+            return response
+        if response.streaming:
+            size = int(response.get('Content-Length') or 0)
+        else:
+            size = len(response.content)
+        # Budgets cover page loads; form posts write as much as they are sent
+        budget = getattr(match.func, 'query_budget', None) if request.method in ('GET', 'HEAD') else None
+        metrics.record(match.view_name, request_metrics, seconds, size, budget)
+        metrics.check_budget(match.view_name, request_metrics, budget)
+        return response
+
+
+class ReplicaMiddleware:
+    """
+    Lets the reads of a GET or HEAD request go to the read replica (see
+    core/routers.py), unless the browser wrote something in the last
+    REPLICA_PIN_SECONDS. A request that writes pins its browser for that
+    long. Goes before SessionMiddleware, so a session saved on the way
+    out counts as a write. Not used without settings.REPLICA_DATABASE.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REPLICA_DATABASE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        routing = self.routing(request)
+        token = routers.current.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.current.reset(token)
+        return self.pin(response, routing)
+
+    async def __acall__(self, request):
+        routing = self.routing(request)
+        # Copied into the threads the ORM runs in; they share the object
+        token = routers.current.set(routing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.current.reset(token)
+        return self.pin(response, routing)
+
+    def routing(self, request):
+        pinned = request.method not in ('GET', 'HEAD') or routers.PIN_COOKIE in request.COOKIES
+        return routers.RequestRouting(pinned)
+
+    def pin(self, response, routing):
+        if routing.wrote:
+            response.set_cookie(routers.PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
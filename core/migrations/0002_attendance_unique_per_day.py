@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:10
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_attendance(apps, schema_editor):
+    # Keep the most recent row for every (student, course, date) so the
+    # unique constraint below can be created.
+    Attendance = apps.get_model('core', 'Attendance')
+    duplicates = (
+        Attendance.objects.values('student_id', 'course_id', 'date')
+        .annotate(keep_id=Max('id'), copies=Count('id'))
+        .filter(copies__gt=1)
+    )
+    for row in list(duplicates):
+        Attendance.objects.filter(
+            student_id=row['student_id'], course_id=row['course_id'], date=row['date'],
+        ).exclude(id=row['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_attendance, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='attendance',
+            constraint=models.UniqueConstraint(fields=('student', 'course', 'date'), name='unique_attendance_per_day'),
+        ),
+    ]
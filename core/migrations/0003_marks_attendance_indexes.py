@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:11
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def remove_duplicate_marks(apps, schema_editor):
+    # Views used .first() and silently hid duplicate marks. Keep the most
+    # recent row for every (student, course) so the unique constraint
+    # below can be created.
+    Marks = apps.get_model('core', 'Marks')
+    duplicates = (
+        Marks.objects.values('student_id', 'course_id')
+        .annotate(keep_id=Max('id'), copies=Count('id'))
+        .filter(copies__gt=1)
+    )
+    for row in list(duplicates):
+        Marks.objects.filter(
+            student_id=row['student_id'], course_id=row['course_id'],
+        ).exclude(id=row['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_attendance_unique_per_day'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_marks, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['course', 'date'], name='attendance_course_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['student', 'date'], name='attendance_student_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='marks',
+            index=models.Index(fields=['course', 'student'], name='marks_course_student_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='marks',
+            constraint=models.UniqueConstraint(fields=('student', 'course'), name='unique_marks_per_student_course'),
+        ),
+    ]
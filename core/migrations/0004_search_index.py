@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:40
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # Full-text search uses SQLite's FTS5; other databases fall back to
+    # icontains filters (see core/search.py).
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE core_search_index USING fts5("
+        "title, detail, body, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    # Rank names over codes/emails over descriptions
+    schema_editor.execute(
+        "INSERT INTO core_search_index (core_search_index, rank) VALUES ('rank', 'bm25(10.0, 5.0, 1.0)')"
+    )
+    # rowid = id * 4 + kind (1 student, 2 teacher, 3 course)
+    schema_editor.execute(
+        "INSERT INTO core_search_index (rowid, title, detail, body) "
+        "SELECT id * 4 + 1, full_name, roll_number || ' ' || email, '' FROM core_student"
+    )
+    schema_editor.execute(
+        "INSERT INTO core_search_index (rowid, title, detail, body) "
+        "SELECT id * 4 + 2, name, email, '' FROM core_teacher"
+    )
+    schema_editor.execute(
+        "INSERT INTO core_search_index (rowid, title, detail, body) "
+        "SELECT id * 4 + 3, name, code, description FROM core_course"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS core_search_index')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_marks_attendance_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:28
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum, Value
+import django.db.models.deletion
+
+
+def fill_summaries(apps, schema_editor):
+    # Summaries for the marks entered so far, ranked within each course
+    # (the same rules as core/summaries.py at the time of writing).
+    Student = apps.get_model('core', 'Student')
+    Marks = apps.get_model('core', 'Marks')
+    StudentResultSummary = apps.get_model('core', 'StudentResultSummary')
+
+    totals = Marks.objects.order_by().values('student_id').annotate(
+        obtained=Sum('marks_obtained'),
+        possible=Sum('total_marks'),
+        courses=Count('id'),
+        passed=Count('id', filter=Q(marks_obtained__gte=F('total_marks') * Value(Decimal('0.4')))),
+    )
+    courses = dict(Student.objects.values_list('pk', 'course_id'))
+    summaries = []
+    for row in totals:
+        obtained, possible = Decimal(row['obtained'] or 0), Decimal(row['possible'] or 0)
+        summaries.append(StudentResultSummary(
+            student_id=row['student_id'],
+            total_obtained=obtained,
+            total_possible=possible,
+            percentage=(obtained * 100 / possible).quantize(Decimal('0.01')) if possible else Decimal(0),
+            courses_passed=row['passed'],
+            courses_failed=row['courses'] - row['passed'],
+        ))
+
+    # Competition ranking by percentage within each course
+    ranked = sorted(
+        (summary for summary in summaries if summary.total_possible and courses[summary.student_id]),
+        key=lambda summary: (courses[summary.student_id], -summary.percentage),
+    )
+    course, position, rank, previous = None, 0, None, None
+    for summary in ranked:
+        if courses[summary.student_id] != course:
+            course, position, previous = courses[summary.student_id], 0, None
+        position += 1
+        if summary.percentage != previous:
+            rank, previous = position, summary.percentage
+        summary.class_rank = rank
+
+    StudentResultSummary.objects.bulk_create(summaries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentResultSummary',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='result_summary', serialize=False, to='core.student')),
+                ('total_obtained', models.DecimalField(decimal_places=2, default=0, max_digits=9)),
+                ('total_possible', models.DecimalField(decimal_places=2, default=0, max_digits=9)),
+                ('percentage', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('courses_passed', models.PositiveIntegerField(default=0)),
+                ('courses_failed', models.PositiveIntegerField(default=0)),
+                ('class_rank', models.PositiveIntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:38
+
+from django.db import migrations, models
+import django.db.models.expressions
+import django.db.models.functions.comparison
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_student_result_summary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='marks',
+            index=models.Index(models.F('course'), models.ExpressionWrapper(django.db.models.expressions.CombinedExpression(django.db.models.functions.comparison.Cast('marks_obtained', models.FloatField()), '/', models.F('total_marks')), output_field=models.FloatField()), name='marks_course_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='studentresultsummary',
+            index=models.Index(fields=['percentage', 'total_possible'], name='summary_percentage_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+
+def dense_class_ranks(apps, schema_editor):
+    # class_rank used to skip ahead after ties (1, 2, 2, 4); re-rank every
+    # course densely (1, 2, 2, 3) like core/summaries.py now does.
+    StudentResultSummary = apps.get_model('core', 'StudentResultSummary')
+    rows = (
+        StudentResultSummary.objects.exclude(student__course=None)
+        .order_by('student__course_id', '-percentage')
+        .values_list('pk', 'student__course_id', 'percentage', 'total_possible', 'class_rank')
+    )
+    changed = []
+    course, rank, previous = None, 0, None
+    for pk, course_id, percentage, possible, old_rank in rows.iterator(chunk_size=2000):
+        if course_id != course:
+            course, rank, previous = course_id, 0, None
+        new_rank = None
+        if possible:
+            if percentage != previous:
+                rank, previous = rank + 1, percentage
+            new_rank = rank
+        if new_rank != old_rank:
+            changed.append(StudentResultSummary(pk=pk, class_rank=new_rank))
+    StudentResultSummary.objects.bulk_update(changed, ['class_rank'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_fragment_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(dense_class_ranks, migrations.RunPython.noop),
+    ]
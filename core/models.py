@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import ExpressionWrapper, F
+from django.db.models.functions import Cast
 from django.contrib.auth.models import User
 
 # Course Model
@@ -6,6 +8,7 @@ class Course(models.Model):
     name = models.CharField(max_length=100)
     code = models.CharField(max_length=20, unique=True)
     description = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -19,6 +22,9 @@ class Student(models.Model):
     course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True, blank=True)
     dob = models.DateField(null=True, blank=True)
     profile_photo = models.ImageField(upload_to='student_photos/', null=True, blank=True)
+    # Content hash naming the photo's resized copies (see core/photos.py)
+    photo_hash = models.CharField(max_length=16, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.full_name} ({self.roll_number})"
@@ -29,6 +35,7 @@ class Teacher(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField()
     assigned_courses = models.ManyToManyField(Course, related_name='teachers')
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -43,6 +50,17 @@ class Attendance(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     date = models.DateField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # One roll-call entry per student, course and day (lets roll-call upsert)
+            models.UniqueConstraint(fields=['student', 'course', 'date'], name='unique_attendance_per_day'),
+        ]
+        indexes = [
+            models.Index(fields=['course', 'date'], name='attendance_course_date_idx'),
+            models.Index(fields=['student', 'date'], name='attendance_student_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student} - {self.course} - {self.date}"
@@ -53,6 +71,66 @@ class Marks(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE)
     marks_obtained = models.DecimalField(max_digits=5, decimal_places=2)
     total_marks = models.DecimalField(max_digits=5, decimal_places=2)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            # A student has at most one mark per course; also serves
+            # the (student, course) and student-only lookups.
+            models.UniqueConstraint(fields=['student', 'course'], name='unique_marks_per_student_course'),
+        ]
+        indexes = [
+            # Course rosters: marks of a course joined to its students
+            models.Index(fields=['course', 'student'], name='marks_course_student_idx'),
+            # Course rankings group a course's marks by score (see core/ranking.py)
+            models.Index(
+                F('course'),
+                ExpressionWrapper(Cast('marks_obtained', models.FloatField()) / F('total_marks'),
+                                  output_field=models.FloatField()),
+                name='marks_course_score_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.student} - {self.course} - {self.marks_obtained}/{self.total_marks}"
+
+# Result Summary Model
+class StudentResultSummary(models.Model):
+    """
+    Denormalised totals of a student's marks, kept current by
+    core/summaries.py so result cards read one row instead of
+    recomputing from every Marks row.
+    """
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='result_summary')
+    total_obtained = models.DecimalField(max_digits=9, decimal_places=2, default=0)
+    total_possible = models.DecimalField(max_digits=9, decimal_places=2, default=0)
+    percentage = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    courses_passed = models.PositiveIntegerField(default=0)
+    courses_failed = models.PositiveIntegerField(default=0)
+    # Position by percentage among students of the same course (1 = best);
+    # empty for students without marks or a course
+    class_rank = models.PositiveIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Overall ranking groups students by percentage; total_possible
+            # is included so the "has marks" filter needs no table lookups
+            models.Index(fields=['percentage', 'total_possible'], name='summary_percentage_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student} - {self.percentage}%"
+
+# Fragment Version Model
+class FragmentVersion(models.Model):
+    """
+    Version number of one model's rows, part of the key of every cached
+    page fragment showing them (see core/caching.py).
+    """
+    name = models.CharField(max_length=20, primary_key=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}={self.version}"
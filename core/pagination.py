@@ -0,0 +1,140 @@
+"""
+Keyset (seek) pagination for the list pages.
+
+Instead of OFFSET, each page remembers the key of its first and last row
+and the next page asks for rows after that key:
+
+    WHERE roll_number > 'R01234' ORDER BY roll_number LIMIT 51
+
+With an index on the key this costs the same on page 1 and page 400.
+The key must be unique so the ordering is stable.
+"""
+from urllib.parse import urlencode
+
+from django.core.exceptions import ValidationError
+from django.utils.functional import cached_property
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class KeysetPage:
+    """
+    One page of `queryset` ordered by the unique field `key`.
+    Rows are only fetched when the page is first used, so an unused page
+    costs no query.
+    """
+    def __init__(self, queryset, key, after=None, before=None, page_size=DEFAULT_PAGE_SIZE, params=None):
+        self.queryset = queryset
+        self.key = key
+        self.after = after
+        self.before = before
+        self.page_size = page_size
+        # Other query parameters to keep in the navigation links
+        self.params = params or {}
+
+    def _window(self):
+        """
+        The rows of this page plus one (to know whether another page
+        exists), and whether they come in reverse order.
+        """
+        if self.before is not None:
+            window = (
+                self.queryset.filter(**{f'{self.key}__lt': self.before})
+                .order_by(f'-{self.key}')[:self.page_size + 1]
+            )
+            return window, True
+        queryset = self.queryset
+        if self.after is not None:
+            queryset = queryset.filter(**{f'{self.key}__gt': self.after})
+        return queryset.order_by(self.key)[:self.page_size + 1], False
+
+    def _split(self, rows, reverse):
+        more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        return (rows[::-1] if reverse else rows), more
+
+    @cached_property
+    def _rows(self):
+        window, reverse = self._window()
+        return self._split(list(window), reverse)
+
+    async def aload(self):
+        """
+        Fetches the page with async iteration, for async views.
+        """
+        window, reverse = self._window()
+        self._rows = self._split([row async for row in window], reverse)
+        return self
+
+    @property
+    def object_list(self):
+        return self._rows[0]
+
+    @property
+    def has_next(self):
+        if self.before is not None:
+            return True
+        return self._rows[1]
+
+    @property
+    def has_previous(self):
+        if self.before is not None:
+            return self._rows[1]
+        return self.after is not None
+
+    def _query(self, **cursor):
+        params = dict(self.params)
+        if self.page_size != DEFAULT_PAGE_SIZE:
+            params['size'] = self.page_size
+        params.update(cursor)
+        return urlencode(params)
+
+    @property
+    def first_query(self):
+        return self._query()
+
+    @property
+    def next_query(self):
+        rows = self.object_list
+        return self._query(after=getattr(rows[-1], self.key)) if rows else self._query()
+
+    @property
+    def previous_query(self):
+        rows = self.object_list
+        return self._query(before=getattr(rows[0], self.key)) if rows else self._query()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+def paginate_keyset(request, queryset, key='pk', keep=()):
+    """
+    Builds a KeysetPage from the request's ?after=, ?before= and ?size=
+    parameters. Invalid cursors fall back to the first page and the page
+    size is clamped to MAX_PAGE_SIZE. `keep` names other query parameters
+    to carry over into the navigation links.
+    """
+    try:
+        page_size = int(request.GET.get('size', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        page_size = DEFAULT_PAGE_SIZE
+    page_size = min(max(page_size, 1), MAX_PAGE_SIZE)
+
+    meta = queryset.model._meta
+    field = meta.pk if key == 'pk' else meta.get_field(key)
+
+    def cursor(name):
+        value = request.GET.get(name)
+        if value in (None, ''):
+            return None
+        try:
+            return field.to_python(value)
+        except ValidationError:
+            return None
+
+    params = {name: request.GET[name] for name in keep if request.GET.get(name)}
+    return KeysetPage(queryset, key, after=cursor('after'), before=cursor('before'),
+                      page_size=page_size, params=params)
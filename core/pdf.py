@@ -0,0 +1,85 @@
+"""
+A very small PDF writer for text-only documents such as result cards.
+
+Only the standard Helvetica fonts are used, so nothing is embedded and a
+one-page card is a couple of kilobytes. Text is encoded as Latin-1;
+characters outside it are replaced with '?'.
+"""
+import zlib
+
+# A4 in points
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+
+FONTS = {
+    'regular': ('F1', 'Helvetica'),
+    'bold': ('F2', 'Helvetica-Bold'),
+}
+
+
+def escape(value):
+    text = str(value).replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return text.encode('latin-1', 'replace')
+
+
+class Page:
+    """
+    One page of drawing commands. Coordinates are in points from the
+    bottom left corner.
+    """
+    def __init__(self):
+        self.commands = []
+
+    def text(self, x, y, value, size=10, font='regular'):
+        self.commands.append(
+            b'BT /%s %d Tf %.2f %.2f Td (%s) Tj ET' % (FONTS[font][0].encode(), size, x, y, escape(value))
+        )
+
+    def line(self, x1, y1, x2, y2, width=0.5):
+        self.commands.append(b'%.2f w %.2f %.2f m %.2f %.2f l S' % (width, x1, y1, x2, y2))
+
+    def box(self, x, y, width, height, gray=0.9):
+        """A filled rectangle, 0 is black and 1 is white."""
+        self.commands.append(b'q %.2f g %.2f %.2f %.2f %.2f re f Q' % (gray, x, y, width, height))
+
+    def content(self):
+        return zlib.compress(b'\n'.join(self.commands))
+
+
+def render(pages, title=''):
+    """
+    Returns the bytes of a PDF document made of the given Pages.
+    """
+    # Objects 1-4 are the catalog, the page tree and the two fonts; each
+    # page then adds a page object and its content stream.
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+            b' '.join(b'%d 0 R' % (5 + 2 * index) for index in range(len(pages))), len(pages),
+        ),
+    ]
+    for name, base_font in FONTS.values():
+        objects.append(
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % base_font.encode()
+        )
+    for index, page in enumerate(pages):
+        content = page.content()
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R '
+            b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>' % (PAGE_WIDTH, PAGE_HEIGHT, 6 + 2 * index)
+        )
+        objects.append(b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(content), content))
+    objects.append(b'<< /Title (%s) /Producer (Student Management System) >>' % escape(title))
+
+    out = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+        len(objects) + 1, len(objects), xref,
+    )
+    return bytes(out)
@@ -0,0 +1,79 @@
+"""
+Course access checks: may this user work on course X?
+
+Admins may access every course; teachers only the courses they are
+assigned to. A teacher's answer is found with an EXISTS query on the
+indexed teacher/course assignment table instead of loading every
+assigned course, and each answer is remembered on the teacher object for
+the rest of the request. Nothing is kept between requests, so a revoked
+assignment takes effect on the very next request.
+
+login_required here is Django's, extended to async views.
+"""
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required as django_login_required
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import redirect
+
+from .models import Teacher
+from .routers import primary
+from .roles import ADMIN, TEACHER, get_roles
+
+Assignment = Teacher.assigned_courses.through
+
+
+def login_required(view_func):
+    """
+    Django's login_required, which in Django 4.2 only wraps sync views.
+    """
+    if not iscoroutinefunction(view_func):
+        return django_login_required(view_func)
+
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        # request.user is loaded lazily, which queries the database
+        if await sync_to_async(lambda: request.user.is_authenticated)():
+            return await view_func(request, *args, **kwargs)
+        return redirect_to_login(request.get_full_path())
+    return wrapper
+
+@primary()
+def teacher_has_course(teacher_id, course_id):
+    """
+    Single indexed EXISTS query on the assignment table, on the primary
+    so a revoked assignment never lingers on a lagging replica.
+    """
+    return Assignment.objects.filter(teacher_id=teacher_id, course_id=course_id).exists()
+
+def can_access_course(user, course_id):
+    """
+    True if `user` is an admin or a teacher assigned to `course_id`.
+    """
+    roles = get_roles(user)
+    if ADMIN in roles:
+        return True
+    if TEACHER not in roles:
+        return False
+
+    # {course_id: allowed}, for the rest of this request
+    teacher = user.teacher
+    answers = teacher.__dict__.setdefault('_course_access', {})
+    if course_id not in answers:
+        answers[course_id] = teacher_has_course(teacher.pk, course_id)
+    return answers[course_id]
+
+def course_access_required(view_func):
+    """
+    Decorator for views taking a `course_id` argument. Users who may not
+    access the course are sent back to the marks dashboard.
+    """
+    @wraps(view_func)
+    def wrapper(request, course_id, *args, **kwargs):
+        if not can_access_course(request.user, course_id):
+            messages.error(request, "You are not assigned to this course.")
+            return redirect('marks_dashboard')
+        return view_func(request, course_id, *args, **kwargs)
+    return wrapper
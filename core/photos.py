@@ -0,0 +1,120 @@
+"""
+Resized copies of student profile photos.
+
+Pages show photos at 80px or 150px, so serving the original upload
+(often several megabytes) wastes bandwidth. Each photo gets square
+derivatives at the sizes in PHOTO_SIZES, in WebP and in JPEG for
+browsers without WebP support, stored under a name made from a hash of
+the original's content:
+
+    photos/3f/3fa1c2d4e5b60718_80.webp
+    photos/3f/3fa1c2d4e5b60718_80.jpg
+    photos/3f/3fa1c2d4e5b60718_240.webp
+    photos/3f/3fa1c2d4e5b60718_240.jpg
+
+A new upload gets a new hash and so new URLs, which means the files
+never change once written and can be served with a far-future
+Cache-Control header (see serve_photo). Identical uploads share their
+derivatives.
+
+Derivatives are made when a photo is uploaded through add_student or
+edit_student; `manage.py generate_photo_thumbnails` backfills the rest.
+"""
+import hashlib
+import io
+import logging
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.views.static import serve
+from PIL import Image, ImageOps
+
+from . import caching
+from .models import Student
+
+logger = logging.getLogger(__name__)
+
+# Edge lengths in pixels. 240 is also the high-density (3x) version of 80.
+PHOTO_SIZES = (80, 240)
+# Pillow format -> (file extension, save options). Pages offer the WebP
+# copy first and fall back to the JPEG one.
+PHOTO_FORMATS = {
+    'webp': ('webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('jpg', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+PHOTO_DIR = 'photos'
+
+# Derivatives never change, so browsers may keep them for a year
+CACHE_SECONDS = 365 * 24 * 60 * 60
+
+
+def content_hash(fileobj):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: fileobj.read(64 * 1024), b''):
+        digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+def derivative_name(photo_hash, size, fmt='webp'):
+    return f'{PHOTO_DIR}/{photo_hash[:2]}/{photo_hash}_{size}.{PHOTO_FORMATS[fmt][0]}'
+
+def derivative_url(photo_hash, size, fmt='webp'):
+    """
+    URL of the smallest derivative at least `size` pixels wide.
+    """
+    fitting = [candidate for candidate in PHOTO_SIZES if candidate >= size] or [PHOTO_SIZES[-1]]
+    return default_storage.url(derivative_name(photo_hash, fitting[0], fmt))
+
+def build_derivatives(name):
+    """
+    Writes the derivatives of the stored file `name` (skipping ones that
+    already exist) and returns its content hash.
+    """
+    with default_storage.open(name, 'rb') as original:
+        photo_hash = content_hash(original)
+        missing = [
+            (size, fmt) for size in PHOTO_SIZES for fmt in PHOTO_FORMATS
+            if not default_storage.exists(derivative_name(photo_hash, size, fmt))
+        ]
+        if not missing:
+            return photo_hash
+        original.seek(0)
+        with Image.open(original) as image:
+            # Phone photos are often stored sideways with an EXIF rotation
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            thumbnails = {}
+            for size, fmt in missing:
+                if size not in thumbnails:
+                    thumbnails[size] = ImageOps.fit(image, (size, size), Image.LANCZOS)
+                out = io.BytesIO()
+                thumbnails[size].save(out, fmt, **PHOTO_FORMATS[fmt][1])
+                default_storage.save(derivative_name(photo_hash, size, fmt), ContentFile(out.getvalue()))
+    return photo_hash
+
+def process_photo(student):
+    """
+    Builds the derivatives of a student's current photo and records its
+    hash. A photo that cannot be processed is logged and left without
+    derivatives, so pages fall back to the original.
+    """
+    photo_hash = ''
+    if student.profile_photo:
+        try:
+            photo_hash = build_derivatives(student.profile_photo.name)
+        except (OSError, Image.DecompressionBombError):
+            logger.exception('Could not make thumbnails for %s', student.profile_photo.name)
+    # update() rather than save(): nothing else about the student changed
+    Student.objects.filter(pk=student.pk).update(photo_hash=photo_hash, updated_at=timezone.now())
+    caching.bump('student')
+    student.photo_hash = photo_hash
+    return photo_hash
+
+def serve_photo(request, path):
+    """
+    Serves derivatives with a far-future Cache-Control header when Django
+    serves media itself (DEBUG). In production the web server should do
+    the same for MEDIA_URL + 'photos/'.
+    """
+    response = serve(request, path, document_root=default_storage.path(PHOTO_DIR))
+    response['Cache-Control'] = f'public, max-age={CACHE_SECONDS}, immutable'
+    return response
@@ -0,0 +1,370 @@
+"""
+Batch PDF result cards.
+
+Students are read in chunks, one query per chunk, as plain values that
+can be sent to other processes. The cards are rendered on a
+ProcessPoolExecutor and written one by one into a ZIP file on disk, so
+only a few chunks are ever held in memory.
+
+Each card is stored as <roll_number>-<pk>.pdf (the pk keeps names unique
+when roll numbers differ only in characters that are not allowed in file
+names).
+
+When writing to a path, finished cards are first saved one file each in
+a <output>.parts directory, and the ZIP is assembled from them (and from
+the cards of an earlier ZIP) once every card is done; it replaces the old
+ZIP only when complete. A run that is stopped at any point, even killed
+outright, leaves every finished card on disk, and rerunning skips the
+students whose card is in the ZIP or the directory, so it picks up where
+it stopped and retries the cards that failed.
+"""
+import os
+import shutil
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+import django
+from django.utils import timezone
+
+from . import pdf
+from .models import Student
+from .summaries import PASS_RATIO
+
+CHUNK_SIZE = 200
+
+# Only this many card errors are kept in memory; the rest are counted.
+MAX_STORED_ERRORS = 1000
+
+# Appended to the output path for the directory of finished cards
+STAGING_SUFFIX = '.parts'
+# Every rendered card ends with this; a staged file without it was cut
+# short by a crash and is rendered again
+PDF_END = b'%%EOF\n'
+
+CARD_COLUMNS = (
+    'pk', 'full_name', 'roll_number', 'course__code', 'course__name',
+    'result_summary__total_obtained', 'result_summary__total_possible', 'result_summary__percentage',
+    'result_summary__courses_passed', 'result_summary__courses_failed', 'result_summary__class_rank',
+    'marks__course__code', 'marks__course__name', 'marks__marks_obtained', 'marks__total_marks',
+)
+
+
+class ResultCardError(Exception):
+    """
+    Raised when the output file cannot be used.
+    """
+
+
+def card_name(pk, roll_number):
+    safe = roll_number.replace('/', '_').replace('\\', '_')
+    return f'{safe}-{pk}.pdf'
+
+def student_keys(course=None):
+    """
+    (pk, roll_number) of the students to print, in roll number order.
+    """
+    students = Student.objects.order_by('roll_number')
+    if course:
+        students = students.filter(course__code=course)
+    return students.values_list('pk', 'roll_number')
+
+
+# ---------------------------------------------------
+# LOADING (main process)
+# ---------------------------------------------------
+
+def load_cards(student_ids):
+    """
+    Card data for the given students as plain dicts, in one query: the
+    students are joined to their summary and their marks, one row per
+    mark (or one row with empty mark columns for a student without marks).
+    """
+    generated = timezone.localdate().isoformat()
+    cards = {}
+    rows = (
+        Student.objects.filter(pk__in=student_ids)
+        .order_by('roll_number', 'marks__course__code')
+        .values_list(*CARD_COLUMNS)
+    )
+    for row in rows:
+        values = dict(zip(CARD_COLUMNS, row))
+        card = cards.get(values['pk'])
+        if card is None:
+            card = cards[values['pk']] = {
+                'pk': values['pk'],
+                'full_name': values['full_name'],
+                'roll_number': values['roll_number'],
+                'course': ' - '.join(filter(None, [values['course__code'], values['course__name']])),
+                'total_obtained': values['result_summary__total_obtained'],
+                'total_possible': values['result_summary__total_possible'],
+                'percentage': values['result_summary__percentage'],
+                'courses_passed': values['result_summary__courses_passed'],
+                'courses_failed': values['result_summary__courses_failed'],
+                'class_rank': values['result_summary__class_rank'],
+                'generated': generated,
+                'marks': [],
+            }
+        if values['marks__course__code'] is not None:
+            obtained, total = values['marks__marks_obtained'], values['marks__total_marks']
+            card['marks'].append({
+                'code': values['marks__course__code'],
+                'name': values['marks__course__name'],
+                'obtained': obtained,
+                'total': total,
+                'percentage': obtained * 100 / total if total else Decimal(0),
+                'passed': obtained >= total * PASS_RATIO,
+            })
+    return list(cards.values())
+
+
+# ---------------------------------------------------
+# RENDERING (worker processes)
+# ---------------------------------------------------
+
+# Left edge of each column of the marks table
+TABLE_COLUMNS = [('Code', 50), ('Course', 120), ('Obtained', 330), ('Total', 395), ('%', 450), ('Status', 500)]
+
+def render_card(card):
+    """
+    The PDF bytes of one result card.
+    """
+    pages = [pdf.Page()]
+    page = pages[0]
+    top = pdf.PAGE_HEIGHT - 50
+    page.box(40, top - 45, pdf.PAGE_WIDTH - 80, 55)
+    page.text(50, top - 10, 'Result Card', size=20, font='bold')
+    page.text(50, top - 32, 'Student Management System', size=10)
+
+    y = top - 80
+    for label, value in [('Name', card['full_name']), ('Roll No', card['roll_number']),
+                         ('Course', card['course'] or '-')]:
+        page.text(50, y, label, font='bold')
+        page.text(120, y, value)
+        y -= 16
+
+    if card['total_possible']:
+        y -= 10
+        rank = f"#{card['class_rank']}" if card['class_rank'] else '-'
+        for label, value in [
+            ('Total', f"{card['total_obtained']} / {card['total_possible']}"),
+            ('Overall', f"{card['percentage']:.1f}%"),
+            ('Passed / Failed', f"{card['courses_passed']} / {card['courses_failed']}"),
+            ('Class Rank', rank),
+        ]:
+            page.text(50, y, label, font='bold')
+            page.text(150, y, value)
+            y -= 16
+
+    def header(page, y):
+        for title, x in TABLE_COLUMNS:
+            page.text(x, y, title, font='bold')
+        page.line(45, y - 6, pdf.PAGE_WIDTH - 45, y - 6)
+        return y - 22
+
+    y = header(page, y - 24)
+    for mark in card['marks']:
+        if y < 60:
+            page = pdf.Page()
+            pages.append(page)
+            y = header(page, pdf.PAGE_HEIGHT - 50)
+        values = [mark['code'], mark['name'][:38], mark['obtained'], mark['total'],
+                  f"{mark['percentage']:.1f}", 'Pass' if mark['passed'] else 'Fail']
+        for (title, x), value in zip(TABLE_COLUMNS, values):
+            page.text(x, y, value)
+        y -= 16
+    if not card['marks']:
+        page.text(50, y, 'No marks uploaded yet.')
+
+    for number, page in enumerate(pages, start=1):
+        page.text(50, 30, f"Generated on {card['generated']}", size=8)
+        page.text(pdf.PAGE_WIDTH - 90, 30, f'Page {number} of {len(pages)}', size=8)
+    return pdf.render(pages, title=f"Result Card - {card['roll_number']}")
+
+def render_cards(cards):
+    """
+    Renders a chunk of cards. Returns (pk, roll_number, pdf bytes, error)
+    tuples; a card that fails has no bytes and an error message, and the
+    rest of the chunk is still rendered.
+    """
+    results = []
+    for card in cards:
+        try:
+            results.append((card['pk'], card['roll_number'], render_card(card), None))
+        except Exception as exc:
+            results.append((card['pk'], card['roll_number'], None, f'{type(exc).__name__}: {exc}'))
+    return results
+
+
+# ---------------------------------------------------
+# WRITING THE ZIP
+# ---------------------------------------------------
+
+class ResultCardWriter:
+    """
+    Renders result cards into a ZIP. `output` is a path (which makes the
+    run resumable) or a binary file object. `workers` is the process pool
+    size; 0 renders in this process.
+    """
+    def __init__(self, output, workers=None, chunk_size=CHUNK_SIZE, on_error=None):
+        self.output = output
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.chunk_size = chunk_size
+        self.on_error = on_error
+        self.total = 0
+        self.skipped = 0
+        self.written = 0
+        self.error_count = 0
+        self.errors = []
+        self.started = None
+        self.staging = None
+        self.store = None
+        if isinstance(output, (str, os.PathLike)):
+            self.staging = os.fspath(output) + STAGING_SUFFIX
+
+    @property
+    def cards_per_second(self):
+        elapsed = time.monotonic() - self.started if self.started else 0
+        return self.written / elapsed if elapsed else 0.0
+
+    @property
+    def done(self):
+        return self.skipped + self.written + self.error_count
+
+    def previous_archive(self):
+        """
+        The ZIP of an earlier run, opened for reading, or None.
+        """
+        if not (os.path.exists(self.output) and os.path.getsize(self.output)):
+            return None
+        if not zipfile.is_zipfile(self.output):
+            raise ResultCardError(f'{self.output} is not a readable ZIP file; delete it to start over.')
+        return zipfile.ZipFile(self.output)
+
+    def finished_cards(self):
+        """
+        Names of the cards an earlier run finished, in its ZIP or staged.
+        """
+        names = set()
+        previous = self.previous_archive()
+        if previous:
+            with previous:
+                names.update(previous.namelist())
+        for name in os.listdir(self.staging):
+            path = os.path.join(self.staging, name)
+            if name.endswith('.pdf') and _ends_with(path, PDF_END):
+                names.add(name)
+        return names
+
+    def discard(self):
+        """
+        Removes the ZIP and the cards of earlier runs, to start over.
+        """
+        if os.path.exists(self.output):
+            os.remove(self.output)
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+    def run(self, students, progress=None):
+        """
+        Writes a card for every (pk, roll_number) in `students` that an
+        earlier run did not finish. `progress` is called with the writer
+        after each chunk.
+        """
+        self.started = time.monotonic()
+        if self.staging is None:
+            # Cards are compressed PDFs already, so they are stored as they are
+            with zipfile.ZipFile(self.output, 'w', compression=zipfile.ZIP_STORED) as archive:
+                self.store = archive.writestr
+                self.render(students, set(), progress)
+            return self
+
+        os.makedirs(self.staging, exist_ok=True)
+        self.store = self.stage
+        self.render(students, self.finished_cards(), progress)
+        self.pack()
+        return self
+
+    def render(self, students, finished, progress):
+        todo = []
+        for pk, roll_number in students:
+            self.total += 1
+            if card_name(pk, roll_number) in finished:
+                self.skipped += 1
+            else:
+                todo.append(pk)
+        chunks = (todo[start:start + self.chunk_size] for start in range(0, len(todo), self.chunk_size))
+
+        if not self.workers:
+            for chunk in chunks:
+                self.write(render_cards(load_cards(chunk)), progress)
+            return
+
+        # Keep a couple of chunks queued per worker while the main
+        # process loads the next chunk and writes finished ones
+        pending = deque()
+        pool = ProcessPoolExecutor(self.workers, initializer=django.setup)
+        try:
+            for chunk in chunks:
+                pending.append(pool.submit(render_cards, load_cards(chunk)))
+                if len(pending) >= self.workers * 2:
+                    self.write(pending.popleft().result(), progress)
+            while pending:
+                self.write(pending.popleft().result(), progress)
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+    def write(self, results, progress=None):
+        for pk, roll_number, content, error in results:
+            if error:
+                self.add_error(roll_number, error)
+            else:
+                self.store(card_name(pk, roll_number), content)
+                self.written += 1
+        if progress:
+            progress(self)
+
+    def stage(self, name, content):
+        path = os.path.join(self.staging, name)
+        # Written under another name first, so a card file is never seen
+        # half written
+        with open(path + '.tmp', 'wb') as fileobj:
+            fileobj.write(content)
+        os.replace(path + '.tmp', path)
+
+    def pack(self):
+        """
+        Writes the ZIP from the earlier ZIP's cards and the staged ones,
+        replaces the old ZIP with it and removes the staged cards.
+        """
+        partial = os.fspath(self.output) + '.tmp'
+        with zipfile.ZipFile(partial, 'w', compression=zipfile.ZIP_STORED) as archive:
+            packed = set()
+            previous = self.previous_archive()
+            if previous:
+                with previous:
+                    for info in previous.infolist():
+                        archive.writestr(info, previous.read(info))
+                        packed.add(info.filename)
+            for name in sorted(os.listdir(self.staging)):
+                path = os.path.join(self.staging, name)
+                if name.endswith('.pdf') and name not in packed and _ends_with(path, PDF_END):
+                    archive.write(path, name)
+        os.replace(partial, self.output)
+        shutil.rmtree(self.staging)
+
+    def add_error(self, roll_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_STORED_ERRORS:
+            self.errors.append((roll_number, message))
+        if self.on_error:
+            self.on_error(roll_number, message)
+
+def _ends_with(path, suffix):
+    with open(path, 'rb') as fileobj:
+        fileobj.seek(0, os.SEEK_END)
+        if fileobj.tell() < len(suffix):
+            return False
+        fileobj.seek(-len(suffix), os.SEEK_END)
+        return fileobj.read() == suffix
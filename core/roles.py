@@ -0,0 +1,40 @@
+"""
+Role resolution: which of admin / teacher / student a user is.
+
+Roles are worked out once and cached on the user object, so repeated
+is_teacher()/is_student() checks, the context processor and templates all
+share one answer. Together with RoleAwareModelBackend (which loads the
+teacher/student profiles in the same query as the user) this makes role
+checks free of extra queries.
+"""
+ADMIN = 'admin'
+TEACHER = 'teacher'
+STUDENT = 'student'
+
+
+def get_roles(user):
+    """
+    Returns the frozenset of roles for `user`, computing it at most once
+    per user object.
+    """
+    roles = getattr(user, '_sms_roles', None)
+    if roles is None:
+        roles = set()
+        if user.is_authenticated:
+            if user.is_superuser:
+                roles.add(ADMIN)
+            if hasattr(user, 'teacher'):
+                roles.add(TEACHER)
+            if hasattr(user, 'student'):
+                roles.add(STUDENT)
+        roles = frozenset(roles)
+        user._sms_roles = roles
+    return roles
+
+def resolve_request_roles(request):
+    """
+    Returns the roles of request.user. The profiles were loaded with the
+    user, so this costs no queries, and a deleted profile or a changed
+    superuser flag takes effect on the next request.
+    """
+    return get_roles(request.user)
@@ -0,0 +1,84 @@
+"""
+Read/write splitting between the primary database and a read replica.
+
+With settings.REPLICA_DATABASE set, ReplicaRouter sends the page reads of
+core models to the replica and everything else to the primary:
+
+- Every write goes to the primary.
+- A request that writes reads from the primary from then on, so it sees
+  its own changes. Reads inside a transaction do the same.
+- ReplicaMiddleware also pins the browser that wrote to the primary for
+  REPLICA_PIN_SECONDS, so the page it is redirected to after a form post
+  shows the change even if the replica has not caught up yet.
+- Users and sessions are always read from the primary, so a login or
+  logout takes effect at once.
+- Outside requests (management commands, the shell) everything is read
+  from the primary.
+
+Data cached for a long time and kept current by the write signals (the
+dashboard counters, course access answers) must be computed from the
+primary; wrap those reads in `with primary():`. Cached page fragments
+need no such care: their versions (core/caching.py) are a table read
+with the same routing as the page, so a fragment rendered from a lagging
+replica is stored under the replica's versions, which requests reading
+the primary have already moved past.
+"""
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Apps whose models may be read from the replica
+REPLICA_APPS = {'core'}
+# Set on a browser for REPLICA_PIN_SECONDS after a request that wrote
+PIN_COOKIE = 'read_primary'
+
+
+class RequestRouting:
+    """
+    Routing state of the current request.
+    """
+    def __init__(self, pinned):
+        # Reads go to the primary
+        self.pinned = pinned
+        # The request wrote to the database
+        self.wrote = False
+
+# None outside requests and inside primary() blocks
+current = contextvars.ContextVar('request_routing', default=None)
+
+
+@contextmanager
+def primary():
+    """
+    Reads in the block go to the primary.
+    """
+    token = current.set(None)
+    try:
+        yield
+    finally:
+        current.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = current.get()
+        if (routing is None or routing.pinned or model._meta.app_label not in REPLICA_APPS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return settings.REPLICA_DATABASE
+
+    def db_for_write(self, model, **hints):
+        routing = current.get()
+        if routing is not None:
+            routing.pinned = routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same rows
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary, migrations included
+        return db == DEFAULT_DB_ALIAS
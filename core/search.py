@@ -0,0 +1,175 @@
+"""
+Full-text search over students, teachers and courses.
+
+On SQLite the searchable text lives in an FTS5 virtual table (created by
+migration 0004) with one row per object. The row's rowid encodes the
+object as `id * 4 + kind`, so saving or deleting an object touches one
+row by primary key. The signal handlers in core/signals.py keep the table
+in step with single saves and deletes; bulk paths call index_objects()
+themselves and `manage.py rebuild_search_index` rebuilds it from scratch.
+
+Queries are prefix matches on every word ("ann le" finds "Anne Lee") and
+results are ranked with bm25, weighting names over codes/emails over
+descriptions. Other databases fall back to icontains filters.
+"""
+import re
+from collections import namedtuple
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Student, Teacher, Course
+
+TABLE = 'core_search_index'
+DEFAULT_LIMIT = 50
+# Only this many matches are ranked. bm25 costs ~2 ms per thousand rows,
+# so a very common word ("lee" in a 500k roster) would otherwise spend
+# most of its time ranking rows nobody will page through.
+RANK_CANDIDATES = 5000
+
+KIND_CODES = {'student': 1, 'teacher': 2, 'course': 3}
+MODELS = {'student': Student, 'teacher': Teacher, 'course': Course}
+MODEL_KINDS = {model: kind for kind, model in MODELS.items()}
+
+# Indexed columns per kind: (title, detail, body)
+FIELDS = {
+    'student': (('full_name',), ('roll_number', 'email'), ()),
+    'teacher': (('name',), ('email',), ()),
+    'course': (('name',), ('code',), ('description',)),
+}
+
+SearchResult = namedtuple('SearchResult', ['kind', 'object'])
+
+WORD_RE = re.compile(r'\w+')
+
+
+def is_enabled():
+    return connection.vendor == 'sqlite'
+
+def match_expression(query):
+    """
+    Turns free text into an FTS5 query: every word must match as a prefix.
+    Returns '' when the text has no words.
+    """
+    return ' '.join(f'"{word}"*' for word in WORD_RE.findall(query.lower()))
+
+# ---------------------------------------------------
+# INDEXING
+# ---------------------------------------------------
+
+def _row(kind, obj):
+    columns = [' '.join(str(getattr(obj, name) or '') for name in names) for names in FIELDS[kind]]
+    return [obj.pk * 4 + KIND_CODES[kind]] + columns
+
+def index_objects(objects):
+    """
+    Adds or replaces the index rows of saved Student/Teacher/Course objects.
+    """
+    if not is_enabled():
+        return
+    rows = [_row(MODEL_KINDS[type(obj)], obj) for obj in objects]
+    if rows:
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT OR REPLACE INTO {TABLE} (rowid, title, detail, body) VALUES (%s, %s, %s, %s)',
+                rows,
+            )
+
+def remove_object(obj):
+    if not is_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [obj.pk * 4 + KIND_CODES[MODEL_KINDS[type(obj)]]])
+
+def rebuild():
+    """
+    Rebuilds the whole index with one INSERT ... SELECT per model.
+    Returns the number of indexed objects per kind.
+    """
+    counts = {}
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        for kind, model in MODELS.items():
+            columns = [
+                " || ' ' || ".join(f'COALESCE({connection.ops.quote_name(name)}, \'\')' for name in names) or "''"
+                for names in FIELDS[kind]
+            ]
+            cursor.execute(
+                f'INSERT INTO {TABLE} (rowid, title, detail, body) '
+                f'SELECT id * 4 + {KIND_CODES[kind]}, {", ".join(columns)} FROM {model._meta.db_table}'
+            )
+            counts[kind] = cursor.rowcount
+        # Merge the b-tree segments left behind by the bulk insert
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return counts
+
+# ---------------------------------------------------
+# QUERYING
+# ---------------------------------------------------
+
+def search_ids(query, kinds=None, limit=DEFAULT_LIMIT):
+    """
+    Returns [(kind, id), ...], best match first.
+    """
+    kinds = kinds or list(MODELS)
+    if not is_enabled():
+        return _fallback_ids(query, kinds, limit)
+
+    expression = match_expression(query)
+    if not expression:
+        return []
+    codes = {KIND_CODES[kind]: kind for kind in kinds}
+    sql = f'SELECT rowid, rank FROM {TABLE} WHERE {TABLE} MATCH %s'
+    if len(codes) < len(KIND_CODES):
+        sql += ' AND rowid %% 4 IN ({})'.format(', '.join(str(code) for code in codes))
+    sql = f'SELECT rowid FROM ({sql} LIMIT %s) ORDER BY rank LIMIT %s'
+    params = [expression, max(RANK_CANDIDATES, limit), limit]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [(codes[rowid % 4], rowid // 4) for rowid, in cursor.fetchall()]
+
+def _fallback_ids(query, kinds, limit):
+    words = WORD_RE.findall(query)
+    if not words:
+        return []
+    hits = []
+    for kind in kinds:
+        names = [name for group in FIELDS[kind] for name in group]
+        condition = Q()
+        for word in words:
+            condition &= Q.create([(f'{name}__icontains', word) for name in names], connector=Q.OR)
+        ids = MODELS[kind].objects.filter(condition).order_by('pk').values_list('pk', flat=True)[:limit]
+        hits.extend((kind, pk) for pk in ids)
+    return hits[:limit]
+
+def search(query, kinds=None, limit=DEFAULT_LIMIT):
+    """
+    Returns SearchResult(kind, object) tuples, best match first.
+    Objects are loaded with one query per kind.
+    """
+    hits = search_ids(query, kinds, limit)
+    objects = {}
+    for kind in {kind for kind, pk in hits}:
+        queryset = MODELS[kind].objects.all()
+        if kind == 'student':
+            queryset = queryset.select_related('course')
+        objects[kind] = queryset.in_bulk([pk for hit_kind, pk in hits if hit_kind == kind])
+    return [
+        SearchResult(kind, objects[kind][pk])
+        for kind, pk in hits if pk in objects[kind]
+    ]
+
+def id_subquery(kind, query):
+    """
+    SQL expression selecting the ids of every `kind` object matching
+    `query`, for use as `pk__in=` (e.g. in admin search). None when full
+    text search is not available.
+    """
+    expression = match_expression(query)
+    if not is_enabled() or not expression:
+        return None
+    return RawSQL(
+        f'SELECT rowid / 4 FROM {TABLE} WHERE {TABLE} MATCH %s AND rowid %% 4 = {KIND_CODES[kind]}',
+        [expression],
+    )
@@ -0,0 +1,260 @@
+"""
+Synthetic school data at scale, for load testing.
+
+DatasetSeeder writes courses, teachers (with course assignments),
+students, marks and attendance straight into the tables with
+executemany(), then fills in what bulk inserts bypass: result summaries,
+the dashboard counters, the search index and the cached page versions.
+New rows get ids after the existing ones, so it can add to a database
+that already has data.
+
+The new students' summaries and class ranks are computed with one
+INSERT ... SELECT and a RANK() window instead of rebuild_summaries(),
+which goes through the ORM a batch at a time and takes minutes for a
+million students. Seeded students only take seeded courses, so no
+existing student's rank changes.
+"""
+import datetime
+import random
+import time
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import caching, counters, search
+from .benchmarks import insert_rows
+from .models import Student, Teacher, Course, Marks, Attendance, StudentResultSummary
+from .summaries import PASS_RATIO
+
+FIRST_NAMES = [
+    'Aarav', 'Aditi', 'Ananya', 'Arjun', 'Diya', 'Ishaan', 'Kavya', 'Krishna', 'Meera', 'Nikhil',
+    'Priya', 'Rahul', 'Riya', 'Rohan', 'Saanvi', 'Sneha', 'Tanvi', 'Varun', 'Vihaan', 'Zara',
+    'Emma', 'Liam', 'Olivia', 'Noah', 'Sophia', 'Lucas', 'Amara', 'Mateo', 'Yuki', 'Omar',
+]
+LAST_NAMES = [
+    'Sharma', 'Patel', 'Reddy', 'Iyer', 'Nair', 'Gupta', 'Mehta', 'Das', 'Rao', 'Singh',
+    'Khan', 'Joshi', 'Kapoor', 'Bose', 'Menon', 'Smith', 'Garcia', 'Chen', 'Okafor', 'Silva',
+]
+SUBJECTS = [
+    ('MAT', 'Mathematics'), ('PHY', 'Physics'), ('CHE', 'Chemistry'), ('BIO', 'Biology'),
+    ('CSE', 'Computer Science'), ('ENG', 'English'), ('HIS', 'History'), ('ECO', 'Economics'),
+    ('GEO', 'Geography'), ('ART', 'Fine Arts'), ('MUS', 'Music'), ('PSY', 'Psychology'),
+]
+TOTAL_MARKS = 100
+PRESENT_RATE = 0.9
+
+# SQLite page cache while seeding, in KiB. With the default 2 MB every
+# index insert goes to disk once the tables grow.
+SEED_CACHE_KIB = 256 * 1024
+
+SUMMARY_SQL = """
+    INSERT INTO {summary} (student_id, total_obtained, total_possible, percentage,
+                           courses_passed, courses_failed, class_rank, updated_at)
+    SELECT student_id, obtained, possible, percentage, passed, courses - passed,
+           CASE WHEN possible > 0 THEN
+               DENSE_RANK() OVER (PARTITION BY course_id, possible > 0 ORDER BY percentage DESC)
+           END,
+           %s
+    FROM (
+        SELECT student.id AS student_id, student.course_id,
+               COALESCE(SUM(marks.marks_obtained), 0) AS obtained,
+               COALESCE(SUM(marks.total_marks), 0) AS possible,
+               COALESCE(ROUND(SUM(marks.marks_obtained) * 100.0 / SUM(marks.total_marks), 2), 0) AS percentage,
+               COUNT(marks.id) AS courses,
+               COUNT(CASE WHEN marks.marks_obtained >= marks.total_marks * %s THEN 1 END) AS passed
+        FROM {student} AS student
+        LEFT JOIN {marks} AS marks ON marks.student_id = student.id
+        WHERE student.id >= %s
+        GROUP BY student.id, student.course_id
+    ) AS totals
+"""
+
+
+def next_id(model):
+    return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+def school_days(start, count):
+    day = start
+    while count:
+        if day.weekday() < 5:
+            yield day
+            count -= 1
+        day += datetime.timedelta(days=1)
+
+@contextmanager
+def large_sqlite_cache():
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA cache_size')
+        previous = cursor.fetchone()[0]
+        cursor.execute(f'PRAGMA cache_size = -{SEED_CACHE_KIB}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA cache_size = {previous}')
+
+
+class DatasetSeeder:
+    """
+    Adds `students` students and `courses` courses, plus by default one
+    teacher per 30 students. Every student is enrolled in one course,
+    has marks in `marks_per_student` different courses and an attendance
+    record for each of `days` school days.
+    """
+    def __init__(self, students, courses, teachers=None, marks_per_student=5, days=5, seed=42,
+                 start_date=datetime.date(2026, 1, 5)):
+        self.students = students
+        self.courses = courses
+        self.teachers = max(students // 30, 1) if teachers is None else teachers
+        self.marks_per_student = min(marks_per_student, courses)
+        self.days = days
+        self.start_date = start_date
+        self.rng = random.Random(seed)
+        # {table: rows written}
+        self.written = {}
+        self.progress = None
+
+    def run(self, progress=None):
+        """
+        Seeds everything. `progress` is called with (step, rows, seconds)
+        after each table or rebuild; rows is None for rebuilds.
+        """
+        self.progress = progress
+        # One updated_at for every seeded row, in the database's format
+        self.now = connection.ops.adapt_datetimefield_value(timezone.now())
+        with large_sqlite_cache(), transaction.atomic():
+            self.seed_courses()
+            self.seed_teachers()
+            self.seed_students()
+            self.seed_marks()
+            self.seed_attendance()
+            self.seed_summaries()
+        # Bulk inserts skip the signals that keep these up to date
+        self.timed('dashboard counters', counters.rebuild_counts)
+        self.timed('search index', search.rebuild)
+        caching.bump(*caching.MODELS)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        return self
+
+    def report(self, name, rows, seconds):
+        if rows is not None:
+            self.written[name] = rows
+        if self.progress:
+            self.progress(name, rows, seconds)
+
+    def timed(self, name, func):
+        start = time.monotonic()
+        func()
+        self.report(name, None, time.monotonic() - start)
+
+    def insert(self, model, columns, rows):
+        start = time.monotonic()
+        count = 0
+
+        def counted():
+            nonlocal count
+            for row in rows:
+                count += 1
+                yield row
+        insert_rows(model._meta.db_table, columns, counted())
+        self.report(model._meta.db_table, count, time.monotonic() - start)
+
+    def home_course(self, index):
+        return self.course_ids[index % self.courses]
+
+    # ---------------------------------------------------
+    # TABLES
+    # ---------------------------------------------------
+
+    def seed_courses(self):
+        first = next_id(Course)
+        self.course_ids = list(range(first, first + self.courses))
+        # A typical mark per course, so some courses are harder than others
+        self.difficulty = {course_id: self.rng.uniform(50, 75) for course_id in self.course_ids}
+
+        def rows():
+            for index, course_id in enumerate(self.course_ids):
+                code, subject = SUBJECTS[index % len(SUBJECTS)]
+                level = 101 + 100 * (index // len(SUBJECTS) % 4)
+                yield (course_id, f'{subject} {level}', f'{code}{course_id}', f'{subject} at level {level}.',
+                       self.now)
+        self.insert(Course, ['id', 'name', 'code', 'description', 'updated_at'], rows())
+
+    def seed_teachers(self):
+        first = next_id(Teacher)
+        teacher_ids = range(first, first + self.teachers)
+
+        def rows():
+            for teacher_id in teacher_ids:
+                first_name, last_name = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+                yield (teacher_id, f'{first_name} {last_name}',
+                       f'{first_name}.{last_name}.t{teacher_id}@example.edu'.lower(), self.now)
+        self.insert(Teacher, ['id', 'name', 'email', 'updated_at'], rows())
+
+        def assignments():
+            # Every course gets a teacher, and teachers take one to three courses
+            taken = {teacher_id: set() for teacher_id in teacher_ids}
+            for index, course_id in enumerate(self.course_ids):
+                taken[teacher_ids[index % self.teachers]].add(course_id)
+            for teacher_id in teacher_ids:
+                wanted = min(self.rng.randint(1, 3), self.courses)
+                while len(taken[teacher_id]) < wanted:
+                    taken[teacher_id].add(self.rng.choice(self.course_ids))
+                for course_id in sorted(taken[teacher_id]):
+                    yield teacher_id, course_id
+        self.insert(Teacher.assigned_courses.through, ['teacher_id', 'course_id'], assignments())
+
+    def seed_students(self):
+        self.first_student = next_id(Student)
+
+        def rows():
+            for index in range(self.students):
+                student_id = self.first_student + index
+                first_name, last_name = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+                dob = datetime.date(2000, 1, 1) + datetime.timedelta(days=self.rng.randrange(8 * 365))
+                yield (student_id, f'{first_name} {last_name}', f'S{student_id:08d}',
+                       f'{first_name}.{last_name}{student_id}@example.edu'.lower(),
+                       self.home_course(index), dob.isoformat(), '', self.now)
+        self.insert(Student, ['id', 'full_name', 'roll_number', 'email', 'course_id', 'dob', 'photo_hash',
+                              'updated_at'], rows())
+
+    def seed_marks(self):
+        # The home course plus courses spread evenly after it, so
+        # (student, course) stays unique
+        stride = max(self.courses // self.marks_per_student, 1)
+        gauss = self.rng.gauss
+
+        def rows():
+            for index in range(self.students):
+                for offset in range(self.marks_per_student):
+                    course_id = self.home_course(index + offset * stride)
+                    score = min(max(round(gauss(self.difficulty[course_id], 15)), 0), TOTAL_MARKS)
+                    yield self.first_student + index, course_id, score, TOTAL_MARKS, self.now
+        self.insert(Marks, ['student_id', 'course_id', 'marks_obtained', 'total_marks', 'updated_at'], rows())
+
+    def seed_attendance(self):
+        chance = self.rng.random
+
+        def rows():
+            for day in school_days(self.start_date, self.days):
+                date = day.isoformat()
+                for index in range(self.students):
+                    status = 'Present' if chance() < PRESENT_RATE else 'Absent'
+                    yield self.first_student + index, self.home_course(index), date, status, self.now
+        self.insert(Attendance, ['student_id', 'course_id', 'date', 'status', 'updated_at'], rows())
+
+    def seed_summaries(self):
+        start = time.monotonic()
+        sql = SUMMARY_SQL.format(
+            summary=StudentResultSummary._meta.db_table, student=Student._meta.db_table,
+            marks=Marks._meta.db_table,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [self.now, float(PASS_RATIO), self.first_student])
+        self.report(StudentResultSummary._meta.db_table, self.students, time.monotonic() - start)
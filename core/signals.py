@@ -0,0 +1,184 @@
+"""
+Signal handlers that keep derived data (dashboard counters, cached page
+fragments, the search index, result summaries) in step with Student,
+Teacher, Course, Marks and Attendance changes. Connected in
+CoreConfig.ready().
+"""
+from django.contrib.auth.models import User
+from django.db.models import QuerySet
+from django.db.models.signals import post_init, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import caching, counters, search, summaries
+from .models import Student, Teacher, Course, Marks, Attendance
+
+# Marks a student whose course_id was deferred when it was loaded
+UNKNOWN = object()
+
+
+# ---------------------------------------------------
+# STUDENTS
+# ---------------------------------------------------
+
+@receiver(post_init, sender=Student)
+def remember_student_course(sender, instance, **kwargs):
+    # Read from __dict__ so a deferred course_id is not loaded here
+    instance._counted_course_id = instance.__dict__.get('course_id', UNKNOWN)
+
+@receiver(post_save, sender=Student)
+def count_saved_student(sender, instance, created, **kwargs):
+    if created:
+        counters.adjust_total('student', 1)
+        counters.adjust_enrollment(instance.course_id, 'students', 1)
+    else:
+        previous = instance._counted_course_id
+        if previous is UNKNOWN:
+            # The old course was never loaded, so we can't tell what moved
+            counters.invalidate_enrollment()
+            summaries.refresh_later([instance.pk])
+        elif previous != instance.course_id:
+            counters.adjust_enrollment(previous, 'students', -1)
+            counters.adjust_enrollment(instance.course_id, 'students', 1)
+            # Ranked in the new course, and the old one closes the gap
+            summaries.refresh_later([instance.pk], [previous])
+    instance._counted_course_id = instance.__dict__.get('course_id', UNKNOWN)
+
+@receiver(post_delete, sender=Student)
+def count_deleted_student(sender, instance, **kwargs):
+    counters.adjust_total('student', -1)
+    if instance._counted_course_id is UNKNOWN:
+        counters.invalidate_enrollment()
+    else:
+        counters.adjust_enrollment(instance._counted_course_id, 'students', -1)
+        summaries.refresh_later(course_ids=[instance._counted_course_id])
+
+# ---------------------------------------------------
+# TEACHERS
+# ---------------------------------------------------
+
+@receiver(post_save, sender=Teacher)
+def count_saved_teacher(sender, instance, created, **kwargs):
+    if created:
+        counters.adjust_total('teacher', 1)
+
+@receiver(pre_delete, sender=Teacher)
+def remember_teacher_courses(sender, instance, **kwargs):
+    # The assignment rows are removed without m2m_changed, so note them now
+    instance._counted_course_ids = list(instance.assigned_courses.values_list('id', flat=True))
+
+@receiver(post_delete, sender=Teacher)
+def count_deleted_teacher(sender, instance, **kwargs):
+    counters.adjust_total('teacher', -1)
+    for course_id in getattr(instance, '_counted_course_ids', []):
+        counters.adjust_enrollment(course_id, 'teachers', -1)
+
+@receiver(m2m_changed, sender=Teacher.assigned_courses.through)
+def count_teacher_assignments(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # Remember who is about to be unassigned
+        related = instance.teachers if reverse else instance.assigned_courses
+        instance._cleared_pks = set(related.values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        action, pk_set = 'post_remove', getattr(instance, '_cleared_pks', set())
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+
+    delta = 1 if action == 'post_add' else -1
+    if reverse:
+        # course.teachers.add(...): instance is the course
+        counters.adjust_enrollment(instance.pk, 'teachers', delta * len(pk_set))
+    else:
+        for course_id in pk_set:
+            counters.adjust_enrollment(course_id, 'teachers', delta)
+
+@receiver(m2m_changed, sender=Teacher.assigned_courses.through)
+def touch_assigned_teachers(sender, instance, action, reverse, pk_set, **kwargs):
+    # Course pages list their teachers; a newly assigned teacher must
+    # change the pages' newest updated_at (see core/conditional.py)
+    if action != 'post_add':
+        return
+    teacher_ids = pk_set if reverse else [instance.pk]
+    Teacher.objects.filter(pk__in=teacher_ids).update(updated_at=timezone.now())
+
+# ---------------------------------------------------
+# COURSES
+# ---------------------------------------------------
+
+@receiver(post_save, sender=Course)
+def count_saved_course(sender, instance, created, **kwargs):
+    if created:
+        counters.adjust_total('course', 1)
+    counters.invalidate_enrollment()
+
+@receiver(post_delete, sender=Course)
+def count_deleted_course(sender, instance, **kwargs):
+    counters.adjust_total('course', -1)
+    counters.remove_course(instance.pk)
+
+# ---------------------------------------------------
+# CACHED FRAGMENTS
+# ---------------------------------------------------
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Teacher)
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Marks)
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Teacher)
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Marks)
+# No post_delete for Attendance: a listener would stop Django from
+# deleting a student's or course's attendance in bulk. Those deletes
+# bump the student or course version, which every page showing
+# attendance figures also depends on. Code deleting attendance rows
+# directly bumps the attendance version itself (AttendanceAdmin).
+def bump_fragment_version(sender, **kwargs):
+    caching.bump_model(sender)
+
+@receiver(m2m_changed, sender=Teacher.assigned_courses.through)
+def bump_assignment_version(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        caching.bump('teacher')
+
+# ---------------------------------------------------
+# SEARCH INDEX
+# ---------------------------------------------------
+
+@receiver(post_save, sender=Student)
+@receiver(post_save, sender=Teacher)
+@receiver(post_save, sender=Course)
+def index_saved_object(sender, instance, **kwargs):
+    search.index_objects([instance])
+
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Teacher)
+@receiver(post_delete, sender=Course)
+def unindex_deleted_object(sender, instance, **kwargs):
+    search.remove_object(instance)
+
+# ---------------------------------------------------
+# RESULT SUMMARIES
+# ---------------------------------------------------
+
+def deletes_student(origin):
+    """
+    True if the deletion that started at `origin` removes students (and
+    with them their summaries), so there is nothing to refresh.
+    """
+    if isinstance(origin, QuerySet):
+        return issubclass(origin.model, (Student, User))
+    return isinstance(origin, (Student, User))
+
+@receiver(post_save, sender=Marks)
+def summarize_saved_marks(sender, instance, **kwargs):
+    summaries.refresh_later([instance.student_id])
+
+@receiver(post_delete, sender=Marks)
+def summarize_deleted_marks(sender, instance, origin=None, **kwargs):
+    if not deletes_student(origin):
+        # Once per transaction, so deleting a course with many marks
+        # refreshes each of its students once
+        summaries.refresh_later([instance.student_id])
@@ -0,0 +1,195 @@
+"""
+Maintains StudentResultSummary, the per-student totals shown on result
+cards and the student dashboard.
+
+Every Marks save or delete schedules a refresh of that one student's
+summary with refresh_later() (see core/signals.py). The refresh runs once
+when the transaction commits, however many marks it changed, so deleting
+a course with all its marks refreshes each affected student and re-ranks
+each affected course once. A course is only re-ranked when a percentage
+in it changed. Bulk paths that skip signals call refresh_summaries()
+themselves, and `manage.py rebuild_summaries` recomputes everything from
+scratch.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import BooleanField, Count, ExpressionWrapper, F, FloatField, Q, Sum, Value
+
+from .analytics import PASS_FRACTION
+from .models import Student, Marks, StudentResultSummary
+
+BATCH_SIZE = 500
+
+SUMMARY_FIELDS = ['total_obtained', 'total_possible', 'percentage', 'courses_passed', 'courses_failed']
+
+HUNDREDTH = Decimal('0.01')
+# Largest value StudentResultSummary.percentage can store (5 digits, 2 decimals)
+MAX_PERCENTAGE = Decimal('999.99')
+PASS_RATIO = Decimal(str(PASS_FRACTION))
+PASSED = Q(marks_obtained__gte=F('total_marks') * Value(PASS_RATIO))
+
+
+def _totals(student_ids=None):
+    """
+    {student_id: row} with the summed marks of each student, in one
+    aggregate query.
+    """
+    marks = Marks.objects.order_by()
+    if student_ids is not None:
+        marks = marks.filter(student_id__in=student_ids)
+    rows = marks.values('student_id').annotate(
+        obtained=Sum('marks_obtained'),
+        possible=Sum('total_marks'),
+        courses=Count('id'),
+        passed=Count('id', filter=PASSED),
+    )
+    return {row['student_id']: row for row in rows}
+
+def _summary(student_id, row):
+    if row is None:
+        return StudentResultSummary(student_id=student_id)
+    obtained, possible = Decimal(row['obtained'] or 0), Decimal(row['possible'] or 0)
+    percentage = (obtained * 100 / possible).quantize(HUNDREDTH) if possible else Decimal(0)
+    # Forms reject marks above the total, but rows saved before that (or
+    # written around the forms) must not make the refresh fail
+    percentage = min(max(percentage, -MAX_PERCENTAGE), MAX_PERCENTAGE)
+    return StudentResultSummary(
+        student_id=student_id,
+        total_obtained=obtained,
+        total_possible=possible,
+        percentage=percentage,
+        courses_passed=row['passed'],
+        courses_failed=row['courses'] - row['passed'],
+    )
+
+def _save(summaries):
+    # class_rank is left alone here (new rows start unranked) and set by
+    # rerank_classes()
+    StudentResultSummary.objects.bulk_create(
+        summaries, batch_size=BATCH_SIZE, update_conflicts=True, unique_fields=['student'],
+        update_fields=SUMMARY_FIELDS + ['updated_at'],
+    )
+
+def _ranking(summary):
+    # What a student's class rank depends on
+    return summary[0], bool(summary[1])
+
+def refresh_summaries(student_ids, course_ids=()):
+    """
+    Recomputes the summaries of the given students (creating missing
+    ones), then re-ranks `course_ids` and the courses in which one of the
+    students' percentages changed. Ids of deleted students are ignored.
+    """
+    student_ids = sorted(set(student_ids) - {None})
+    course_ids = set(course_ids)
+    for start in range(0, len(student_ids), BATCH_SIZE):
+        chunk = student_ids[start:start + BATCH_SIZE]
+        students = dict(Student.objects.filter(pk__in=chunk).values_list('pk', 'course_id'))
+        old = {
+            pk: _ranking(summary) for pk, *summary in
+            StudentResultSummary.objects.filter(pk__in=students).values_list('pk', 'percentage', 'total_possible')
+        }
+        totals = _totals(students)
+        summaries = [_summary(student_id, totals.get(student_id)) for student_id in students]
+        _save(summaries)
+        course_ids.update(
+            students[summary.student_id] for summary in summaries
+            if old.get(summary.student_id) != _ranking((summary.percentage, summary.total_possible))
+        )
+    rerank_classes(course_ids)
+
+def refresh_later(student_ids=(), course_ids=()):
+    """
+    refresh_summaries(student_ids, course_ids) when the current
+    transaction commits (at once outside a transaction). Requests made
+    during one transaction are merged into a single refresh.
+    """
+    connection = transaction.get_connection()
+    pending = getattr(connection, '_pending_summaries', None)
+    if pending is None:
+        pending = connection._pending_summaries = (set(), set())
+    pending[0].update(student_ids)
+    pending[1].update(course_ids)
+    # Every call registers the flush, so one is left if a savepoint that
+    # registered an earlier one rolls back; the later ones find nothing
+    # to do. Ids left over from a rolled back transaction only cost a
+    # refresh that changes nothing.
+    transaction.on_commit(_refresh_pending)
+
+def _refresh_pending():
+    connection = transaction.get_connection()
+    pending = getattr(connection, '_pending_summaries', None)
+    connection._pending_summaries = None
+    if pending is not None:
+        refresh_summaries(*pending)
+
+def rerank_classes(course_ids):
+    """
+    Recomputes class_rank for the students of the given courses: 1 for
+    the best percentage, equal percentages share a dense rank
+    ("1, 2, 2, 3", as in core/ranking.py). Students without marks are
+    not ranked.
+    """
+    course_ids = set(course_ids) - {None}
+    if not course_ids:
+        return
+    rows = (
+        StudentResultSummary.objects.filter(student__course_id__in=course_ids)
+        .order_by('student__course_id', '-percentage')
+        .values_list('pk', 'student__course_id', 'percentage', 'total_possible', 'class_rank')
+    )
+    changed = []
+    course, rank, previous = None, 0, None
+    for pk, course_id, percentage, possible, old_rank in rows.iterator(chunk_size=2000):
+        if course_id != course:
+            course, rank, previous = course_id, 0, None
+        new_rank = None
+        if possible:
+            if percentage != previous:
+                rank, previous = rank + 1, percentage
+            new_rank = rank
+        if new_rank != old_rank:
+            changed.append(StudentResultSummary(pk=pk, class_rank=new_rank))
+    StudentResultSummary.objects.bulk_update(changed, ['class_rank'], batch_size=BATCH_SIZE)
+
+def rebuild_summaries():
+    """
+    Recomputes every summary from the Marks table and re-ranks every
+    course. Returns the number of summaries written.
+    """
+    totals = _totals()
+    written = 0
+    batch = []
+    for student_id in Student.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=2000):
+        batch.append(_summary(student_id, totals.get(student_id)))
+        if len(batch) >= BATCH_SIZE:
+            _save(batch)
+            written += len(batch)
+            batch = []
+    if batch:
+        _save(batch)
+        written += len(batch)
+    rerank_classes(Student.objects.exclude(course=None).values_list('course_id', flat=True).distinct())
+    return written
+
+def get_summary(student):
+    """
+    The student's summary, by primary key. Created on first use for
+    students whose marks predate the summary table.
+    """
+    summary = StudentResultSummary.objects.filter(pk=student.pk).first()
+    if summary is None:
+        refresh_summaries([student.pk])
+        summary = StudentResultSummary.objects.get(pk=student.pk)
+    return summary
+
+def with_results(marks):
+    """
+    Annotates a Marks queryset with `percentage` and `passed`, computed
+    by the database instead of per row in the template.
+    """
+    return marks.annotate(
+        percentage=ExpressionWrapper(F('marks_obtained') * 100.0 / F('total_marks'), output_field=FloatField()),
+        passed=ExpressionWrapper(PASSED, output_field=BooleanField()),
+    )
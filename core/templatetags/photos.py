@@ -0,0 +1,34 @@
+from django import template
+from django.utils.html import format_html
+
+from core.photos import derivative_url
+
+register = template.Library()
+
+@register.simple_tag
+def student_photo(student, size, css_class='', alt='Profile Photo'):
+    """
+    An <img> of the student's photo shown at `size` pixels, using the
+    smallest thumbnail that fits (and a larger one for high-density
+    screens), as WebP where the browser supports it and JPEG otherwise.
+    Falls back to the original upload until thumbnails exist.
+    Usage: {% student_photo student 80 "rounded-circle" %}
+    """
+    if not student.photo_hash:
+        return _img(student.profile_photo.url, '', css_class, size, alt)
+    webp, jpeg = (_srcset(student.photo_hash, size, fmt) for fmt in ('webp', 'jpeg'))
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}">{}</picture>',
+        webp, _img(derivative_url(student.photo_hash, size, 'jpeg'), jpeg, css_class, size, alt),
+    )
+
+def _srcset(photo_hash, size, fmt):
+    src = derivative_url(photo_hash, size, fmt)
+    sharp = derivative_url(photo_hash, size * 2, fmt)
+    return f'{src} 1x, {sharp} 2x' if sharp != src else src
+
+def _img(src, srcset, css_class, size, alt):
+    return format_html(
+        '<img src="{}"{} class="{}" width="{}" height="{}" alt="{}" style="object-fit: cover;" loading="lazy">',
+        src, format_html(' srcset="{}"', srcset) if srcset else '', css_class, size, size, alt,
+    )
@@ -1,3 +1,1540 @@
-from django.test import TestCase
+import datetime
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import zipfile
+from unittest import mock
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Count
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from . import analytics, benchmarks, caching, metrics, photos, ranking, result_cards, routers, search, summaries, views
+from .importers import IMPORTERS, ImportFileError, StudentImporter, read_rows
+from .middleware import ReplicaMiddleware
+from .models import Student, Teacher, Course, Marks, Attendance, StudentResultSummary, FragmentVersion
+from .pagination import MAX_PAGE_SIZE
+from .permissions import can_access_course
+from .seeding import DatasetSeeder
+from .summaries import rebuild_summaries
+
+
+def make_students(course, count, start=0):
+    """
+    Creates `count` students enrolled in `course`, each with a mark, and
+    runs the on-commit work (result summaries) as a real commit would.
+    """
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        for i in range(start, start + count):
+            student = Student.objects.create(
+                full_name=f'Student {i}',
+                roll_number=f'R{i:05d}',
+                email=f'student{i}@example.com',
+                course=course,
+            )
+            Marks.objects.create(
+                student=student, course=course,
+                marks_obtained=Decimal('50'), total_marks=Decimal('100'),
+            )
+
+
+class CourseMarksListTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.course = Course.objects.create(name='Physics', code='PHY101')
+        self.client.force_login(self.admin)
+        self.url = reverse('course_marks_list', args=[self.course.pk])
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_roster(self):
+        make_students(self.course, 3)
+        small = self.count_queries()
+        make_students(self.course, 30, start=3)
+        large = self.count_queries()
+        self.assertEqual(small, large)
+
+    def test_roster_pairs_students_with_their_marks(self):
+        make_students(self.course, 2)
+        other = Course.objects.create(name='Chemistry', code='CHE101')
+        Marks.objects.create(
+            student=Student.objects.get(roll_number='R00000'), course=other,
+            marks_obtained=Decimal('10'), total_marks=Decimal('20'),
+        )
+        response = self.client.get(self.url)
+        rows = response.context['student_marks']
+        self.assertEqual([row['student'].roll_number for row in rows], ['R00000', 'R00001'])
+        self.assertTrue(all(row['mark'].course_id == self.course.pk for row in rows))
+
+
+class BulkMarksTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.course = Course.objects.create(name='Physics', code='PHY101')
+        self.client.force_login(self.admin)
+        self.url = reverse('bulk_marks', args=[self.course.pk])
+        make_students(self.course, 2)
+        self.new_students = [
+            Student.objects.create(full_name=f'New {i}', roll_number=f'N{i}', email=f'n{i}@example.com',
+                                   course=self.course)
+            for i in range(3)
+        ]
+
+    def post_grid(self, rows):
+        data = {
+            'form-TOTAL_FORMS': str(len(rows)),
+            'form-INITIAL_FORMS': str(len(rows)),
+        }
+        for i, (student_id, obtained, total) in enumerate(rows):
+            data[f'form-{i}-student_id'] = student_id
+            data[f'form-{i}-marks_obtained'] = obtained
+            data[f'form-{i}-total_marks'] = total
+        return self.client.post(self.url, data)
+
+    def test_creates_and_updates_in_one_request(self):
+        existing = Student.objects.get(roll_number='R00000')
+        rows = [(existing.pk, '75', '100')]
+        rows += [(student.pk, '30', '50') for student in self.new_students]
+        rows.append((Student.objects.get(roll_number='R00001').pk, '', ''))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.post_grid(rows)
+        self.assertRedirects(response, reverse('course_marks_list', args=[self.course.pk]))
+        self.assertLess(len(ctx.captured_queries), 15)
+
+        self.assertEqual(Marks.objects.get(student=existing).marks_obtained, Decimal('75'))
+        self.assertEqual(Marks.objects.filter(course=self.course).count(), 5)
+        self.assertEqual(Marks.objects.get(student=Student.objects.get(roll_number='R00001')).marks_obtained,
+                         Decimal('50'))
+
+    def test_invalid_row_saves_nothing(self):
+        student = self.new_students[0]
+        response = self.post_grid([(student.pk, '120', '100'), (self.new_students[1].pk, '10', '')])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Marks.objects.filter(student__in=self.new_students).exists())
+
+    def test_rows_added_meanwhile_are_overwritten(self):
+        student = self.new_students[0]
+        # The grid was read before another request added this row
+        with self.captureOnCommitCallbacks(execute=True):
+            Marks.objects.create(student=student, course=self.course, marks_obtained=10, total_marks=100)
+            created, updated = views.save_course_marks(self.course, {student.pk: (Decimal('70'), Decimal('100'))}, {})
+        self.assertEqual((created, updated), (1, 0))
+        self.assertEqual(Marks.objects.get(student=student).marks_obtained, Decimal('70'))
+        self.assertEqual(StudentResultSummary.objects.get(student=student).percentage, Decimal('70'))
+
+
+class UniqueRowTests(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(name='Physics', code='PHY101')
+        make_students(self.course, 1)
+        self.student = Student.objects.get()
+
+    def test_constraints_reject_duplicates(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Marks.objects.create(student=self.student, course=self.course, marks_obtained=1, total_marks=10)
+        day = datetime.date(2026, 3, 2)
+        Attendance.objects.create(student=self.student, course=self.course, date=day, status='Present')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Attendance.objects.create(student=self.student, course=self.course, date=day, status='Absent')
+
+    def test_add_marks_updates_the_existing_row(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        url = reverse('add_marks', args=[self.course.pk, self.student.pk])
+        self.assertEqual(self.client.get(url).context['form'].initial['marks_obtained'], Decimal('50'))
+        self.client.post(url, {'marks_obtained': '80', 'total_marks': '100'})
+        self.assertEqual(Marks.objects.get(student=self.student).marks_obtained, Decimal('80'))
+
+    def test_marks_above_the_total_are_rejected(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_login(admin_user)
+        url = reverse('add_marks', args=[self.course.pk, self.student.pk])
+        for obtained, total, error in (('500', '1', 'cannot exceed'), ('0', '0', 'greater than zero')):
+            with self.subTest(obtained=obtained, total=total):
+                self.assertContains(self.client.post(url, {'marks_obtained': obtained, 'total_marks': total}), error)
+                response = self.client.post(
+                    reverse('admin:core_marks_change', args=[Marks.objects.get().pk]),
+                    {'student': self.student.pk, 'course': self.course.pk,
+                     'marks_obtained': obtained, 'total_marks': total},
+                )
+                self.assertContains(response, error)
+                self.assertEqual(Marks.objects.get().marks_obtained, Decimal('50'))
+
+    def test_summary_of_stored_impossible_mark(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Marks.objects.filter(student=self.student).update(marks_obtained=500, total_marks=1)
+            summaries.refresh_later([self.student.pk])
+        self.assertEqual(StudentResultSummary.objects.get(student=self.student).percentage, Decimal('999.99'))
+
+
+class DedupeMigrationTests(TransactionTestCase):
+    before = [('core', '0001_initial')]
+    after = [('core', '0003_marks_attendance_indexes')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_duplicates_collapse_to_the_newest_row(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        course = apps.get_model('core', 'Course').objects.create(name='Physics', code='PHY101')
+        student = apps.get_model('core', 'Student').objects.create(
+            full_name='Ann', roll_number='R1', email='ann@example.com', course=course)
+        marks = [
+            apps.get_model('core', 'Marks').objects.create(
+                student=student, course=course, marks_obtained=obtained, total_marks=100).pk
+            for obtained in (40, 60)
+        ]
+        attendance = [
+            apps.get_model('core', 'Attendance').objects.create(
+                student=student, course=course, date=datetime.date(2026, 3, day), status=status).pk
+            for day, status in ((2, 'Absent'), (2, 'Present'), (3, 'Present'))
+        ]
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+        self.assertEqual(list(apps.get_model('core', 'Marks').objects.values_list('pk', flat=True)), [marks[1]])
+        self.assertEqual(
+            sorted(apps.get_model('core', 'Attendance').objects.values_list('pk', 'status')),
+            [(attendance[1], 'Present'), (attendance[2], 'Present')],
+        )
+
+
+class RosterImportTests(TestCase):
+    def run_import(self, kind, text, batch_size=2):
+        importer = IMPORTERS[kind](batch_size=batch_size)
+        return importer.run(read_rows(io.BytesIO(text.encode()), f'{kind}.csv'))
+
+    def test_imports_students_with_course_codes_and_reports_bad_rows(self):
+        Course.objects.create(name='Physics', code='PHY101')
+        Student.objects.create(full_name='Old', roll_number='R1', email='old@example.com')
+        importer = self.run_import('students', (
+            'full_name,roll_number,email,course_code,dob\n'
+            'Ann,R1,ann@example.com,PHY101,2001-02-03\n'
+            'Ben,R2,ben@example.com,PHY101,2001-02-03\n'
+            'Cat,R2,cat@example.com,,\n'
+            'Dan,R3,not-an-email,PHY101,\n'
+            'Eve,R4,eve@example.com,NOPE,\n'
+            'Fay,R5,fay@example.com,,\n'
+        ))
+        self.assertEqual(importer.created, 2)
+        self.assertEqual([line for line, message in importer.errors], [2, 4, 5, 6])
+        self.assertEqual(Student.objects.get(roll_number='R2').course.code, 'PHY101')
+        self.assertIsNone(Student.objects.get(roll_number='R5').course)
+
+    def test_imports_teachers_with_assigned_courses(self):
+        self.run_import('courses', 'name,code,description\nPhysics,PHY101,\nChemistry,CHE101,\n')
+        importer = self.run_import('teachers', 'name,email,course_codes\nTara,tara@example.com,PHY101;CHE101\n')
+        self.assertEqual(importer.created, 1)
+        teacher = Teacher.objects.get(email='tara@example.com')
+        self.assertEqual(sorted(teacher.assigned_courses.values_list('code', flat=True)), ['CHE101', 'PHY101'])
+
+    def test_unreadable_file_imports_nothing(self):
+        rows = ''.join(f'S{i},R{i},s{i}@example.com\n' for i in range(5))
+        text = io.BytesIO(('full_name,roll_number,email\n' + rows).encode() + b'Bad,R9,\xff@example.com\n')
+        with self.assertRaises(ImportFileError):
+            IMPORTERS['students'](batch_size=2).run(read_rows(text, 'students.csv'))
+        self.assertFalse(Student.objects.exists())
+
+    def test_corrupt_workbook_is_rejected(self):
+        with self.assertRaises(ImportFileError):
+            IMPORTERS['students']().run(read_rows(io.BytesIO(b'full_name,roll_number\n'), 'students.xlsx'))
+
+    def test_upload_reports_rows_inserted_meanwhile(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        prepare = StudentImporter.prepare
+
+        def insert_first(importer, row):
+            if row['roll_number'] == 'R2':
+                # Another request adds the roll number after the duplicate check
+                Student.objects.create(full_name='Other', roll_number='R2', email='other@example.com')
+            return prepare(importer, row)
+
+        upload = SimpleUploadedFile('students.csv', (
+            b'full_name,roll_number,email\n'
+            b'Ann,R1,ann@example.com\n'
+            b'Ben,R2,ben@example.com\n'
+            b'Cat,R3,cat@example.com\n'
+        ))
+        with mock.patch.object(StudentImporter, 'prepare', insert_first):
+            response = self.client.post(reverse('import_roster'), {'kind': 'students', 'file': upload})
+        self.assertEqual(response.status_code, 200)
+        importer = response.context['importer']
+        self.assertEqual(importer.created, 2)
+        self.assertEqual([line for line, message in importer.errors], [3])
+        self.assertEqual(sorted(Student.objects.values_list('roll_number', 'full_name')),
+                         [('R1', 'Ann'), ('R2', 'Other'), ('R3', 'Cat')])
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_login(self.admin)
+        self.course = Course.objects.create(name='Physics', code='PHY101')
+        other = Course.objects.create(name='Chemistry', code='CHE101')
+        make_students(self.course, 2)
+        make_students(other, 1, start=2)
+        student = Student.objects.get(roll_number='R00000')
+        for day in (1, 2, 3):
+            Attendance.objects.create(student=student, course=self.course,
+                                      date=datetime.date(2026, 1, day), status='Present')
+
+    def stream(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_marks_csv_filtered_by_course(self):
+        body = self.stream(reverse('export_data', args=['marks']) + '?course=PHY101')
+        lines = body.strip().splitlines()
+        self.assertEqual(lines[0], 'roll_number,full_name,course_code,marks_obtained,total_marks')
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(all(',PHY101,' in line for line in lines[1:]))
+
+    def test_attendance_jsonl_filtered_by_date_range(self):
+        url = reverse('export_data', args=['attendance']) + '?format=jsonl&from=2026-01-02&to=2026-01-03'
+        rows = [json.loads(line) for line in self.stream(url).splitlines()]
+        self.assertEqual([row['date'] for row in rows], ['2026-01-02', '2026-01-03'])
+
+    def test_rejects_bad_dates(self):
+        response = self.client.get(reverse('export_data', args=['attendance']) + '?from=2026-13-40')
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_dates_for_undated_exports(self):
+        for kind in ('students', 'marks'):
+            with self.subTest(kind=kind):
+                response = self.client.get(reverse('export_data', args=[kind]) + '?to=2026-01-02')
+                self.assertEqual(response.status_code, 400)
+
+
+class RollCallTests(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(name='Physics', code='PHY101')
+        user = User.objects.create_user('teacher', 'teacher@example.com', 'pass')
+        teacher = Teacher.objects.create(user=user, name='Teacher', email='teacher@example.com')
+        teacher.assigned_courses.add(self.course)
+        self.client.force_login(user)
+        make_students(self.course, 3)
+        self.students = list(Student.objects.order_by('roll_number'))
+        self.url = reverse('roll_call', args=[self.course.pk])
+
+    def test_everyone_defaults_to_present(self):
+        response = self.client.get(self.url + '?date=2026-03-02')
+        self.assertEqual([present for student, present in response.context['rows']], [True, True, True])
+
+    def test_saving_twice_updates_in_place(self):
+        self.client.post(self.url, {'date': '2026-03-02', 'present': [s.pk for s in self.students]})
+        self.client.post(self.url, {'date': '2026-03-02', 'present': [self.students[0].pk]})
+
+        records = Attendance.objects.filter(course=self.course, date=datetime.date(2026, 3, 2))
+        self.assertEqual(records.count(), 3)
+        self.assertEqual(
+            dict(records.values_list('student__roll_number', 'status')),
+            {'R00000': 'Present', 'R00001': 'Absent', 'R00002': 'Absent'},
+        )
+
+    def test_rejects_missing_or_bad_dates(self):
+        present = [s.pk for s in self.students]
+        for data in ({'present': present}, {'date': 'garbage', 'present': present}, {'date': '2026-02-30'}):
+            self.assertEqual(self.client.post(self.url, data).status_code, 400)
+        self.assertEqual(self.client.get(self.url + '?date=garbage').status_code, 400)
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_other_teachers_are_turned_away(self):
+        other = Course.objects.create(name='Chemistry', code='CHE101')
+        response = self.client.get(reverse('roll_call', args=[other.pk]))
+        self.assertRedirects(response, reverse('marks_dashboard'))
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_login(self.admin)
+        self.course = Course.objects.create(name='Physics', code='PHY101')
+        make_students(self.course, 7)
+        self.url = reverse('students')
+
+    def roll_numbers(self, response):
+        return [student.roll_number for student in response.context['students']]
+
+    def test_walks_forward_and_back_without_overlap(self):
+        first = self.client.get(self.url, {'size': 3})
+        self.assertEqual(self.roll_numbers(first), ['R00000', 'R00001', 'R00002'])
+        page = first.context['page']
+        self.assertFalse(page.has_previous)
+        self.assertTrue(page.has_next)
+
+        second = self.client.get(f'{self.url}?{page.next_query}')
+        self.assertEqual(self.roll_numbers(second), ['R00003', 'R00004', 'R00005'])
+
+        third = self.client.get(f'{self.url}?{second.context["page"].next_query}')
+        self.assertEqual(self.roll_numbers(third), ['R00006'])
+        self.assertFalse(third.context['page'].has_next)
+
+        back = self.client.get(f'{self.url}?{third.context["page"].previous_query}')
+        self.assertEqual(self.roll_numbers(back), ['R00003', 'R00004', 'R00005'])
+        self.assertTrue(back.context['page'].has_previous)
+
+    def test_page_size_is_clamped_and_bad_cursors_are_ignored(self):
+        response = self.client.get(self.url, {'size': 100000, 'after': ''})
+        self.assertEqual(response.context['page'].page_size, MAX_PAGE_SIZE)
+        response = self.client.get(reverse('teachers'), {'after': 'not-a-number'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_deep_pages_cost_the_same_queries(self):
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(self.url, {'size': 2})
+        with CaptureQueriesContext(connection) as deep:
+            self.client.get(self.url, {'size': 2, 'after': 'R00004'})
+        self.assertEqual(len(first.captured_queries), len(deep.captured_queries))
+        self.assertNotIn('OFFSET', deep.captured_queries[-1]['sql'])
+
+
+class DashboardCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_login(self.admin)
+        self.physics = Course.objects.create(name='Physics', code='PHY101')
+        self.chemistry = Course.objects.create(name='Chemistry', code='CHE101')
+        make_students(self.physics, 2)
+
+    def dashboard(self):
+        response = self.client.get(reverse('dashboard'))
+        counts = {row['code']: (row['students'], row['teachers']) for row in response.context['course_counts']}
+        return response.context, counts
+
+    def test_warm_dashboard_runs_no_count_queries(self):
+        self.dashboard()
+        with CaptureQueriesContext(connection) as ctx:
+            self.dashboard()
+        self.assertFalse(any('COUNT(' in query['sql'] for query in ctx.captured_queries))
+
+    def test_signals_keep_counts_current(self):
+        context, counts = self.dashboard()
+        self.assertEqual((context['total_students'], context['total_courses']), (2, 2))
+        self.assertEqual(counts['PHY101'], (2, 0))
+
+        # The counters change when the transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            student = Student.objects.get(roll_number='R00000')
+            student.course = self.chemistry
+            student.save()
+            teacher = Teacher.objects.create(name='T', email='t@example.com')
+            teacher.assigned_courses.add(self.physics, self.chemistry)
+            self.chemistry.teachers.clear()
+            Student.objects.get(roll_number='R00001').delete()
+
+        context, counts = self.dashboard()
+        self.assertEqual((context['total_students'], context['total_teachers']), (1, 1))
+        self.assertEqual(counts, {'PHY101': (0, 1), 'CHE101': (1, 0)})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            teacher.delete()
+            self.chemistry.delete()
+        context, counts = self.dashboard()
+        self.assertEqual((context['total_teachers'], context['total_courses']), (0, 1))
+        self.assertEqual(counts, {'PHY101': (0, 0)})
+
+    def test_rolled_back_changes_are_not_counted(self):
+        self.dashboard()
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                Student.objects.create(full_name='Gone', roll_number='G1', email='g@example.com',
+                                       course=self.physics)
+                raise RuntimeError
+        context, counts = self.dashboard()
+        self.assertEqual(context['total_students'], 2)
+        self.assertEqual(counts['PHY101'], (2, 0))
+
+    def test_rebuild_command_fixes_drift(self):
+        self.dashboard()
+        Student.objects.bulk_create([Student(full_name='Bulk', roll_number='B1', email='b@example.com',
+                                             course=self.physics)])
+        call_command('rebuild_dashboard_counts', stdout=io.StringIO())
+        context, counts = self.dashboard()
+        self.assertEqual(context['total_students'], 3)
+        self.assertEqual(counts['PHY101'], (3, 0))
+
+
+class RoleResolutionTests(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(name='Physics', code='PHY101')
+        self.user = User.objects.create_user('teach', 'teach@example.com', 'pass')
+        teacher = Teacher.objects.create(user=self.user, name='Teach', email='teach@example.com')
+        teacher.assigned_courses.add(self.course)
+        self.client.force_login(self.user)
+
+    def test_profiles_load_with_the_user(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('dashboard'))
+        self.assertTemplateUsed(response, 'dashboard/teacher_dashboard.html')
+        self.assertTrue(response.context['is_teacher'])
+        self.assertFalse(response.context['is_student'])
+        profile_lookups = [
+            query['sql'] for query in ctx.captured_queries
+            if query['sql'].startswith('SELECT') and '"core_student"."user_id" =' in query['sql']
+        ]
+        self.assertEqual(profile_lookups, [])
+
+    def test_deleted_profile_takes_effect_at_once(self):
+        self.client.get(reverse('dashboard'))
+        self.user.teacher.delete()
+        response = self.client.get(reverse('dashboard'))
+        self.assertTemplateUsed(response, 'dashboard.html')
+        self.assertFalse(response.context['is_teacher'])
+        response = self.client.get(reverse('course_marks_list', args=[self.course.pk]))
+        self.assertRedirects(response, reverse('marks_dashboard'), fetch_redirect_response=False)
+
+
+class CourseAccessTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.physics = Course.objects.create(name='Physics', code='PHY101')
+        self.chemistry = Course.objects.create(name='Chemistry', code='CHE101')
+        self.user = User.objects.create_user('teach', 'teach@example.com', 'pass')
+        self.teacher = Teacher.objects.create(user=self.user, name='Teach', email='teach@example.com')
+        self.teacher.assigned_courses.add(self.physics)
+        self.client.force_login(self.user)
+
+    def test_views_allow_only_assigned_courses(self):
+        response = self.client.get(reverse('course_marks_list', args=[self.physics.pk]))
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('bulk_marks', args=[self.chemistry.pk]))
+        self.assertRedirects(response, reverse('marks_dashboard'))
+
+    def test_answers_last_for_one_request(self):
+        user = User.objects.select_related('teacher', 'student').get(pk=self.user.pk)
+        self.assertTrue(can_access_course(user, self.physics.pk))
+        with self.assertNumQueries(0):
+            self.assertTrue(can_access_course(user, self.physics.pk))
+
+        # The next request sees the changed assignments
+        self.chemistry.teachers.add(self.teacher)
+        self.teacher.assigned_courses.remove(self.physics)
+        user = User.objects.select_related('teacher', 'student').get(pk=self.user.pk)
+        self.assertTrue(can_access_course(user, self.chemistry.pk))
+        self.assertFalse(can_access_course(user, self.physics.pk))
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.course = Course.objects.create(name='Organic Chemistry', code='CHE201',
+                                            description='Carbon compounds and reactions')
+        self.anne = Student.objects.create(full_name='Anne Lee', roll_number='R100',
+                                           email='anne@example.com', course=self.course)
+        Student.objects.create(full_name='Bob Leeds', roll_number='R200', email='bob@example.com')
+        Teacher.objects.create(name='Carla Leon', email='carla@example.com')
+        self.client.force_login(self.admin)
+
+    def found(self, query, **kwargs):
+        return [(result.kind, str(result.object)) for result in search.search(query, **kwargs)]
+
+    def test_prefix_words_and_ranking(self):
+        self.assertEqual(self.found('ann le'), [('student', 'Anne Lee (R100)')])
+        # Name matches outrank the description match
+        self.assertEqual(self.found('carb'), [('course', 'Organic Chemistry')])
+        self.assertEqual(len(self.found('le')), 3)
+        self.assertEqual(self.found('le', kinds=['teacher']), [('teacher', 'Carla Leon')])
+        self.assertEqual(self.found('***'), [])
+
+    def test_signals_keep_index_current(self):
+        self.anne.full_name = 'Anne Park'
+        self.anne.save()
+        self.assertEqual(self.found('park'), [('student', 'Anne Park (R100)')])
+        self.anne.delete()
+        self.assertEqual(self.found('anne'), [])
+
+        Student.objects.bulk_create([Student(full_name='Dana Bulk', roll_number='R300', email='d@example.com')])
+        self.assertEqual(self.found('dana'), [])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        self.assertEqual(self.found('dana'), [('student', 'Dana Bulk (R300)')])
+
+    def test_search_page_and_admin(self):
+        response = self.client.get(reverse('search'), {'q': 'chem'})
+        self.assertContains(response, 'Organic Chemistry')
+        response = self.client.get(reverse('admin:core_student_changelist'), {'q': 'bob'})
+        self.assertContains(response, 'Bob Leeds')
+        self.assertNotContains(response, 'Anne Lee')
+
+
+class GradeAnalyticsTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.physics = Course.objects.create(name='Physics', code='PHY101')
+        self.chemistry = Course.objects.create(name='Chemistry', code='CHE101')
+        Course.objects.create(name='Biology', code='BIO101')
+        for i, (course, obtained, total) in enumerate([
+            (self.physics, 30, 100), (self.physics, 40, 100), (self.physics, 90, 100), (self.physics, 100, 100),
+            (self.chemistry, 10, 50), (self.chemistry, 45, 50),
+        ]):
+            student = Student.objects.create(full_name=f'S{i}', roll_number=f'R{i}', email=f's{i}@example.com')
+            Marks.objects.create(student=student, course=course, marks_obtained=obtained, total_marks=total)
+        self.client.force_login(self.admin)
+
+    def test_course_stats(self):
+        stats = analytics.course_stats(self.physics)
+        self.assertEqual((stats['count'], stats['mean'], stats['median']), (4, 65.0, 65.0))
+        self.assertEqual((stats['passed'], stats['pass_rate']), (3, 75.0))
+        self.assertEqual(stats['min'], 30.0)
+        counts = {bucket['range']: bucket['count'] for bucket in stats['histogram']}
+        self.assertEqual((counts['30-40%'], counts['40-50%'], counts['90-100%']), (1, 1, 2))
+
+    def test_all_courses_match_single_course_stats(self):
+        with self.assertNumQueries(2):
+            overview = analytics.all_course_stats()
+        self.assertEqual([course['code'] for course in overview], ['BIO101', 'CHE101', 'PHY101'])
+        self.assertEqual(overview[0]['count'], 0)
+        self.assertIsNone(overview[0]['pass_rate'])
+        for course, stats in ((self.chemistry, overview[1]), (self.physics, overview[2])):
+            self.assertEqual(stats, analytics.course_stats(course))
+
+    def test_pages_and_api(self):
+        response = self.client.get(reverse('course_analytics_api', args=[self.chemistry.pk]))
+        self.assertEqual(json.loads(response.content)['pass_rate'], 50.0)
+        self.assertContains(self.client.get(reverse('course_analytics', args=[self.physics.pk])), '75.0%')
+        response = self.client.get(reverse('analytics_overview'), {'format': 'json'})
+        self.assertEqual(len(json.loads(response.content)['courses']), 3)
+        self.assertContains(self.client.get(reverse('analytics_overview')), 'No marks yet')
+
+
+class CourseStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_login(self.admin)
+        self.course = Course.objects.create(name='Chemistry', code='CHE101')
+        make_students(self.course, 2)
+        Marks.objects.filter(student__roll_number='R00001').update(marks_obtained=Decimal('100'))
+        teacher = Teacher.objects.create(name='Ms Rao', email='rao@example.com')
+        teacher.assigned_courses.add(self.course)
+        for student, status in zip(Student.objects.order_by('pk'), ['Present', 'Absent']):
+            Attendance.objects.create(student=student, course=self.course, date=datetime.date(2024, 1, 8),
+                                      status=status)
+        self.empty = Course.objects.create(name='Physics', code='PHY101')
+
+    def add_courses(self, count):
+        for i in range(count):
+            course = Course.objects.create(name=f'Course {i}', code=f'C{i:03d}')
+            make_students(course, 2, start=100 + 10 * i)
+
+    def test_figures(self):
+        courses = analytics.with_course_stats(Course.objects.order_by('code'))
+        self.assertEqual(
+            [(c.code, c.student_count, c.teacher_count, c.average_mark, c.attendance_rate) for c in courses],
+            [('CHE101', 2, 1, 75.0, 50.0), ('PHY101', 0, 0, None, None)],
+        )
+
+    def test_pages_take_the_same_queries_for_any_number_of_courses(self):
+        def queries(name):
+            cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            return len(captured)
+
+        names = ['courses', 'student_course_groups', 'teacher_course_groups']
+        before = [queries(name) for name in names]
+        self.add_courses(5)
+        self.assertEqual([queries(name) for name in names], before)
+        self.assertContains(self.client.get(reverse('courses')), '75.0%')
+
+    def test_marks_and_attendance_changes_invalidate(self):
+        self.assertContains(self.client.get(reverse('student_course_groups')), 'Avg. mark 75.0%')
+        mark = Marks.objects.get(student__roll_number='R00000')
+        mark.marks_obtained = Decimal('0')
+        mark.save()
+        self.assertContains(self.client.get(reverse('student_course_groups')), 'Avg. mark 50.0%')
+
+        self.client.get(reverse('courses'))
+        present = list(Student.objects.values_list('pk', flat=True))
+        self.client.post(reverse('roll_call', args=[self.course.pk]), {'date': '2024-01-08', 'present': present})
+        self.assertContains(self.client.get(reverse('courses')), '100.0%')
+        self.assertContains(self.client.get(reverse('student_course_groups')), 'Attendance 100.0%')
+
+
+class ResultSummaryTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.physics = Course.objects.create(name='Physics', code='PHY101')
+        self.chemistry = Course.objects.create(name='Chemistry', code='CHE101')
+        self.students = [
+            Student.objects.create(full_name=f'S{i}', roll_number=f'R{i}', email=f's{i}@example.com',
+                                   course=self.physics)
+            for i in range(3)
+        ]
+        self.client.force_login(self.admin)
+
+    def add_mark(self, student, course, obtained, total=100):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Marks.objects.create(student=student, course=course, marks_obtained=obtained, total_marks=total)
+
+    def commit(self, *changes):
+        # The summaries are refreshed when the transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            for change in changes:
+                change()
+
+    def summaries(self):
+        return {
+            summary.student.roll_number: (summary.percentage, summary.courses_passed,
+                                          summary.courses_failed, summary.class_rank)
+            for summary in StudentResultSummary.objects.select_related('student')
+        }
+
+    def test_marks_changes_update_totals_and_ranks(self):
+        first, second, third = self.students
+        self.add_mark(first, self.physics, 80)
+        self.add_mark(first, self.chemistry, 15, 50)
+        self.add_mark(second, self.physics, 70)
+        mark = self.add_mark(third, self.physics, 20)
+        self.assertEqual(self.summaries(), {
+            'R0': (Decimal('63.33'), 1, 1, 2),
+            'R1': (Decimal('70.00'), 1, 0, 1),
+            'R2': (Decimal('20.00'), 0, 1, 3),
+        })
+
+        mark.marks_obtained = 90
+        self.commit(mark.save)
+        self.assertEqual(self.summaries()['R2'], (Decimal('90.00'), 1, 0, 1))
+
+        # Moving to another course ranks the student there and closes the gap
+        third.course = self.chemistry
+        self.commit(third.save)
+        self.assertEqual({roll: row[3] for roll, row in self.summaries().items()}, {'R0': 2, 'R1': 1, 'R2': 1})
+
+        self.commit(second.delete, mark.delete)
+        self.assertEqual(self.summaries(), {
+            'R0': (Decimal('63.33'), 1, 1, 1),
+            'R2': (Decimal('0'), 0, 0, None),
+        })
+
+    def test_course_delete_refreshes_once(self):
+        for student in self.students:
+            self.add_mark(student, self.physics, 60)
+            self.add_mark(student, self.chemistry, 20)
+        with mock.patch('core.summaries.refresh_summaries', wraps=summaries.refresh_summaries) as refresh:
+            self.commit(self.chemistry.delete)
+        refresh.assert_called_once()
+        self.assertEqual(refresh.call_args.args[0], {student.pk for student in self.students})
+        self.assertEqual({row[0] for row in self.summaries().values()}, {Decimal('60.00')})
+
+    def test_unchanged_percentage_skips_reranking(self):
+        mark = self.add_mark(self.students[0], self.physics, 40)
+        mark.marks_obtained, mark.total_marks = 20, 50
+        with mock.patch('core.summaries.rerank_classes') as rerank:
+            self.commit(mark.save)
+        rerank.assert_called_once_with(set())
+
+    def test_bulk_entry_and_rebuild(self):
+        response = self.client.post(reverse('bulk_marks', args=[self.physics.pk]), {
+            'form-TOTAL_FORMS': 3, 'form-INITIAL_FORMS': 3,
+            **{f'form-{i}-student_id': student.pk for i, student in enumerate(self.students)},
+            **{f'form-{i}-marks_obtained': value for i, value in enumerate([50, 50, 10])},
+            **{f'form-{i}-total_marks': 100 for i in range(3)},
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual([row[3] for row in self.summaries().values()], [1, 1, 2])
+
+        StudentResultSummary.objects.all().delete()
+        call_command('rebuild_summaries', stdout=io.StringIO())
+        self.assertEqual([row[3] for row in self.summaries().values()], [1, 1, 2])
+
+    def test_result_card_reads_summary(self):
+        self.add_mark(self.students[0], self.physics, 35)
+        response = self.client.get(reverse('student_result_card', args=[self.students[0].pk]))
+        self.assertEqual(response.context['summary'].courses_failed, 1)
+        self.assertContains(response, 'Fail')
+        self.assertContains(response, '35.0%')
+
+
+class RankingTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.physics = Course.objects.create(name='Physics', code='PHY101')
+        self.chemistry = Course.objects.create(name='Chemistry', code='CHE101')
+        self.students = []
+        with self.captureOnCommitCallbacks(execute=True):
+            # Physics: 90, 70, 70, 40 -> ranks 1, 2, 2, 3
+            for i, score in enumerate([90, 70, 70, 40]):
+                student = Student.objects.create(full_name=f'S{i}', roll_number=f'R{i}',
+                                                 email=f's{i}@example.com', course=self.physics)
+                Marks.objects.create(student=student, course=self.physics, marks_obtained=score, total_marks=100)
+                self.students.append(student)
+            Marks.objects.create(student=self.students[3], course=self.chemistry, marks_obtained=50, total_marks=50)
+        self.client.force_login(self.admin)
+
+    def test_ranks_and_percentiles(self):
+        board = ranking.course_leaderboard(self.physics)
+        self.assertEqual([(mark.student.roll_number, mark.course_rank) for mark in board],
+                         [('R0', 1), ('R1', 2), ('R2', 2), ('R3', 3)])
+        self.assertEqual([round(mark.course_percentile) for mark in board], [100, 33, 33, 0])
+
+    def test_student_ranks_use_the_whole_course(self):
+        ranks = ranking.student_course_ranks(self.students[3])
+        self.assertEqual(ranks[self.physics.pk], (3, 0.0, 4))
+        self.assertEqual(ranks[self.chemistry.pk], (1, 0.0, 1))
+        # Overall: S3 has 90/150 = 60%, behind S0 (90%) and S1/S2 (70%)
+        overall = {
+            summary.student.roll_number: summary.overall_rank
+            for summary in ranking.overall_leaderboard()
+        }
+        self.assertEqual(overall, {'R0': 1, 'R1': 2, 'R2': 2, 'R3': 3})
+        self.assertEqual(ranking.student_overall_rank(self.students[3].result_summary).rank, 3)
+        # Ranks match the summaries' class ranks
+        self.assertEqual([summary.class_rank for summary in StudentResultSummary.objects.order_by('pk')],
+                         [1, 2, 2, 3])
+
+    def test_rank_annotations(self):
+        marks = ranking.with_course_ranks(Marks.objects.filter(course=self.physics))
+        self.assertEqual(
+            sorted((mark.student_id, mark.course_rank, round(mark.course_percentile), mark.course_size) for mark in marks),
+            [(self.students[0].pk, 1, 100, 4), (self.students[1].pk, 2, 33, 4),
+             (self.students[2].pk, 2, 33, 4), (self.students[3].pk, 3, 0, 4)],
+        )
+        # Rank filters apply after the windows
+        self.assertEqual(marks.filter(course_rank__gte=3).get().student, self.students[3])
+        summaries = ranking.with_overall_ranks(StudentResultSummary.objects.all())
+        self.assertEqual(summaries.filter(overall_rank=1).get().student, self.students[0])
+
+    def test_long_filters_stay_within_the_parameter_limit(self):
+        only = [(self.physics.pk, score / 1000) for score in range(2000)] + [(self.physics.pk, 0.4)]
+        with self.assertNumQueries(1):
+            table = ranking.course_rank_table([self.physics.pk], only=only)
+        self.assertEqual(table[(self.physics.pk, 0.4)], (3, 0.0, 4))
+
+    def test_pages_show_ranks(self):
+        response = self.client.get(reverse('course_marks_list', args=[self.physics.pk]))
+        self.assertEqual([row['mark'].course_rank for row in response.context['student_marks']], [1, 2, 2, 3])
+        response = self.client.get(reverse('leaderboard'), {'course': self.chemistry.pk})
+        self.assertEqual([mark.student.roll_number for mark in response.context['rows']], ['R3'])
+        response = self.client.get(reverse('student_result_card', args=[self.students[1].pk]))
+        self.assertEqual(response.context['overall'].rank, 2)
+        self.assertEqual(self.client.get(reverse('leaderboard'), {'course': 'x'}).status_code, 404)
+
+
+class ResultCardTests(TestCase):
+    def setUp(self):
+        self.physics = Course.objects.create(name='Physics', code='PHY101')
+        self.chemistry = Course.objects.create(name='Chemistry', code='CHE101')
+        self.students = [
+            Student.objects.create(full_name=f'S{i}', roll_number=f'R{i}', email=f's{i}@example.com',
+                                   course=self.physics)
+            for i in range(3)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            Marks.objects.create(student=self.students[0], course=self.physics, marks_obtained=80, total_marks=100)
+            Marks.objects.create(student=self.students[0], course=self.chemistry, marks_obtained=10, total_marks=50)
+            Marks.objects.create(student=self.students[1], course=self.physics, marks_obtained=60, total_marks=100)
+        self.output = os.path.join(tempfile.mkdtemp(), 'cards.zip')
+        self.addCleanup(lambda: os.path.exists(self.output) and os.remove(self.output))
+
+    def test_cards_load_in_one_query(self):
+        with self.assertNumQueries(1):
+            cards = result_cards.load_cards([student.pk for student in self.students])
+        self.assertEqual([card['roll_number'] for card in cards], ['R0', 'R1', 'R2'])
+        self.assertEqual([(mark['code'], mark['passed']) for mark in cards[0]['marks']],
+                         [('CHE101', False), ('PHY101', True)])
+        self.assertEqual((cards[0]['courses_passed'], cards[0]['class_rank']), (1, 1))
+        self.assertEqual(cards[2]['marks'], [])
+        self.assertTrue(result_cards.render_card(cards[2]).startswith(b'%PDF-1.4'))
+
+    def test_command_writes_zip_and_resumes(self):
+        # A card left by an earlier, interrupted run is kept as it is
+        names = [result_cards.card_name(student.pk, student.roll_number) for student in self.students]
+        with zipfile.ZipFile(self.output, 'w') as archive:
+            archive.writestr(names[0], b'earlier')
+        out = io.StringIO()
+        call_command('generate_result_cards', course='PHY101', output=self.output, workers=1, stdout=out)
+        self.assertIn('Wrote 2 result cards', out.getvalue())
+        with zipfile.ZipFile(self.output) as archive:
+            self.assertEqual(sorted(archive.namelist()), names)
+            self.assertEqual(archive.read(names[0]), b'earlier')
+            self.assertTrue(archive.read(names[1]).endswith(b'%%EOF\n'))
+
+        writer = result_cards.ResultCardWriter(self.output, workers=0).run(result_cards.student_keys())
+        self.assertEqual((writer.total, writer.skipped, writer.written), (3, 3, 0))
+
+    def test_failed_cards_are_retried(self):
+        cards = result_cards.load_cards([self.students[1].pk])
+        cards.append(dict(cards[0], roll_number='R9', marks=None))
+        results = result_cards.render_cards(cards)
+        self.assertEqual([error is None for pk, roll_number, content, error in results], [True, False])
+
+        writer = result_cards.ResultCardWriter(self.output, workers=0)
+        with zipfile.ZipFile(self.output, 'w') as archive:
+            writer.store = archive.writestr
+            writer.write(results)
+        self.assertEqual((writer.written, writer.error_count), (1, 1))
+        writer = result_cards.ResultCardWriter(self.output, workers=0).run(result_cards.student_keys())
+        self.assertEqual((writer.skipped, writer.written), (1, 2))
+
+    def test_killed_run_keeps_finished_cards(self):
+        keys = list(result_cards.student_keys())
+        writer = result_cards.ResultCardWriter(self.output, workers=0)
+        stage = writer.stage
+
+        def stage_then_die(name, content):
+            if writer.written:
+                # Power lost halfway through writing the second card
+                with open(os.path.join(writer.staging, name), 'wb') as fileobj:
+                    fileobj.write(content[:100])
+                raise SystemExit
+            stage(name, content)
+
+        writer.stage = stage_then_die
+        with self.assertRaises(SystemExit):
+            writer.run(keys)
+        self.assertFalse(os.path.exists(self.output))
+
+        writer = result_cards.ResultCardWriter(self.output, workers=0).run(keys)
+        self.assertEqual((writer.skipped, writer.written), (1, 2))
+        with zipfile.ZipFile(self.output) as archive:
+            self.assertEqual(sorted(archive.namelist()), sorted(result_cards.card_name(*key) for key in keys))
+            self.assertTrue(all(archive.read(name).endswith(result_cards.PDF_END) for name in archive.namelist()))
+        self.assertFalse(os.path.exists(writer.staging))
+
+    def test_admin_action_downloads_zip(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_login(admin)
+        response = self.client.post(reverse('admin:core_student_changelist'), {
+            'action': 'download_result_cards',
+            '_selected_action': [self.students[0].pk, self.students[2].pk],
+        })
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as archive:
+            self.assertEqual(sorted(archive.namelist()),
+                             [f'R0-{self.students[0].pk}.pdf', f'R2-{self.students[2].pk}.pdf'])
+
+    def test_similar_roll_numbers_get_separate_cards(self):
+        first = Student.objects.create(full_name='Slash', roll_number='A/1', email='a@example.com')
+        second = Student.objects.create(full_name='Underscore', roll_number='A_1', email='b@example.com')
+        writer = result_cards.ResultCardWriter(self.output, workers=0).run(
+            [(first.pk, first.roll_number), (second.pk, second.roll_number)])
+        self.assertEqual(writer.written, 2)
+        with zipfile.ZipFile(self.output) as archive:
+            self.assertEqual(len(set(archive.namelist())), 2)
+
+    @mock.patch('core.admin.MAX_ADMIN_CARDS', 1)
+    def test_admin_action_sends_large_selections_to_the_command(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pass'))
+        response = self.client.post(reverse('admin:core_student_changelist'), {
+            'action': 'download_result_cards',
+            '_selected_action': [self.students[0].pk, self.students[2].pk],
+        }, follow=True)
+        self.assertContains(response, 'generate_result_cards')
+
+
+def make_jpeg(name='photo.jpg', size=(1200, 800), color='navy'):
+    out = io.BytesIO()
+    Image.new('RGB', size, color).save(out, 'JPEG')
+    return SimpleUploadedFile(name, out.getvalue(), content_type='image/jpeg')
+
+
+class PhotoThumbnailTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.course = Course.objects.create(name='Physics', code='PHY101')
+        self.client.force_login(self.admin)
+
+    def add_student(self, roll_number, photo):
+        self.client.post(reverse('add_student'), {
+            'full_name': 'Photo Student', 'roll_number': roll_number, 'email': f'{roll_number}@example.com',
+            'course': self.course.pk, 'profile_photo': photo,
+        })
+        return Student.objects.get(roll_number=roll_number)
+
+    def test_upload_creates_hashed_thumbnails(self):
+        student = self.add_student('P1', make_jpeg())
+        self.assertEqual(len(student.photo_hash), 16)
+        for size in photos.PHOTO_SIZES:
+            for fmt in photos.PHOTO_FORMATS:
+                with Image.open(os.path.join(photos.default_storage.location,
+                                             photos.derivative_name(student.photo_hash, size, fmt))) as image:
+                    self.assertEqual((image.format, image.size), (fmt.upper(), (size, size)))
+
+        # The same picture uploaded again reuses the same files
+        self.assertEqual(self.add_student('P2', make_jpeg('other.jpg')).photo_hash, student.photo_hash)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Marks.objects.create(student=student, course=self.course, marks_obtained=50, total_marks=100)
+        response = self.client.get(reverse('student_result_card', args=[student.pk]))
+        for fmt, prefix in (('webp', '<source type="image/webp" '), ('jpeg', f'<img src="{{}}" ')):
+            small = photos.derivative_url(student.photo_hash, 80, fmt)
+            self.assertContains(response, prefix.format(small) + f'srcset="{small} 1x, '
+                                          f'{photos.derivative_url(student.photo_hash, 240, fmt)} 2x"')
+
+    def test_new_photo_gets_new_hash(self):
+        student = self.add_student('P1', make_jpeg())
+        self.client.post(reverse('edit_student', args=[student.pk]), {
+            'full_name': student.full_name, 'roll_number': 'P1', 'email': student.email,
+            'course': self.course.pk, 'profile_photo': make_jpeg(color='red'),
+        })
+        student_after = Student.objects.get(pk=student.pk)
+        self.assertNotEqual(student_after.photo_hash, student.photo_hash)
+
+    def test_backfill_command(self):
+        student = Student.objects.create(full_name='Old Photo', roll_number='P1', email='p1@example.com',
+                                         course=self.course, profile_photo=make_jpeg())
+        self.assertEqual(student.photo_hash, '')
+        call_command('generate_photo_thumbnails', workers=1, stdout=io.StringIO())
+        student.refresh_from_db()
+        self.assertTrue(photos.default_storage.exists(photos.derivative_name(student.photo_hash, 80)))
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.course = Course.objects.create(name='Physics', code='PHY101')
+        make_students(self.course, 3)
+        self.client.force_login(self.admin)
+
+    def test_records_per_view(self):
+        self.client.get(reverse('students'))
+        self.client.get(reverse('students'))
+        self.client.get('/no-such-page/')
+        stats = {view.name: view for view in metrics.snapshot()}
+        self.assertEqual(list(stats), ['students'])
+        self.assertEqual((stats['students'].requests, stats['students'].budget), (2, 3))
+        self.assertEqual(stats['students'].max_queries, 3)
+        self.assertGreater(stats['students'].response_bytes, 0)
+        self.assertGreater(stats['students'].template_seconds, 0)
+
+        response = self.client.get(reverse('metrics_dashboard'))
+        self.assertContains(response, '<code>students</code>')
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_prometheus_endpoint(self):
+        self.client.get(reverse('students'))
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('metrics_prometheus')).status_code, 403)
+        response = self.client.get(reverse('metrics_prometheus'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('sms_view_requests_total{view="students"} 1', text)
+        self.assertIn('sms_view_duration_seconds_bucket{view="students",le="+Inf"} 1', text)
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_strict_mode_fails_over_budget(self):
+        with mock.patch.object(views.student_list, 'query_budget', 2):
+            with self.assertRaises(metrics.QueryBudgetExceeded):
+                self.client.get(reverse('students'))
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(TestCase):
+    """
+    Every page with a @query_budget, on enough data that a per-row query
+    would show up. Any view over budget raises QueryBudgetExceeded.
+    """
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.courses = [Course.objects.create(name=f'Course {i}', code=f'C{i}') for i in range(3)]
+        for index, course in enumerate(self.courses):
+            make_students(course, 10, start=index * 10)
+        self.teacher = Teacher.objects.create(
+            name='Teacher', email='t@example.com', user=User.objects.create_user('teacher', password='pass'),
+        )
+        self.teacher.assigned_courses.set(self.courses)
+        self.student = Student.objects.first()
+        self.student.user = User.objects.create_user('student', password='pass')
+        self.student.save()
+
+    def test_pages_stay_within_budget(self):
+        course, student = self.courses[0], self.student
+        pages = {
+            self.admin: [
+                ('dashboard', []), ('students', []), ('teachers', []), ('courses', []),
+                ('student_detail', [student.pk]), ('teacher_detail', [self.teacher.pk]),
+                ('course_detail', [course.pk]), ('marks_dashboard', []), ('course_marks_list', [course.pk]),
+                ('bulk_marks', [course.pk]), ('student_result_card', [student.pk]), ('leaderboard', []),
+                ('analytics_overview', []), ('course_analytics', [course.pk]), ('roll_call', [course.pk]),
+                ('students_in_group', [course.pk]), ('teachers_in_group', [course.pk]),
+            ],
+            self.teacher.user: [
+                ('dashboard', []), ('marks_dashboard', []), ('course_marks_list', [course.pk]),
+                ('bulk_marks', [course.pk]), ('course_analytics', [course.pk]), ('roll_call', [course.pk]),
+            ],
+            student.user: [('dashboard', []), ('student_marks', [])],
+        }
+        for user, urls in pages.items():
+            self.client.force_login(user)
+            for name, args in urls:
+                with self.subTest(user=user.username, view=name):
+                    self.assertEqual(self.client.get(reverse(name, args=args)).status_code, 200)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(reverse('search'), {'q': 'Student'}).status_code, 200)
+        self.assertEqual(self.client.get(reverse('leaderboard'), {'course': course.pk}).status_code, 200)
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.user = User.objects.create_user('viewer', password='pass')
+        self.course = Course.objects.create(name='Chemistry', code='CHE101')
+        make_students(self.course, 3)
+        self.student = Student.objects.first()
+        self.teacher = Teacher.objects.create(name='Ms Rao', email='rao@example.com')
+
+    def get(self, name, *args):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name, args=args))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode(), len(queries)
+
+    def test_cached_pages_skip_their_queries(self):
+        self.client.force_login(self.admin)
+        for name, args in [('courses', []), ('student_course_groups', []), ('teacher_course_groups', []),
+                           ('course_detail', [self.course.pk]), ('student_detail', [self.student.pk]),
+                           ('teacher_detail', [self.teacher.pk])]:
+            with self.subTest(view=name):
+                uncached = self.get(name, *args)[1]
+                cached = self.get(name, *args)[1]
+                self.assertLess(cached, uncached)
+
+    def test_changes_invalidate_cached_pages(self):
+        self.client.force_login(self.admin)
+        self.get('course_detail', self.course.pk)
+        self.get('student_detail', self.student.pk)
+        self.get('teacher_course_groups')
+
+        self.student.full_name = 'Renamed Student'
+        self.student.save()
+        self.assertIn('Renamed Student', self.get('course_detail', self.course.pk)[0])
+
+        self.course.name = 'Organic Chemistry'
+        self.course.save()
+        self.assertIn('Organic Chemistry', self.get('student_detail', self.student.pk)[0])
+
+        self.teacher.assigned_courses.add(self.course)
+        self.assertIn('1 Teachers', self.get('teacher_course_groups')[0])
+        self.assertIn('Ms Rao', self.get('course_detail', self.course.pk)[0])
+
+        self.student.delete()
+        self.assertNotIn('Renamed Student', self.get('course_detail', self.course.pk)[0])
+
+    def test_admin_buttons_are_not_cached(self):
+        self.client.force_login(self.admin)
+        self.assertIn(reverse('edit_course', args=[self.course.pk]), self.get('course_detail', self.course.pk)[0])
+        self.client.force_login(self.user)
+        page, queries = self.get('course_detail', self.course.pk)
+        self.assertIn('CHE101', page)
+        self.assertNotIn(reverse('edit_course', args=[self.course.pk]), page)
+        self.assertNotIn(reverse('add_course'), self.get('courses')[0])
+
+    def test_bumps_are_shared_and_roll_back(self):
+        FragmentVersion.objects.filter(name='course').delete()
+        self.assertEqual(caching.versions('course', 'student').split(';')[0], 'course=0')
+        caching.bump('course')
+        first = caching.versions('course')
+        caching.bump('course', 'course')
+        self.assertEqual(FragmentVersion.objects.get(name='course').version, int(first.split('=')[1]) + 1)
+        bumped = caching.versions('course')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            caching.bump('course')
+            Course.objects.create(name='Duplicate', code='CHE101')
+        self.assertEqual(caching.versions('course'), bumped)
+
+    def test_admin_attendance_deletes_invalidate(self):
+        self.client.force_login(self.admin)
+        absent, present = [
+            Attendance.objects.create(student=student, course=self.course, date=datetime.date(2024, 3, 1), status=status)
+            for student, status in zip(Student.objects.order_by('pk'), ('Absent', 'Present'))
+        ]
+        self.assertIn('50.0%', self.get('courses')[0])
+
+        self.client.post(reverse('admin:core_attendance_delete', args=[absent.pk]), {'post': 'yes'})
+        self.assertIn('100.0%', self.get('courses')[0])
+
+        self.client.post(reverse('admin:core_attendance_changelist'), {
+            'action': 'delete_selected', '_selected_action': [present.pk], 'post': 'yes',
+        })
+        self.assertNotIn('100.0%', self.get('courses')[0])
+
+    def test_roster_import_invalidates(self):
+        self.client.force_login(self.admin)
+        self.get('courses')
+        IMPORTERS['courses']().run(read_rows(io.BytesIO(b'code,name\nPHY101,Physics\n'), 'courses.csv'))
+        self.assertIn('PHY101', self.get('courses')[0])
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class DetailPageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.client.force_login(self.admin)
+        self.course = Course.objects.create(name='Chemistry', code='CHE101')
+        make_students(self.course, 3)
+        self.student = Student.objects.order_by('pk').first()
+        Attendance.objects.create(student=self.student, course=self.course, date=datetime.date(2024, 1, 8),
+                                  status='Present')
+        Attendance.objects.create(student=self.student, course=self.course, date=datetime.date(2024, 1, 9),
+                                  status='Absent')
+        self.teacher = Teacher.objects.create(name='Ms Rao', email='rao@example.com')
+        self.teacher.assigned_courses.add(self.course)
+
+    def get(self, name, *args):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(name, args=args))
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode(), len(queries)
+
+    def test_query_counts_do_not_grow_with_the_course(self):
+        pages = [('course_detail', self.course.pk), ('student_detail', self.student.pk),
+                 ('teacher_detail', self.teacher.pk)]
+        before = [self.get(*page)[1] for page in pages]
+        make_students(self.course, views.DETAIL_LIST_LIMIT, start=100)
+        other = Course.objects.create(name='Physics', code='PHY101')
+        Marks.objects.create(student=self.student, course=other, marks_obtained=Decimal('90'),
+                             total_marks=Decimal('100'))
+        self.teacher.assigned_courses.add(other)
+        self.assertEqual([self.get(*page)[1] for page in pages], before)
+
+    def test_course_lists_are_capped(self):
+        page = self.get('course_detail', self.course.pk)[0]
+        self.assertNotIn('Show all students', page)
+        make_students(self.course, views.DETAIL_LIST_LIMIT, start=100)
+        page = self.get('course_detail', self.course.pk)[0]
+        self.assertEqual(page.count('(R0'), views.DETAIL_LIST_LIMIT)
+        self.assertIn(reverse('students_in_group', args=[self.course.pk]), page)
+        self.assertNotIn('Show all teachers', page)
+
+    def test_student_record(self):
+        page = self.get('student_detail', self.student.pk)[0]
+        self.assertIn('50.00 / 100.00', page)
+        self.assertIn('Present on <strong>1</strong> of 2 days', page)
+
+        # Other students only see the profile; the student sees their own record
+        other = Student.objects.exclude(pk=self.student.pk).first()
+        other.user = User.objects.create_user('other', password='pass')
+        other.save()
+        self.client.force_login(other.user)
+        self.assertNotIn('Attendance', self.get('student_detail', self.student.pk)[0])
+        self.assertIn('Attendance', self.get('student_detail', other.pk)[0])
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.course = Course.objects.create(name='Chemistry', code='CHE101')
+        make_students(self.course, 3)
+        self.student = Student.objects.first()
+        self.client.force_login(self.admin)
+
+    def get(self, name, *args, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(reverse(name, args=args), **headers)
+
+    def test_unchanged_page_answers_304_without_rendering(self):
+        for name, args in [('course_detail', [self.course.pk]), ('student_detail', [self.student.pk]),
+                           ('course_marks_list', [self.course.pk])]:
+            with self.subTest(view=name):
+                response = self.get(name, *args)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('private', response['Cache-Control'])
+                with CaptureQueriesContext(connection) as queries:
+                    again = self.get(name, *args, etag=response['ETag'])
+                self.assertEqual(again.status_code, 304)
+                self.assertEqual(again.templates, [])
+                # Session, user and the stamp
+                self.assertEqual(len(queries), 3)
+
+    def test_changes_give_a_new_etag(self):
+        def etag(name):
+            return self.get(name, self.course.pk)['ETag']
+        detail, marks = etag('course_detail'), etag('course_marks_list')
+
+        mark = Marks.objects.get(student=self.student)
+        views.save_course_marks(self.course, {self.student.pk: (Decimal('1'), Decimal('100'))}, {self.student.pk: mark})
+        self.assertEqual(etag('course_detail'), detail)
+        self.assertNotEqual(etag('course_marks_list'), marks)
+
+        Teacher.objects.create(name='Ms Rao', email='rao@example.com').assigned_courses.add(self.course)
+        self.assertNotEqual(etag('course_detail'), detail)
+        detail = etag('course_detail')
+
+        self.student.delete()
+        self.assertEqual(self.get('course_detail', self.course.pk, etag=detail).status_code, 200)
+
+    def test_student_record_changes_give_a_new_etag(self):
+        def etag():
+            return self.get('student_detail', self.student.pk)['ETag']
+        first = etag()
+        Attendance.objects.create(student=self.student, course=self.course, date=datetime.date(2024, 1, 8),
+                                  status='Present')
+        second = etag()
+        self.assertNotEqual(second, first)
+        mark = Marks.objects.get(student=self.student)
+        views.save_course_marks(self.course, {self.student.pk: (Decimal('90'), Decimal('100'))}, {self.student.pk: mark})
+        self.assertNotEqual(etag(), second)
+
+    def test_renamed_course_of_a_mark_gives_a_new_etag(self):
+        other = Course.objects.create(name='Biology', code='BIO101')
+        Marks.objects.create(student=self.student, course=other, marks_obtained=30, total_marks=50)
+        response = self.get('student_detail', self.student.pk)
+        other.name = 'Marine Biology'
+        other.save()
+        again = self.get('student_detail', self.student.pk, etag=response['ETag'])
+        self.assertEqual(again.status_code, 200)
+        self.assertContains(again, 'Marine Biology')
+
+    def test_etag_depends_on_user(self):
+        response = self.get('course_detail', self.course.pk)
+        self.client.force_login(User.objects.create_user('viewer', password='pass'))
+        self.assertEqual(self.get('course_detail', self.course.pk, etag=response['ETag']).status_code, 200)
+
+    def test_missing_object_is_still_404(self):
+        self.assertEqual(self.get('course_detail', 999).status_code, 404)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class AsyncViewTests(TestCase):
+    """
+    The async pages through the ASGI handler, as under uvicorn/daphne.
+    """
+    def setUp(self):
+        metrics.reset()
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pass')
+        self.course = Course.objects.create(name='Physics', code='PHY101')
+        make_students(self.course, 3)
+        self.student = Student.objects.first()
+        self.student.user = User.objects.create_user('student', password='pass')
+        self.student.save()
+        self.teacher = Teacher.objects.create(
+            name='Teacher', email='t@example.com', user=User.objects.create_user('teacher', password='pass'),
+        )
+        self.teacher.assigned_courses.add(self.course)
+
+    async def test_pages_render_under_asgi(self):
+        pages = {
+            self.admin: [
+                ('dashboard', []), ('students', []), ('teachers', []), ('courses', []),
+                ('student_detail', [self.student.pk]), ('teacher_detail', [self.teacher.pk]),
+                ('course_detail', [self.course.pk]), ('student_result_card', [self.student.pk]),
+            ],
+            self.teacher.user: [('dashboard', [])],
+            self.student.user: [('dashboard', []), ('student_marks', [])],
+        }
+        for user, urls in pages.items():
+            await sync_to_async(self.async_client.force_login)(user)
+            for name, args in urls:
+                with self.subTest(user=user.username, view=name):
+                    response = await self.async_client.get(reverse(name, args=args))
+                    self.assertEqual(response.status_code, 200)
+        self.assertContains(await self.async_client.get(reverse('student_marks')), 'PHY101')
+
+        # Queries run on the request's ORM thread are still counted
+        stats = {view.name: view for view in metrics.snapshot()}
+        self.assertGreaterEqual(stats['students'].max_queries, 3)
+
+    async def test_login_and_404(self):
+        response = await self.async_client.get(reverse('students'))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(reverse('login')))
+        await sync_to_async(self.async_client.force_login)(self.admin)
+        self.assertEqual((await self.async_client.get(reverse('student_detail', args=[999]))).status_code, 404)
+
+    async def test_conditional_get_under_asgi(self):
+        await sync_to_async(self.async_client.force_login)(self.admin)
+        url = reverse('course_detail', args=[self.course.pk])
+        etag = (await self.async_client.get(url))['ETag']
+        self.assertEqual((await self.async_client.get(url, headers={'If-None-Match': etag})).status_code, 304)
+
+
+class SeedingTests(TestCase):
+    def setUp(self):
+        self.seeder = DatasetSeeder(60, 4, marks_per_student=3, days=2).run()
+
+    def test_rows_are_consistent(self):
+        self.assertEqual(Student.objects.count(), 60)
+        self.assertEqual(Course.objects.count(), 4)
+        self.assertEqual(Marks.objects.count(), 180)
+        self.assertEqual(Attendance.objects.count(), 120)
+        self.assertEqual(self.seeder.written[Marks._meta.db_table], 180)
+        self.assertFalse(Marks.objects.values('student', 'course').annotate(n=Count('pk')).filter(n__gt=1))
+        self.assertFalse(Course.objects.filter(teachers__isnull=True))
+        self.assertEqual(search.search('S00000001')[0].object, Student.objects.get(roll_number='S00000001'))
+
+    def test_summaries_match_rebuild(self):
+        def summaries():
+            return list(StudentResultSummary.objects.order_by('student').values_list(
+                'student', 'total_obtained', 'percentage', 'courses_passed', 'class_rank'))
+        seeded = summaries()
+        self.assertEqual(len(seeded), 60)
+        rebuild_summaries()
+        self.assertEqual(seeded, summaries())
+
+    def test_rejects_empty_sizes(self):
+        for option in ('students', 'courses', 'teachers'):
+            with self.subTest(option=option), self.assertRaises(CommandError):
+                call_command('seed_scale', **{option: 0}, stdout=io.StringIO())
+
+    def test_time_calls_percentiles(self):
+        # Two calls taking 1ms and 2ms
+        with mock.patch('core.benchmarks.time.perf_counter', side_effect=[0, 0.001, 0, 0.002]):
+            timings = benchmarks.time_calls(lambda: None, [(), ()])
+        self.assertAlmostEqual(timings['median_ms'], 1.5)
+        self.assertAlmostEqual(timings['p95_ms'], 2)
+
+    def test_bench_routes_writes_json(self):
+        output = os.path.join(tempfile.mkdtemp(), 'bench.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(output))
+        # The benchmark seeds its own throwaway database
+        with mock.patch('core.management.commands.bench_routes.temporary_database'):
+            call_command('bench_routes', sizes='30', courses=3, repeat=1, output=output,
+                         routes='dashboard,student_detail,course_marks_list,student_marks,add_course',
+                         stdout=io.StringIO(), stderr=io.StringIO())
+        with open(output) as fileobj:
+            results = json.load(fileobj)
+        routes = results['sizes'][0]['routes']
+        self.assertEqual(set(routes), {'dashboard', 'student_detail', 'course_marks_list', 'student_marks', 'add_course'})
+        self.assertTrue(all(route['status'] == 200 for route in routes.values()))
+
+
+class SQLiteTuningTests(TestCase):
+    def new_connection(self):
+        """
+        A separate connection to a new database file, set up by the
+        connection_created handler like every other connection.
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        wrapper = type(connections['default'])(dict(connection.settings_dict, NAME=os.path.join(directory, 'db.sqlite3')))
+        self.addCleanup(wrapper.close)
+        wrapper.ensure_connection()
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        return wrapper.connection.execute(f'PRAGMA {name}').fetchone()[0]
+
+    @override_settings(SQLITE_PRAGMAS={'journal_mode': 'wal', 'synchronous': 'normal'},
+                       SQLITE_IMMEDIATE_TRANSACTIONS=True)
+    def test_tuned_connections(self):
+        wrapper = self.new_connection()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        with CaptureQueriesContext(wrapper) as queries:
+            wrapper._start_transaction_under_autocommit()
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+    @override_settings(SQLITE_PRAGMAS={}, SQLITE_IMMEDIATE_TRANSACTIONS=False)
+    def test_defaults_leave_connections_alone(self):
+        wrapper = self.new_connection()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+        self.assertNotIn('_start_transaction_under_autocommit', vars(wrapper))
+
+
+@override_settings(REPLICA_DATABASE='replica')
+class ReplicaRoutingTests(SimpleTestCase):
+    # Not a TestCase: reads inside its transaction always go to the primary
+
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+
+    def test_reads_go_to_replica_until_the_request_writes(self):
+        routing = routers.RequestRouting(pinned=False)
+        token = routers.current.set(routing)
+        self.addCleanup(routers.current.reset, token)
+        self.assertEqual(self.router.db_for_read(Student), 'replica')
+        # Fragments rendered from the replica are keyed by its own versions
+        self.assertEqual(self.router.db_for_read(FragmentVersion), 'replica')
+        # Logins and sessions must not lag
+        self.assertEqual(self.router.db_for_read(User), 'default')
+        with routers.primary():
+            self.assertEqual(self.router.db_for_read(Student), 'default')
+
+        self.assertEqual(self.router.db_for_write(Marks), 'default')
+        self.assertTrue(routing.wrote)
+        self.assertEqual(self.router.db_for_read(Student), 'default')
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(self.router.db_for_read(Student), 'default')
+
+    def request(self, method='get', cookies=None, writes=False):
+        """
+        (database read from, response) of a request through the middleware.
+        """
+        used = []
+
+        def view(request):
+            if writes:
+                self.router.db_for_write(Marks)
+            used.append(self.router.db_for_read(Student))
+            return HttpResponse()
+
+        request = getattr(RequestFactory(), method)('/')
+        request.COOKIES.update(cookies or {})
+        response = ReplicaMiddleware(view)(request)
+        return used[0], response
+
+    def test_middleware_pins_browsers_that_wrote(self):
+        database, response = self.request()
+        self.assertEqual(database, 'replica')
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+        database, response = self.request('post', writes=True)
+        self.assertEqual(database, 'default')
+        self.assertEqual(response.cookies[routers.PIN_COOKIE]['max-age'], 10)
+
+        database, response = self.request(cookies={routers.PIN_COOKIE: '1'})
+        self.assertEqual(database, 'default')
+
+    @override_settings(REPLICA_DATABASE=None)
+    def test_middleware_unused_without_replica(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaMiddleware(lambda request: HttpResponse())
+
+
+class SyncReplicaTests(TransactionTestCase):
+    # The in-memory test database cannot be copied while TestCase holds
+    # a transaction open on it
+
+    def test_copies_primary_with_its_fragment_versions(self):
+        Student.objects.create(full_name='Ann', roll_number='R1', email='ann@example.com')
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'replica.sqlite3')
+        version = FragmentVersion.objects.get(name='student').version
+
+        call_command('sync_replica', to=path, stdout=io.StringIO())
+
+        replica = sqlite3.connect(path)
+        self.addCleanup(replica.close)
+        self.assertEqual(replica.execute(f'SELECT COUNT(*) FROM {Student._meta.db_table}').fetchone(), (1,))
+        self.assertEqual(replica.execute(f'SELECT version FROM {FragmentVersion._meta.db_table} '
+                                         "WHERE name = 'student'").fetchone(), (version,))
+        # Copying changes no data, so cached fragments stay valid
+        self.assertEqual(FragmentVersion.objects.get(name='student').version, version)
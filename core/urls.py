@@ -18,12 +18,17 @@ urlpatterns = [
     path('students/add/', views.add_student, name='add_student'),
     path('teachers/add/', views.add_teacher, name='add_teacher'),
     path('courses/add/', views.add_course, name='add_course'),
+    path('roster/import/', views.import_roster, name='import_roster'),
+    path('export/<str:kind>/', views.export_data, name='export_data'),
 
     # Detail Sections
     path('students/<int:pk>/', views.student_detail, name='student_detail'),
     path('teachers/<int:pk>/', views.teacher_detail, name='teacher_detail'),
     path('courses/<int:pk>/', views.course_detail, name='course_detail'),
 
+    # Search
+    path('search/', views.search_view, name='search'),
+
     # Edit Sections (Admin Only)
     path('students/<int:pk>/edit/', views.edit_student, name='edit_student'),
     path('teachers/<int:pk>/edit/', views.edit_teacher, name='edit_teacher'),
@@ -43,7 +48,21 @@ urlpatterns = [
     # Marks / Results Section
     path('marks/dashboard/', views.marks_dashboard, name='marks_dashboard'),
     path('marks/course/<int:course_id>/', views.course_marks_list, name='course_marks_list'),
+    path('marks/course/<int:course_id>/bulk/', views.bulk_marks, name='bulk_marks'),
     path('marks/add/<int:course_id>/<int:student_id>/', views.add_marks, name='add_marks'),
     path('my-marks/', views.student_marks, name='student_marks'),
     path('student-result/<int:pk>/', views.student_result_card, name='student_result_card'), # New Result Card View
+    path('marks/leaderboard/', views.leaderboard, name='leaderboard'),
+
+    # Grade Analytics
+    path('analytics/', views.analytics_overview, name='analytics_overview'),
+    path('analytics/course/<int:course_id>/', views.course_analytics, name='course_analytics'),
+    path('analytics/course/<int:course_id>/api/', views.course_analytics_api, name='course_analytics_api'),
+
+    # Request Metrics
+    path('metrics/', views.metrics_dashboard, name='metrics_dashboard'),
+    path('metrics/prometheus/', views.metrics_prometheus, name='metrics_prometheus'),
+
+    # Attendance Section
+    path('attendance/course/<int:course_id>/', views.roll_call, name='roll_call'),
 ]
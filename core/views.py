@@ -1,53 +1,126 @@
+
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required, user_passes_test
+from django.urls import reverse
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import user_passes_test
 from django.contrib.auth import views as auth_views
 from django.contrib import messages
-from .models import Student, Teacher, Course, Marks
-from .forms import StudentForm, TeacherForm, CourseForm, MarksForm
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_date
+from django.utils.functional import SimpleLazyObject
+from .models import Student, Teacher, Course, Marks, Attendance
+from .forms import StudentForm, TeacherForm, CourseForm, MarksForm, MarksEntryFormSet, RosterUploadForm
+from . import analytics, caching, conditional, metrics, photos, ranking, search
+from .conditional import conditional_page
+from .counters import aget_dashboard_counts
+from .exports import DATED_EXPORTS, EXPORTS, FORMATS, export_lines
+from .importers import IMPORTERS, ImportFileError, read_rows
+from .metrics import query_budget
+from .pagination import MAX_PAGE_SIZE, paginate_keyset
+from .permissions import course_access_required, login_required
+from .roles import TEACHER, STUDENT, get_roles
+from .summaries import get_summary, refresh_summaries, with_results
+
+# The course listings show figures from all of these models
+# (see analytics.with_course_stats), so their fragments vary on each.
+# Versions are per model, not per course: any saved mark or roll-call
+# entry discards all three listing fragments. Rebuilding one is a single
+# query, so while marks are being entered the listings simply stay
+# uncached.
+COURSE_STATS_MODELS = ('course', 'student', 'teacher', 'marks', 'attendance')
 
 # Role Checks
 def is_admin(user):
     return user.is_superuser
 
 def is_teacher(user):
-    return hasattr(user, 'teacher')
+    return TEACHER in get_roles(user)
 
 def is_student(user):
-    return hasattr(user, 'student')
+    return STUDENT in get_roles(user)
+
+# Async helpers
+# The read-only pages below are async views (served without a worker
+# thread per request under ASGI). RoleMiddleware has already loaded
+# request.user and its profiles, so role checks don't touch the database.
+
+async def arender(request, template_name, context=None):
+    # Templates can still run lazy queries (related managers, fragments
+    # that missed the cache), and the ORM may not run on the event loop
+    return await sync_to_async(render)(request, template_name, context)
+
+async def aget_object_or_404(klass, **kwargs):
+    # A model or a queryset, like get_object_or_404
+    queryset = klass._default_manager.all() if hasattr(klass, '_default_manager') else klass
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+
+def prefetched(instance, *lookups):
+    """
+    The instance, with `lookups` prefetched the first time the template
+    reads from it. Detail pages put their related lists inside a cached
+    fragment; loaded this way they cost no queries when it is cached.
+    """
+    def load():
+        prefetch_related_objects([instance], *lookups)
+        return instance
+    return SimpleLazyObject(load)
 
 # Dashboard View
+@query_budget(8)
 @login_required
-def dashboard_view(request):
+async def dashboard_view(request):
     if is_admin(request.user):
-        return render(request, 'dashboard/admin_dashboard.html', get_admin_context())
+        return await arender(request, 'dashboard/admin_dashboard.html', await get_admin_context())
     elif is_teacher(request.user):
-        return render(request, 'dashboard/teacher_dashboard.html', get_teacher_context(request.user))
+        return await arender(request, 'dashboard/teacher_dashboard.html', await get_teacher_context(request.user))
     elif is_student(request.user):
-        return render(request, 'dashboard/student_dashboard.html', get_student_context(request.user))
+        return await arender(request, 'dashboard/student_dashboard.html', await get_student_context(request.user))
     else:
         # Fallback or unrelated user
-        return render(request, 'dashboard.html')
+        return await arender(request, 'dashboard.html')
 
 # Context Helpers
-def get_admin_context():
-    return {
-        'total_students': Student.objects.count(),
-        'total_teachers': Teacher.objects.count(),
-        'total_courses': Course.objects.count(),
-    }
+async def get_admin_context():
+    # Served from the cache; kept current by the signal handlers in core/signals.py
+    return await aget_dashboard_counts()
 
-def get_teacher_context(user):
+async def get_teacher_context(user):
     return {
-        'courses': user.teacher.assigned_courses.all()
+        'courses': [course async for course in user.teacher.assigned_courses.all()]
     }
 
-def get_student_context(user):
-    marks = Marks.objects.filter(student=user.student)
+async def get_student_context(user):
+    return await get_result_context(user.student)
+
+async def get_result_context(student):
+    # Totals, pass/fail counts and class rank come from the precomputed
+    # summary row; course and overall ranks from window functions
+    marks_query = with_results(Marks.objects.filter(student=student).select_related('course')).order_by('course__code')
+    # One after the other: the ORM runs a request's queries in one thread,
+    # so gathering them would not make them overlap
+    marks = await alist(marks_query)
+    ranks = await sync_to_async(ranking.student_course_ranks)(student)
+    summary = await sync_to_async(get_summary)(student)
+    for mark in marks:
+        mark.course_rank, mark.course_percentile, mark.course_size = ranks.get(mark.course_id, (None, None, None))
     return {
-        'student': user.student,
-        'marks': marks
+        'student': student,
+        'marks': marks,
+        'summary': summary,
+        'overall': await sync_to_async(ranking.student_overall_rank)(summary),
     }
 
+async def alist(queryset):
+    return [row async for row in queryset]
+
 # Decorators
 def admin_required(view_func):
     return user_passes_test(is_admin)(view_func)
@@ -59,32 +132,38 @@ def teacher_required(view_func):
 # NEW VIEWS FOR NAVIGATION (Students, Teachers, Courses)
 # ---------------------------------------------------
 
+@query_budget(3)
 @login_required
-def student_list(request):
+async def student_list(request):
     """
-    View to list all students.
-    Fetches all student records and renders 'students/student_list.html'.
+    View to list all students, one page at a time.
+    Renders 'students/student_list.html'.
     """
-    students = Student.objects.all() # Fetch all students from database
-    return render(request, 'students/student_list.html', {'students': students})
+    # One page at a time, ordered by roll number, with each student's course joined in
+    page = await paginate_keyset(request, Student.objects.select_related('course'), key='roll_number').aload()
+    return await arender(request, 'students/student_list.html', {'students': page.object_list, 'page': page})
 
+@query_budget(4)
 @login_required
-def teacher_list(request):
+async def teacher_list(request):
     """
-    View to list all teachers.
-    Fetches all teacher records and renders 'teachers/teacher_list.html'.
+    View to list all teachers, one page at a time.
+    Renders 'teachers/teacher_list.html'.
     """
-    teachers = Teacher.objects.all() # Fetch all teachers from database
-    return render(request, 'teachers/teacher_list.html', {'teachers': teachers})
+    page = await paginate_keyset(request, Teacher.objects.prefetch_related('assigned_courses'), key='pk').aload()
+    return await arender(request, 'teachers/teacher_list.html', {'teachers': page.object_list, 'page': page})
 
+@query_budget(4)
 @login_required
-def course_list(request):
+async def course_list(request):
     """
-    View to list all courses.
-    Fetches all course records and renders 'courses/course_list.html'.
+    View to list all courses, one page at a time.
+    Renders 'courses/course_list.html'.
     """
-    courses = Course.objects.all() # Fetch all courses from database
-    return render(request, 'courses/course_list.html', {'courses': courses})
+    versions = await caching.aversions(*COURSE_STATS_MODELS)
+    page = paginate_keyset(request, analytics.with_course_stats(Course.objects.all()), key='code')
+    # page.object_list is only fetched when the cached table is missing
+    return await arender(request, 'courses/course_list.html', {'page': page, 'versions': versions})
 
 # ---------------------------------------------------
 # ADD VIEWS (Admin Only)
@@ -100,7 +179,9 @@ def add_student(request):
     if request.method == 'POST':
         form = StudentForm(request.POST, request.FILES) # Handle file upload (profile_photo)
         if form.is_valid():
-            form.save()
+            student = form.save()
+            if student.profile_photo:
+                photos.process_photo(student)
             messages.success(request, 'Student added successfully!')
             return redirect('students')
     else:
@@ -144,33 +225,158 @@ def add_course(request):
     
     return render(request, 'courses/add_course.html', {'form': form})
 
+@login_required
+@admin_required
+def import_roster(request):
+    """
+    View to bulk import students, teachers or courses from a CSV/XLSX upload.
+    Only accessible by Admins.
+    """
+    importer = None
+    if request.method == 'POST':
+        form = RosterUploadForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            importer = IMPORTERS[form.cleaned_data['kind']]()
+            try:
+                importer.run(read_rows(upload.file, upload.name))
+            except ImportFileError as exc:
+                messages.error(request, str(exc))
+                importer = None
+            else:
+                messages.success(request, f'Imported {importer.created} records.')
+    else:
+        form = RosterUploadForm()
+
+    return render(request, 'roster/import_roster.html', {'form': form, 'importer': importer})
+
+@login_required
+@admin_required
+def export_data(request, kind):
+    """
+    Streams students, marks or attendance as CSV or JSON Lines.
+    Optional query parameters: format (csv/jsonl), course (course code),
+    from and to (attendance dates, YYYY-MM-DD; a 400 for other exports).
+    Only accessible by Admins.
+    """
+    if kind not in EXPORTS:
+        raise Http404('Unknown export.')
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in FORMATS:
+        return HttpResponseBadRequest('Unknown format.')
+
+    filters = {'course': request.GET.get('course') or None}
+    for param, key in (('from', 'date_from'), ('to', 'date_to')):
+        if request.GET.get(param):
+            if kind not in DATED_EXPORTS:
+                # Ignoring it would silently export every row
+                return HttpResponseBadRequest(f'"{param}" only applies to attendance exports.')
+            try:
+                filters[key] = parse_date(request.GET[param])
+            except ValueError:
+                filters[key] = None
+            if filters[key] is None:
+                return HttpResponseBadRequest(f'Invalid "{param}" date, expected YYYY-MM-DD.')
+
+    response = StreamingHttpResponse(export_lines(kind, fmt, **filters), content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+    return response
+
 # ---------------------------------------------------
 # DETAIL VIEWS
 # ---------------------------------------------------
 
+# Longest member list on a detail page; the rest are behind "Show all"
+DETAIL_LIST_LIMIT = 50
+
+@query_budget(7)
 @login_required
-def student_detail(request, pk):
-    """
-    View to show details of a single student.
-    """
-    student = get_object_or_404(Student, pk=pk)
-    return render(request, 'students/student_detail.html', {'student': student})
+@conditional_page(conditional.student_detail_stamp)
+async def student_detail(request, pk):
+    """
+    View to show details of a single student. Admins, teachers and the
+    student themself also see their marks and attendance.
+    """
+    versions = await caching.aversions('student', 'course', 'marks', 'attendance')
+    student = await aget_object_or_404(
+        Student.objects.select_related('course', 'result_summary').only(
+            'full_name', 'roll_number', 'email', 'dob', 'profile_photo', 'photo_hash',
+            'course__name', 'result_summary__percentage', 'result_summary__class_rank',
+        ),
+        pk=pk,
+    )
+    show_record = (is_admin(request.user) or is_teacher(request.user)
+                   or (is_student(request.user) and request.user.student.pk == student.pk))
+    return await arender(request, 'students/student_detail.html', {
+        'student': student,
+        'record': prefetched(student, Prefetch(
+            'marks_set', to_attr='course_marks',
+            queryset=with_results(Marks.objects.select_related('course')).only(
+                'student_id', 'marks_obtained', 'total_marks', 'course__name', 'course__code',
+            ).order_by('course__code'),
+        )),
+        'attendance': SimpleLazyObject(lambda: analytics.attendance_summary(student.pk)),
+        'show_record': show_record,
+        'versions': versions,
+    })
 
+@query_budget(5)
 @login_required
-def teacher_detail(request, pk):
+async def teacher_detail(request, pk):
     """
     View to show details of a single teacher.
     """
-    teacher = get_object_or_404(Teacher, pk=pk)
-    return render(request, 'teachers/teacher_detail.html', {'teacher': teacher})
+    versions = await caching.aversions('teacher', 'course')
+    teacher = await aget_object_or_404(Teacher.objects.only('name', 'email'), pk=pk)
+    return await arender(request, 'teachers/teacher_detail.html', {
+        'teacher': teacher,
+        'courses': prefetched(teacher, Prefetch(
+            'assigned_courses', to_attr='listed_courses',
+            queryset=Course.objects.only('name', 'code').order_by('code'),
+        )),
+        'versions': versions,
+    })
+
+@query_budget(7)
+@login_required
+@conditional_page(conditional.course_detail_stamp)
+async def course_detail(request, pk):
+    """
+    View to show details of a single course, with the first
+    DETAIL_LIST_LIMIT students and teachers.
+    """
+    versions = await caching.aversions('course', 'student', 'teacher')
+    course = await aget_object_or_404(Course.objects.only('name', 'code', 'description'), pk=pk)
+    # One row more than shown, to know whether to offer "Show all"
+    return await arender(request, 'courses/course_detail.html', {
+        'course': course,
+        'members': prefetched(
+            course,
+            Prefetch('student_set', to_attr='listed_students',
+                     queryset=Student.objects.only('full_name', 'roll_number', 'course_id')
+                     .order_by('roll_number')[:DETAIL_LIST_LIMIT + 1]),
+            Prefetch('teachers', to_attr='listed_teachers',
+                     queryset=Teacher.objects.only('name').order_by('name')[:DETAIL_LIST_LIMIT + 1]),
+        ),
+        'limit': DETAIL_LIST_LIMIT,
+        'versions': versions,
+    })
+
+# ---------------------------------------------------
+# SEARCH
+# ---------------------------------------------------
 
+# The index lookup plus one query per kind of result found
+@query_budget(6)
 @login_required
-def course_detail(request, pk):
+def search_view(request):
     """
-    View to show details of a single course.
+    Search students, teachers and courses by name, roll number, email,
+    code or description. Every word is matched as a prefix.
     """
-    course = get_object_or_404(Course, pk=pk)
-    return render(request, 'courses/course_detail.html', {'course': course})
+    query = request.GET.get('q', '').strip()
+    results = search.search(query) if query else []
+    return render(request, 'search/results.html', {'query': query, 'results': results})
 
 # ---------------------------------------------------
 # EDIT VIEWS (Admin Only)
@@ -188,6 +394,8 @@ def edit_student(request, pk):
         form = StudentForm(request.POST, request.FILES, instance=student)
         if form.is_valid():
             form.save()
+            if 'profile_photo' in form.changed_data:
+                photos.process_photo(student)
             messages.success(request, 'Student updated successfully!')
             return redirect('student_detail', pk=pk)
     else:
@@ -287,31 +495,39 @@ def delete_course(request, pk):
 # CATEGORIZED VIEWS (New Request)
 # ---------------------------------------------------
 
+@query_budget(4)
 @login_required
 def student_course_groups(request):
     """
     View to list courses for the purpose of viewing student groups.
     """
-    courses = Course.objects.all()
-    return render(request, 'students/course_groups.html', {'courses': courses})
+    versions = caching.versions(*COURSE_STATS_MODELS)
+    courses = analytics.with_course_stats(Course.objects.all())
+    return render(request, 'students/course_groups.html', {'courses': courses, 'versions': versions})
 
+@query_budget(4)
 @login_required
 def students_in_group(request, pk):
     """
     View to list students in a specific course group.
     """
     course = get_object_or_404(Course, pk=pk)
-    students = Student.objects.filter(course=course)
-    return render(request, 'students/students_in_group.html', {'course': course, 'students': students})
+    page = paginate_keyset(request, Student.objects.filter(course=course), key='roll_number')
+    return render(request, 'students/students_in_group.html', {
+        'course': course, 'students': page.object_list, 'page': page,
+    })
 
+@query_budget(4)
 @login_required
 def teacher_course_groups(request):
     """
     View to list courses for the purpose of viewing teacher groups.
     """
-    courses = Course.objects.all()
-    return render(request, 'teachers/course_groups.html', {'courses': courses})
+    versions = caching.versions(*COURSE_STATS_MODELS)
+    courses = analytics.with_course_stats(Course.objects.all())
+    return render(request, 'teachers/course_groups.html', {'courses': courses, 'versions': versions})
 
+@query_budget(4)
 @login_required
 def teachers_in_group(request, pk):
     """
@@ -319,8 +535,10 @@ def teachers_in_group(request, pk):
     """
     course = get_object_or_404(Course, pk=pk)
     # Teacher has ManyToManyField 'assigned_courses'
-    teachers = Teacher.objects.filter(assigned_courses=course)
-    return render(request, 'teachers/teachers_in_group.html', {'course': course, 'teachers': teachers})
+    page = paginate_keyset(request, Teacher.objects.filter(assigned_courses=course), key='pk')
+    return render(request, 'teachers/teachers_in_group.html', {
+        'course': course, 'teachers': page.object_list, 'page': page,
+    })
     
     return render(request, 'students/delete_student.html', {'student': student})
 
@@ -358,6 +576,7 @@ def delete_course(request, pk):
 # MARKS / RESULTS SECTION
 # ---------------------------------------------------
 
+@query_budget(3)
 @login_required
 def marks_dashboard(request):
     """
@@ -376,7 +595,10 @@ def marks_dashboard(request):
         messages.error(request, "Access denied. Teachers only.")
         return redirect('dashboard')
 
+@query_budget(8)
 @login_required
+@course_access_required
+@conditional_page(conditional.course_marks_stamp)
 def course_marks_list(request, course_id):
     """
     List of students in a course with their marks.
@@ -384,26 +606,29 @@ def course_marks_list(request, course_id):
     """
     course = get_object_or_404(Course, pk=course_id)
     
-    # Permission check: Admin or the assigned teacher
-    if not is_admin(request.user):
-        if not hasattr(request.user, 'teacher') or course not in request.user.teacher.assigned_courses.all():
-             messages.error(request, "You are not assigned to this course.")
-             return redirect('marks_dashboard')
+    # Fetch the roster and every student's mark for this course up front
+    # (one query for students, one for marks) instead of one query per student.
+    # Marks carry their rank within the whole course (see core/ranking.py).
+    roster = Student.objects.filter(course=course)
+    marks = {
+        mark.student_id: mark
+        for mark in ranking.attach_course_ranks(
+            ranking.with_score(Marks.objects.filter(course=course, student__course=course))
+        )
+    }
 
-    students = Student.objects.filter(course=course)
-    
     # We want to show existing marks if any
     student_marks = []
-    for student in students:
-        mark = Marks.objects.filter(student=student, course=course).first()
+    for student in roster.select_related('course').order_by('roll_number'):
         student_marks.append({
             'student': student,
-            'mark': mark
+            'mark': marks.get(student.pk)
         })
-    
+
     return render(request, 'marks/course_marks_list.html', {'course': course, 'student_marks': student_marks})
 
 @login_required
+@course_access_required
 def add_marks(request, course_id, student_id):
     """
     Form to add or edit marks for a specific student in a specific course.
@@ -411,22 +636,17 @@ def add_marks(request, course_id, student_id):
     course = get_object_or_404(Course, pk=course_id)
     student = get_object_or_404(Student, pk=student_id)
     
-    # Permission check
-    if not is_admin(request.user):
-        if not hasattr(request.user, 'teacher') or course not in request.user.teacher.assigned_courses.all():
-             messages.error(request, "You are not assigned to this course.")
-             return redirect('marks_dashboard')
-    
-    # Check if mark already exists
-    existing_mark = Marks.objects.filter(student=student, course=course).first()
+    # Check if mark already exists (there is at most one per student and course)
+    try:
+        existing_mark = Marks.objects.get(student=student, course=course)
+    except Marks.DoesNotExist:
+        existing_mark = None
     
     if request.method == 'POST':
         form = MarksForm(request.POST, instance=existing_mark)
         if form.is_valid():
-            mark = form.save(commit=False)
-            mark.student = student
-            mark.course = course
-            mark.save()
+            # Also updates the row if another request created it meanwhile
+            Marks.objects.update_or_create(student=student, course=course, defaults=form.cleaned_data)
             messages.success(request, f'Marks saved for {student.full_name}')
             return redirect('course_marks_list', course_id=course.id)
     else:
@@ -438,8 +658,283 @@ def add_marks(request, course_id, student_id):
         'student': student
     })
 
+@query_budget(6)
 @login_required
-def student_marks(request):
+@course_access_required
+def bulk_marks(request, course_id):
+    """
+    Spreadsheet-style grid to enter marks for every student in a course
+    with a single POST. All rows are validated together and saved in one
+    transaction.
+    """
+    course = get_object_or_404(Course, pk=course_id)
+
+    students = list(
+        Student.objects.filter(course=course)
+        .only('id', 'full_name', 'roll_number')
+        .order_by('roll_number')
+    )
+    existing = {mark.student_id: mark for mark in Marks.objects.filter(course=course)}
+
+    if request.method == 'POST':
+        formset = MarksEntryFormSet(request.POST)
+        if formset.is_valid():
+            roster_ids = {student.pk for student in students}
+            entries = {
+                form.cleaned_data['student_id']: (
+                    form.cleaned_data['marks_obtained'],
+                    form.cleaned_data['total_marks'],
+                )
+                for form in formset
+                if form.has_marks() and form.cleaned_data['student_id'] in roster_ids
+            }
+            created, updated = save_course_marks(course, entries, existing)
+            messages.success(request, f'Marks saved: {created} added, {updated} updated.')
+            return redirect('course_marks_list', course_id=course.id)
+    else:
+        formset = MarksEntryFormSet(initial=[
+            {
+                'student_id': student.pk,
+                'marks_obtained': existing[student.pk].marks_obtained if student.pk in existing else None,
+                'total_marks': existing[student.pk].total_marks if student.pk in existing else None,
+            }
+            for student in students
+        ])
+
+    # Pair every grid row with its student for display
+    students_by_id = {student.pk: student for student in students}
+    rows = []
+    for form in formset:
+        try:
+            student = students_by_id.get(int(form['student_id'].value()))
+        except (TypeError, ValueError):
+            student = None
+        rows.append((student, form))
+
+    return render(request, 'marks/bulk_marks.html', {
+        'course': course,
+        'formset': formset,
+        'rows': rows,
+    })
+
+def save_course_marks(course, entries, existing):
+    """
+    Writes {student_id: (marks_obtained, total_marks)} for a course using
+    one bulk insert and one bulk update inside a single transaction.
+    `existing` maps student_id to the course's current Marks rows.
+    Returns (created, updated) counts.
+    """
+    to_create = []
+    to_update = []
+    now = timezone.now()
+    for student_id, (obtained, total) in entries.items():
+        mark = existing.get(student_id)
+        if mark is None:
+            to_create.append(Marks(
+                student_id=student_id, course=course,
+                marks_obtained=obtained, total_marks=total,
+            ))
+        elif mark.marks_obtained != obtained or mark.total_marks != total:
+            mark.marks_obtained = obtained
+            mark.total_marks = total
+            # bulk_update does not apply auto_now
+            mark.updated_at = now
+            to_update.append(mark)
+
+    with transaction.atomic():
+        # `existing` was read before the transaction; a row another request
+        # added since is overwritten instead of failing the whole grid
+        Marks.objects.bulk_create(
+            to_create, batch_size=500,
+            update_conflicts=True,
+            unique_fields=['student', 'course'],
+            update_fields=['marks_obtained', 'total_marks', 'updated_at'],
+        )
+        Marks.objects.bulk_update(to_update, ['marks_obtained', 'total_marks', 'updated_at'], batch_size=500)
+        # Bulk writes skip the Marks signals that keep the summaries and
+        # the cached course figures current
+        refresh_summaries(mark.student_id for mark in to_create + to_update)
+        caching.bump('marks')
+
+    return len(to_create), len(to_update)
+
+# ---------------------------------------------------
+# LEADERBOARD
+# ---------------------------------------------------
+
+@query_budget(6)
+@login_required
+def leaderboard(request):
+    """
+    Top students overall, or in one course with ?course=<id>.
+    Admins see every course; teachers their assigned ones.
+    """
+    if not (is_admin(request.user) or is_teacher(request.user)):
+        messages.error(request, "Access denied.")
+        return redirect('dashboard')
+
+    courses = Course.objects.order_by('code')
+    if not is_admin(request.user):
+        courses = request.user.teacher.assigned_courses.order_by('code')
+    try:
+        size = min(max(int(request.GET.get('top', ranking.DEFAULT_LEADERBOARD_SIZE)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        size = ranking.DEFAULT_LEADERBOARD_SIZE
+
+    course = None
+    course_id = request.GET.get('course', '')
+    if course_id:
+        if not course_id.isdigit():
+            raise Http404
+        course = get_object_or_404(courses, pk=course_id)
+        rows = ranking.course_leaderboard(course, size)
+    else:
+        rows = ranking.overall_leaderboard(size)
+
+    return render(request, 'marks/leaderboard.html', {
+        'courses': courses,
+        'course': course,
+        'rows': rows,
+        'size': size,
+    })
+
+# ---------------------------------------------------
+# GRADE ANALYTICS
+# ---------------------------------------------------
+
+@query_budget(5)
+@login_required
+@course_access_required
+def course_analytics(request, course_id):
+    """
+    Grade distribution, percentiles and pass rate for one course.
+    """
+    course = get_object_or_404(Course, pk=course_id)
+    return render(request, 'analytics/course_analytics.html', {
+        'course': course,
+        'stats': analytics.course_stats(course),
+    })
+
+@login_required
+@course_access_required
+def course_analytics_api(request, course_id):
+    """
+    The same statistics as course_analytics, as JSON.
+    """
+    course = get_object_or_404(Course, pk=course_id)
+    return JsonResponse(analytics.course_stats(course))
+
+@query_budget(4)
+@login_required
+@admin_required
+def analytics_overview(request):
+    """
+    Statistics for every course side by side (admin only). Add
+    ?format=json for the raw numbers.
+    """
+    courses = analytics.all_course_stats()
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'courses': courses, 'pass_fraction': analytics.PASS_FRACTION})
+    return render(request, 'analytics/analytics_overview.html', {'courses': courses})
+
+# ---------------------------------------------------
+# REQUEST METRICS
+# ---------------------------------------------------
+
+@login_required
+@admin_required
+def metrics_dashboard(request):
+    """
+    Query counts, database/template time, response size and latency per
+    view, as recorded by MetricsMiddleware in this server process.
+    """
+    return render(request, 'metrics/metrics.html', {
+        'views': metrics.snapshot(),
+        'enabled': settings.METRICS_ENABLED,
+    })
+
+def metrics_prometheus(request):
+    """
+    The same numbers in Prometheus text format, for superusers or a
+    scraper sending the METRICS_TOKEN as a bearer token.
+    """
+    token = settings.METRICS_TOKEN
+    bearer = request.headers.get('Authorization', '').removeprefix('Bearer ')
+    if not (is_admin(request.user) or (token and constant_time_compare(bearer, token))):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(metrics.prometheus_text(metrics.snapshot()),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# ---------------------------------------------------
+# ATTENDANCE SECTION
+# ---------------------------------------------------
+
+@query_budget(6)
+@login_required
+@course_access_required
+def roll_call(request, course_id):
+    """
+    Daily roll-call for a course. Every enrolled student defaults to
+    Present; the whole class is saved with a single bulk upsert.
+    """
+    course = get_object_or_404(Course, pk=course_id)
+
+    data = request.POST if request.method == 'POST' else request.GET
+    # Opening the page without a date shows today; a save must say which day it is for
+    if request.method == 'GET' and not data.get('date'):
+        day = timezone.localdate()
+    else:
+        try:
+            day = parse_date(data.get('date', ''))
+        except ValueError:
+            day = None
+        if day is None:
+            return HttpResponseBadRequest('Invalid "date", expected YYYY-MM-DD.')
+
+    students = list(
+        Student.objects.filter(course=course)
+        .only('id', 'full_name', 'roll_number')
+        .order_by('roll_number')
+    )
+
+    if request.method == 'POST':
+        present_ids = set(request.POST.getlist('present'))
+        records = [
+            Attendance(
+                student=student, course=course, date=day,
+                status='Present' if str(student.pk) in present_ids else 'Absent',
+            )
+            for student in students
+        ]
+        # One INSERT ... ON CONFLICT DO UPDATE per batch, in one short transaction,
+        # so concurrent roll-calls hold the SQLite write lock as briefly as possible.
+        with transaction.atomic():
+            Attendance.objects.bulk_create(
+                records, batch_size=500,
+                update_conflicts=True,
+                unique_fields=['student', 'course', 'date'],
+                update_fields=['status', 'updated_at'],
+            )
+            caching.bump('attendance')
+        present = sum(record.status == 'Present' for record in records)
+        messages.success(request, f'Attendance saved for {day}: {present} present, {len(records) - present} absent.')
+        return redirect(f"{reverse('roll_call', args=[course.id])}?date={day.isoformat()}")
+
+    statuses = dict(
+        Attendance.objects.filter(course=course, date=day).values_list('student_id', 'status')
+    )
+    rows = [(student, statuses.get(student.pk, 'Present') == 'Present') for student in students]
+
+    return render(request, 'attendance/roll_call.html', {
+        'course': course,
+        'day': day,
+        'rows': rows,
+        'recorded': bool(statuses),
+    })
+
+@query_budget(7)
+@login_required
+async def student_marks(request):
     """
     View for a STUDENT to see their own marks across all courses.
     """
@@ -447,22 +942,19 @@ def student_marks(request):
         messages.error(request, "Access denied. Students only.")
         return redirect('dashboard')
         
-    student = request.user.student
-    marks = Marks.objects.filter(student=student)
-    
-    return render(request, 'marks/student_marks.html', {'marks': marks, 'student': student})
+    return await arender(request, 'marks/student_marks.html', await get_result_context(request.user.student))
 
+@query_budget(8)
 @login_required
-def student_result_card(request, pk):
+async def student_result_card(request, pk):
     """
     View for Admins/Teachers to see a specific student's result card.
     """
-    student = get_object_or_404(Student, pk=pk)
+    student = await aget_object_or_404(Student, pk=pk)
     
     # Permission check
     if not (is_admin(request.user) or is_teacher(request.user)):
          messages.error(request, "Access denied.")
          return redirect('dashboard')
          
-    marks = Marks.objects.filter(student=student)
-    return render(request, 'marks/student_marks.html', {'marks': marks, 'student': student})
+    return await arender(request, 'marks/student_marks.html', await get_result_context(student))
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,11 +42,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -54,7 +58,8 @@ ROOT_URLCONF = 'student_management.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # The Django backend, also timing renders for the request metrics
+        'BACKEND': 'core.metrics.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -75,13 +80,102 @@ WSGI_APPLICATION = 'student_management.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# SMS_SQLITE_TUNING=1 sets the database up for several concurrent
+# writers (see core/database.py): WAL journaling and the PRAGMAs below on
+# every new connection, BEGIN IMMEDIATE transactions, a longer busy
+# timeout and connections kept open between requests. SMS_DB_CONN_MAX_AGE
+# and SMS_DB_BUSY_TIMEOUT (seconds) override the last two either way.
+SQLITE_TUNING = os.environ.get('SMS_SQLITE_TUNING') == '1'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': int(os.environ.get('SMS_DB_CONN_MAX_AGE', 600 if SQLITE_TUNING else 0)),
+        # Persistent connections are checked before a request reuses them
+        'CONN_HEALTH_CHECKS': SQLITE_TUNING,
+        'OPTIONS': {
+            # How long to wait for another connection's write lock
+            'timeout': float(os.environ.get('SMS_DB_BUSY_TIMEOUT', 20 if SQLITE_TUNING else 5)),
+        },
     }
 }
 
+SQLITE_TUNED_PRAGMAS = {
+    'journal_mode': 'wal',
+    # Safe with WAL: a power loss can only lose the last commits
+    'synchronous': 'normal',
+    # Per connection: 64 MB of page cache (negative means KiB) and 256 MB mmap
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
+    # Analyze tables whose statistics are missing or stale (0x10000 is
+    # the "new connection" mode of SQLite 3.46+; older versions ignore it)
+    'analysis_limit': 400,
+    'optimize': 0x10002,
+}
+SQLITE_PRAGMAS = SQLITE_TUNED_PRAGMAS if SQLITE_TUNING else {}
+SQLITE_IMMEDIATE_TRANSACTIONS = SQLITE_TUNING
+
+# Read replica (core/routers.py). Set SMS_DB_REPLICA to the path of a
+# second SQLite file, refreshed from the primary with `manage.py
+# sync_replica`, to serve page reads from it. A browser that wrote
+# something reads from the primary for REPLICA_PIN_SECONDS afterwards.
+if os.environ.get('SMS_DB_REPLICA'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ['SMS_DB_REPLICA'],
+        # Tests read the test database through both aliases
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICA_DATABASE = 'replica'
+    DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+else:
+    REPLICA_DATABASE = None
+REPLICA_PIN_SECONDS = int(os.environ.get('SMS_REPLICA_PIN_SECONDS', 10))
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Local memory is private to each process. When running several worker
+# processes, set SMS_CACHE_DIR so they share one file-based cache. Cached
+# page fragments are safe with any backend, because their versions are
+# kept in the database (core/caching.py). The dashboard counters are not:
+# the file-based cache's incr() is not atomic, so writes from separate
+# processes at the same moment can lose a change. Use a cache with an
+# atomic incr() (Memcached, Redis) there, or run rebuild_dashboard_counts.
+
+if os.environ.get('SMS_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ['SMS_CACHE_DIR'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'student-management',
+        }
+    }
+
+
+# Authentication
+# The custom backend loads the teacher/student profile together with the
+# user, so role checks don't cost extra queries.
+
+AUTHENTICATION_BACKENDS = ['core.backends.RoleAwareModelBackend']
+
+# Per-view request metrics (core/metrics.py). The Prometheus endpoint is
+# open to superusers and to scrapers sending "Authorization: Bearer
+# <METRICS_TOKEN>"; with no token set only superusers can read it.
+METRICS_ENABLED = os.environ.get('SMS_METRICS', '1') == '1'
+METRICS_TOKEN = os.environ.get('SMS_METRICS_TOKEN', '')
+# Raise instead of logging a warning when a view exceeds its
+# @query_budget, so over-budget views fail the tests
+QUERY_BUDGET_STRICT = os.environ.get('SMS_QUERY_BUDGET_STRICT') == '1'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -120,6 +214,14 @@ USE_TZ = True
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 
+# Uploaded files (profile photos and their thumbnails)
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# The bulk grade-entry grid posts three fields per student, so a large
+# course easily exceeds Django's default limit of 1000 fields.
+DATA_UPLOAD_MAX_NUMBER_FIELDS = 10000
+
 # Login Configuration
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
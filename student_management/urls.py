@@ -1,10 +1,20 @@
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.contrib.auth import views as auth_views
 
+from core.photos import PHOTO_DIR, serve_photo
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('core.urls')),
     path('accounts/login/', auth_views.LoginView.as_view(template_name='login.html'), name='login'),
     path('accounts/logout/', auth_views.LogoutView.as_view(next_page='login'), name='logout'),
 ]
+
+if settings.DEBUG:
+    # In production the web server serves MEDIA_ROOT
+    urlpatterns += [
+        re_path(r'^{}{}/(?P<path>.*)$'.format(settings.MEDIA_URL.lstrip('/'), PHOTO_DIR), serve_photo),
+    ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)